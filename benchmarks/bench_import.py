@@ -0,0 +1,90 @@
+"""
+Import time of rgbmaker, guards the lazy imports (see rgbmaker.lazy) against
+regressions.
+
+Every case runs in a fresh interpreter, the time of the imports (and of
+`rgbmaker --help`) is measured inside it so the start of the interpreter
+itself is not counted. A case fails when its best time is over the limit or
+when it imports one of the heavy dependencies it should not need.
+
+.. code-block:: bash
+
+    $ python benchmarks/bench_import.py             # exits 1 on a regression
+    $ python benchmarks/bench_import.py --repeat 10 --limit 0.2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src')
+LIMIT = 0.2
+HEAVY = ('astropy', 'astroquery', 'matplotlib', 'requests', 'regions', 'scipy')
+
+_RUN = """
+import sys, json
+from time import perf_counter
+_t = perf_counter()
+{code}
+_t = perf_counter() - _t
+print(json.dumps({{'time': _t, 'modules': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+_HELP = """
+sys.argv = ['rgbmaker', '--help']
+import io, contextlib
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        from rgbmaker.cli import cli
+        cli()
+    except SystemExit:
+        pass
+"""
+
+#-- name : (code, heavy modules allowed) ---#-#
+CASES = {
+    'rgbmaker --help': (_HELP, ()),
+    'import rgbmaker': ('import rgbmaker', ()),
+    'import rgbmaker.fetch': ('import rgbmaker.fetch', ()),
+    'imgplt scaling helpers': ('from rgbmaker.imgplt import stretch, sqrt, overlayo, ror_channel', ()),
+    'rgbmaker.service': ('from rgbmaker.service import Client, Service', ()),
+}
+
+
+def run(code, repeat=5):
+    """
+    returns the best time of code over repeat fresh interpreters and the
+    heavy modules it imported.
+    """
+    _env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SRC, os.environ.get('PYTHONPATH')])))
+    _best, _modules = None, []
+    for _ in range(repeat):
+        _out = subprocess.run([sys.executable, '-c', _RUN.format(code=code, heavy=HEAVY)],
+                              capture_output=True, text=True, env=_env, check=True)
+        _r = json.loads(_out.stdout.strip().splitlines()[-1])
+        _best = _r['time'] if _best is None else min(_best, _r['time'])
+        _modules = _r['modules']
+    return _best, _modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=5, help="fresh interpreters per case (default 5)")
+    parser.add_argument('--limit', type=float, default=LIMIT, help="seconds allowed per case (default 0.2)")
+    args = parser.parse_args(argv)
+
+    failed = []
+    for name, (code, allowed) in CASES.items():
+        _t, _modules = run(code, args.repeat)
+        _extra = [m for m in _modules if m not in allowed]
+        _ok = _t <= args.limit and not _extra
+        print("{:<26} {:8.1f} ms  {}{}".format(name, 1e3*_t, 'ok' if _ok else 'FAIL',
+              '  imports ' + ', '.join(_extra) if _extra else ''))
+        if not _ok:
+            failed.append(name)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+Offline benchmark of the stages of query(): SkyView, Vizier, NVAS and Sesame
+are replaced by the synthetic stand-ins of offline.py, so the numbers only
+depend on this machine and on rgbmaker.
+
+Stages timed for every (imagesopt, px):
+
+    - fetch      : RGBMaker(...).submit_query(), surveys and NVAS list
+    - overlayo   : ror/iou/optical composites (imagesopt=1)
+    - overlayc   : imgplt.overlayc() of the ror channels (imagesopt=2)
+    - stretch    : dss2r sqrt stretches and gray image (imagesopt=2)
+    - contours   : contour levels and lines (ContourCache) of the radio surveys
+    - vizier     : vz_query() (imagesopt=2)
+    - catalog    : overlay_catalog() of the TGSS and NVSS sources (imagesopt=2)
+    - find_spidx : spectral indices around the target (imagesopt=2)
+    - save_fig   : encoding of the figure only
+    - render     : figures drawn and encoded (fetch._rgbc_figure/_rgb_figure)
+    - query      : fetch.query() end to end
+
+and once per run: resolve (name through the Sesame stand-in), spidx_index
+(build_spidx_index of the synthetic catalog) and cosmo_calc (100 redshifts).
+
+Results are the best (and median) of --repeat runs in seconds. They are
+compared with benchmarks/baseline.json when it exists, a stage slower than
+its baseline by more than --tolerance (and by more than 5 ms) is reported
+as a regression and the script exits 1. --save writes the results as the new
+baseline.
+
+.. code-block:: bash
+
+    $ python benchmarks/bench_stages.py
+    $ python benchmarks/bench_stages.py --px 240 480 960 --imagesopt 1 2 --repeat 5 --save
+    $ python benchmarks/bench_stages.py --latency 0.3 --sources 50 --output /tmp/run.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime, timezone
+from statistics import median
+from time import perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, os.pardir, 'src')
+BASELINE = os.path.join(HERE, 'baseline.json')
+POSITION = '3C 33.1'
+RADIUS = 0.12
+TOLERANCE = 0.5
+FLOOR = 0.005
+
+
+class Timer:
+    """
+    best and median wall time of stages over repeat runs.
+    """
+
+    def __init__(self, repeat=3):
+        self.repeat = max(1, int(repeat))
+        self.results = {}
+
+    def __call__(self, name, func, setup=None, teardown=None):
+        """
+        times func() (func(setup()) when setup is given) repeat times,
+        returns the value of the last run.
+        """
+        _times = []
+        for _ in range(self.repeat):
+            _arg = setup() if setup is not None else None
+            _t = perf_counter()
+            out = func() if setup is None else func(_arg)
+            _times.append(perf_counter() - _t)
+            if teardown is not None:
+                teardown(_arg)
+        self.results[name] = {'min': min(_times), 'median': median(_times)}
+        return out
+
+
+def bench_once(timer, tmp, spidx_rows):
+    """
+    stages that do not depend on imagesopt/px, returns the spidx file.
+    """
+    from offline import write_spidx
+    from rgbmaker.resolve import NameResolver
+    from rgbmaker.tgss_spidx import build_spidx_index
+    from rgbmaker.wrightCC import cosmo_calc
+
+    _names = os.path.join(tmp, 'names.json')
+    timer('resolve', lambda: NameResolver(path=_names).resolve(POSITION),
+          teardown=lambda _: os.path.exists(_names) and os.remove(_names))
+    spidx_file = write_spidx(os.path.join(tmp, 'spidx.fits'), rows=spidx_rows)
+    timer('spidx_index', lambda: build_spidx_index(spidx_file))
+    timer('cosmo_calc', lambda: [cosmo_calc(z) for z in [0.01*i + 0.01 for i in range(100)]])
+    return spidx_file
+
+
+def bench_mode(timer, imagesopt, px, spidx_file):
+    """
+    stages of one imagesopt at px pixels.
+    """
+    from matplotlib import pyplot as plt
+    from rgbmaker import RGBMaker, fetch
+    from rgbmaker.fetch import _contour_levels, _rgb_figure, _rgbc_figure, _sqrt_dss2r, _stack
+    from rgbmaker.imgplt import (ContourCache, gray_rgb, new_figure, overlay_catalog, overlayc,
+                                 overlayo, pl_RGB, pl_RGBC, ror_channel, save_fig)
+    from rgbmaker.tgss_spidx import find_spidx
+
+    def _fetch():
+        q = RGBMaker(name='bench', position=POSITION, radius=RADIUS, archives=2,
+                     imagesopt=imagesopt, px=px, cache=False)
+        return q, q.submit_query()
+
+    q, val = timer('fetch', _fetch)
+    d = {svy: v['data'] for svy, v in val.items()}
+    _radio = ('tgss', 'nvss') if imagesopt == 1 else ('tgss', 'nvss', 'first')
+    _cmin = {'tgss': 0.015, 'nvss': 0.0015, 'first': 0.0005}
+    lvlc = {svy: _contour_levels(d[svy], _cmin[svy], 4) for svy in _radio}
+
+    if imagesopt == 1:
+        ror, iou, optical = timer('overlayo', lambda: (
+            _stack(*[ror_channel(d[svy]) for svy in ('tgss', 'dss2r', 'nvss')]),
+            overlayo(d['w22'], d['dss2r'], d['gnuv'], kind='IOU'),
+            overlayo(d['dss2ir'], d['dss2r'], d['dss2b'], kind='Optical')))
+    else:
+        timer('overlayc', lambda: overlayc(d['tgss'], d['dss2r'], d['nvss'], d['nvss'], 4, 0.0015))
+
+        def _stretch():
+            _sqrt = _sqrt_dss2r(d['dss2r'])
+            return _sqrt, _sqrt_dss2r(_sqrt), gray_rgb(_sqrt)
+
+        sqrt1, sqrt2, _ = timer('stretch', _stretch)
+
+    timer('contours', lambda: [ContourCache().lines(d[svy], _contour_levels(d[svy], _cmin[svy], 4))
+                               for svy in _radio if lvlc[svy] is not None])
+
+    if imagesopt == 2:
+        viz = timer('vizier', lambda: q.vz_query(set_info=False))
+        (tmaj, tmin, tpa, tcen, *_), (nmaj, nmin, npa, ncen, *_) = viz
+
+        def _axes():
+            fig = plt.figure(figsize=(10, 10))
+            return fig.add_subplot(projection=q.wcs)
+
+        timer('catalog', lambda ax: (
+            overlay_catalog(ax, tcen, tmaj, tmin, tpa, q.r, px, color='magenta'),
+            overlay_catalog(ax, ncen, nmaj, nmin, npa, q.r, px, color='cyan', ha='right', va='top')),
+            setup=_axes, teardown=lambda ax: plt.close(ax.figure))
+        spidx = timer('find_spidx', lambda: find_spidx(spidx_file, q.c, q.r))
+
+    #--- encoding of a drawn figure -------------------#--#
+    if imagesopt == 1:
+        fig, _ = new_figure('rgbc', q.wcs, d['nvss'].shape)
+        pl_RGBC(1, 2, 1, q.wcs, d['nvss'], lvlc['nvss'], ror, fig, 'bench')
+        pl_RGBC(1, 2, 2, q.wcs, d['tgss'], lvlc['tgss'], ror, fig, 'bench')
+    else:
+        fig, _ = new_figure('rgb', q.wcs, d['dss2r'].shape)
+        pl_RGB(fig.add_subplot(1, 2, 1, projection=q.wcs), sqrt1, 'DSS2R', 'bench')
+        pl_RGB(fig.add_subplot(1, 2, 2, projection=q.wcs), sqrt2, 'DSS2R', 'bench')
+    timer('save_fig', lambda: save_fig(plt, fig, 'bytes', close=False))
+    plt.close(fig)
+
+    if imagesopt == 1:
+        timer('render', lambda: [
+            _rgbc_figure(q.wcs, d['nvss'], lvlc['nvss'], ror, d['tgss'], lvlc['tgss'], ror, 'bench',
+                         kind='bytes'),
+            _rgbc_figure(q.wcs, d['tgss'], lvlc['tgss'], iou, d['tgss'], lvlc['tgss'], optical,
+                         'bench', pkind='iou', kind='bytes')])
+    else:
+        timer('render', lambda: _rgb_figure(q.wcs, sqrt1, sqrt2, d['nvss'], lvlc['nvss'], d['tgss'],
+                                            lvlc['tgss'], d['first'], lvlc['first'], viz, spidx,
+                                            q.r, px, 'bench', kind='bytes'))
+
+    timer('query', lambda: fetch.query(name='bench', position=POSITION, radius=RADIUS,
+                                       imagesopt=imagesopt, px=px, cache=False,
+                                       spidx_file=spidx_file if imagesopt == 2 else None))
+
+
+def run(px=(240, 480), imagesopt=(1, 2), repeat=3, latency=0., sources=20, spidx_rows=1_000_000):
+    """
+    runs the suite offline, returns the results (see compare()).
+    """
+    import numpy as np
+    import matplotlib
+    from offline import SyntheticSky, offline
+
+    results = {'meta': {'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                        'python': platform.python_version(), 'platform': platform.platform(),
+                        'numpy': np.__version__, 'matplotlib': matplotlib.__version__,
+                        'repeat': repeat, 'latency': latency, 'sources': sources,
+                        'spidx_rows': spidx_rows},
+               'stages': {}}
+    with tempfile.TemporaryDirectory() as tmp, offline(SyntheticSky(sources, latency)):
+        timer = Timer(repeat)
+        spidx_file = bench_once(timer, tmp, spidx_rows)
+        results['stages']['once'] = timer.results
+        for opt in imagesopt:
+            for _px in px:
+                timer = Timer(repeat)
+                bench_mode(timer, int(opt), int(_px), spidx_file)
+                results['stages']['imagesopt={},px={}'.format(opt, _px)] = timer.results
+                print_results({'imagesopt={},px={}'.format(opt, _px): timer.results})
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE, floor=FLOOR):
+    """
+    returns [(case, stage, baseline, now)] of stages slower than baseline by
+    more than tolerance (fraction) and floor (seconds), on the best times.
+    """
+    slower = []
+    for case, stages in results['stages'].items():
+        for stage, t in stages.items():
+            _b = baseline.get('stages', {}).get(case, {}).get(stage)
+            if _b is None:
+                continue
+            if t['min'] > _b['min']*(1 + tolerance) and t['min'] - _b['min'] > floor:
+                slower.append((case, stage, _b['min'], t['min']))
+    return slower
+
+
+def print_results(stages):
+    for case, times in stages.items():
+        print(case)
+        for stage, t in times.items():
+            print("    {:<12} {:9.2f} ms  (median {:.2f} ms)".format(stage, 1e3*t['min'],
+                                                                   1e3*t['median']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--px', type=int, nargs='+', default=[240, 480],
+                        help="pixel sizes (default 240 480)")
+    parser.add_argument('--imagesopt', type=int, nargs='+', default=[1, 2], choices=[1, 2],
+                        help="imagesopt modes (default 1 2)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per stage (default 3)")
+    parser.add_argument('--latency', type=float, default=0.,
+                        help="seconds slept by every service call (default 0)")
+    parser.add_argument('--sources', type=int, default=20,
+                        help="synthetic radio sources in the field (default 20)")
+    parser.add_argument('--spidx-rows', type=int, default=1_000_000,
+                        help="rows of the synthetic spidx catalog (default 1000000)")
+    parser.add_argument('--baseline', default=BASELINE, help="baseline json (default benchmarks/baseline.json)")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="allowed slowdown over the baseline as a fraction (default 0.5)")
+    parser.add_argument('--save', action='store_true', help="write the results as the baseline")
+    parser.add_argument('--output', help="also write the results to this json file")
+    args = parser.parse_args(argv)
+
+    #--- rgbmaker caches go to a scratch directory, imported after this -----#-#
+    _scratch = tempfile.mkdtemp(prefix='rgbmaker-bench-')
+    for var, name in (('RGBMAKER_CACHE', 'cutouts'), ('RGBMAKER_CATALOGS', 'catalogs'),
+                      ('RGBMAKER_NAMES', 'names.json')):
+        os.environ[var] = os.path.join(_scratch, name)
+    sys.path.insert(0, SRC)
+    import matplotlib
+    matplotlib.use('Agg')
+
+    results = run(args.px, args.imagesopt, args.repeat, args.latency, args.sources, args.spidx_rows)
+    print_results({'once': results['stages']['once']})
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+        print("saved {}".format(args.baseline))
+        return 0
+    if not os.path.exists(args.baseline):
+        print("no baseline at {}, run with --save to write one".format(args.baseline))
+        return 0
+    with open(args.baseline) as f:
+        slower = compare(results, json.load(f), args.tolerance)
+    for case, stage, _b, _t in slower:
+        print("REGRESSION {} {}: {:.2f} ms -> {:.2f} ms".format(case, stage, 1e3*_b, 1e3*_t))
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+Local stand-ins for the services rgbmaker talks to, so the pipeline can be
+timed without network access (see bench_stages.py).
+
+    - SyntheticSky.get_images     : SkyView cutouts (big endian float32 FITS
+                                    with a TAN header, like SkyView returns)
+    - SyntheticSky.query_region   : Vizier TGSS/NVSS cone searches
+    - SyntheticSky.get_image_list : NVAS image list
+    - SyntheticSky.from_name      : Sesame name resolution
+    - write_spidx                 : spectral index catalog (RA, DEC, Spidx rows)
+
+The radio cutouts and the catalogs share the same synthetic sources, every
+call sleeps for the latency configured for its service.
+
+.. code-block:: python
+
+    >>> from offline import SyntheticSky, offline
+    >>> with offline(SyntheticSky(sources=20, latency={'skyview': 0.5})):
+    ...     query(position='3C 33.1', imagesopt=2)
+"""
+from contextlib import ExitStack, contextmanager
+from threading import Lock
+from unittest import mock
+import time
+import zlib
+
+import numpy as np
+from astropy import coordinates, units as ut
+from astropy.io import fits
+from astropy.table import Table
+from astropy.wcs import WCS
+
+SERVICES = ('skyview', 'vizier', 'nvas', 'sesame')
+CENTER = (17.2204, 73.1069)     # 3C 33.1 (deg, fk5)
+
+#-- survey : (kind, beam fwhm in arcsec, rms, flux scale) ---#-#
+SURVEYS = {
+    'TGSS ADR1': ('radio', 25., 3.5e-3, 4.8),
+    'NVSS': ('radio', 45., 4.5e-4, 1.),
+    'VLA FIRST (1.4 GHz)': ('radio', 5., 1.5e-4, 1.),
+    'DSS2 Red': ('optical', 3., 120., 6000.),
+    'DSS2 Blue': ('optical', 3., 150., 5000.),
+    'DSS2 IR': ('optical', 3., 100., 7000.),
+    'WISE 22': ('optical', 12., 2., 90.),
+    'WISE 12': ('optical', 6.5, 2., 250.),
+    'WISE 4.6': ('optical', 6.4, 1., 40.),
+    'WISE 3.4': ('optical', 6.1, 1., 30.),
+    'GALEX Near UV': ('optical', 5., 1e-3, 4e-3),
+}
+
+
+class SyntheticSky:
+    """
+    deterministic sky of sources around any position, served like SkyView,
+    Vizier, NVAS and Sesame.
+
+    *Parameters*
+
+        :sources:
+            (default=20)
+            radio sources within the radius of a query (catalog rows and
+            gaussians of the radio cutouts), optical cutouts get 5 stars each.
+        :latency:
+            (default=0.)
+            seconds slept by every call, a float for all services or a dict
+            {'skyview', 'vizier', 'nvas', 'sesame'}.
+        :seed:
+            (default=0)
+    """
+
+    def __init__(self, sources=20, latency=0., seed=0):
+        self.sources = int(sources)
+        if not isinstance(latency, dict):
+            latency = dict.fromkeys(SERVICES, float(latency))
+        self.latency = {s: float(latency.get(s, 0.)) for s in SERVICES}
+        self.seed = seed
+        self.calls = dict.fromkeys(SERVICES, 0)
+        self._lock = Lock()
+        self._cutouts = {}
+        rng = np.random.default_rng(seed)
+        n = self.sources
+        #-- offsets in units of the query radius, axes in arcsec, flux in mJy --#
+        self._src = {'dx': rng.uniform(-0.9, 0.9, n), 'dy': rng.uniform(-0.9, 0.9, n),
+                     'maj': rng.uniform(10., 60., n), 'pa': rng.uniform(0., 180., n),
+                     'flux': 10**rng.uniform(0.7, 3.3, n)}
+        self._src['min'] = self._src['maj']*rng.uniform(0.3, 1., n)
+
+    def _wait(self, service):
+        with self._lock:
+            self.calls[service] += 1
+        if self.latency[service]:
+            time.sleep(self.latency[service])
+
+    #--- Sesame ---------------------------------------#--#
+
+    def from_name(self, name, frame='fk5', **kwargs):
+        """
+        SkyCoord of any name (CENTER), like SkyCoord.from_name.
+        """
+        self._wait('sesame')
+        return coordinates.SkyCoord(CENTER[0]*ut.deg, CENTER[1]*ut.deg, frame=frame)
+
+    #--- SkyView --------------------------------------#--#
+
+    def get_images(self, position, survey, pixels=None, radius=None, **kwargs):
+        """
+        list of HDULists of survey (a name or a list of names), like
+        SkyView.get_images. Unknown surveys raise like SkyView does.
+        """
+        self._wait('skyview')
+        c = self._coord(position)
+        px = int(pixels or 300)
+        r = (radius if radius is not None else 0.12*ut.deg).to_value(ut.deg)
+        _svys = [survey] if isinstance(survey, str) else list(survey)
+        return [fits.HDUList([fits.PrimaryHDU(self.cutout(s, c, r, px).copy(),
+                                              header=self.header(s, c, r, px))])
+                for s in _svys]
+
+    def cutout(self, survey, c, r, px):
+        """
+        big endian float32 (px, px) image of survey, generated once per
+        (survey, position, radius, px).
+        """
+        if survey not in SURVEYS:
+            raise ValueError("no survey named {!r}".format(survey))
+        _key = (survey, round(c.ra.deg, 6), round(c.dec.deg, 6), round(r, 6), px)
+        if _key not in self._cutouts:
+            self._cutouts[_key] = self._render(survey, r, px).astype('>f4')
+        return self._cutouts[_key]
+
+    def header(self, survey, c, r, px):
+        w = WCS(naxis=2)
+        w.wcs.ctype = ['RA---TAN', 'DEC--TAN']
+        w.wcs.crval = [c.ra.deg, c.dec.deg]
+        w.wcs.crpix = [px/2 + 0.5]*2
+        w.wcs.cdelt = [-2*r/px, 2*r/px]
+        w.wcs.equinox = 2000.
+        hdr = w.to_header()
+        hdr['SURVEY'] = survey
+        hdr['BUNIT'] = 'JY/BEAM' if SURVEYS[survey][0] == 'radio' else 'COUNTS'
+        return hdr
+
+    def _render(self, survey, r, px):
+        kind, fwhm, rms, scale = SURVEYS[survey]
+        rng = np.random.default_rng([self.seed, zlib.crc32(survey.encode()), px])
+        img = rng.normal(0., rms, (px, px)).astype(np.float32)
+        _pix = 3600*2*r/px                      # arcsec per pixel
+        if kind == 'radio':
+            x, y = self._src['dx'], self._src['dy']
+            peak = 1e-3*self._src['flux']*scale
+            sigma = np.hypot(fwhm, self._src['maj'])/2.355/_pix
+        else:
+            img += scale
+            x, y = rng.uniform(-1., 1., (2, 5*self.sources))
+            peak = scale*10**rng.uniform(-0.5, 1., 5*self.sources)
+            sigma = np.full(5*self.sources, fwhm/2.355/_pix)
+        _g = np.arange(px, dtype=np.float32)
+        for x0, y0, p, s in zip((x + 1)*px/2, (y + 1)*px/2, peak, np.maximum(sigma, 0.7)):
+            img += p*np.outer(np.exp(-0.5*((_g - y0)/s)**2), np.exp(-0.5*((_g - x0)/s)**2))
+        return img
+
+    #--- Vizier ---------------------------------------#--#
+
+    def query_region(self, c, radius=None, catalog=None, columns=None, **kwargs):
+        """
+        [Table] of the sources within radius of c, with the TGSS
+        (J/A+A/598/A78/table3) or NVSS (VIII/65/nvss) columns rgbmaker asks for.
+        """
+        self._wait('vizier')
+        c = self._coord(c)
+        r = (radius if radius is not None else 0.12*ut.deg).to_value(ut.deg)
+        s = self._src
+        dec = c.dec.deg + s['dy']*r
+        ra = c.ra.deg - s['dx']*r/np.cos(np.radians(dec))     # east is left
+        if 'nvss' in str(catalog).lower():
+            _c = coordinates.SkyCoord(ra*ut.deg, dec*ut.deg, frame='fk5')
+            t = Table({'RAJ2000': _c.ra.to_string(ut.hour, sep=' ', precision=2),
+                       'DEJ2000': _c.dec.to_string(sep=' ', precision=1, alwayssign=True),
+                       'MajAxis': s['maj'], 'MinAxis': s['min'], 'PA': s['pa'],
+                       'S1.4': s['flux'], 'e_S1.4': 0.05*s['flux'] + 0.45})
+            t['MajAxis'].unit = t['MinAxis'].unit = ut.arcsec
+        else:
+            t = Table({'RAJ2000': ra*ut.deg, 'DEJ2000': dec*ut.deg,
+                       'Maj': s['maj'], 'Min': s['min'], 'PA': s['pa'],
+                       'Stotal': 4.8*s['flux'], 'e_Stotal': 0.1*4.8*s['flux'] + 3.5})
+            t['Maj'].unit = t['Min'].unit = ut.arcsec
+        for k in t.colnames:
+            if k.startswith(('S', 'e_S')):
+                t[k].unit = ut.mJy
+        t['PA'].unit = ut.deg
+        return [t]
+
+    #--- NVAS -----------------------------------------#--#
+
+    def get_image_list(self, coordinates, radius=None, **kwargs):
+        """
+        urls of 3 NVAS images, like Nvas.get_image_list.
+        """
+        self._wait('nvas')
+        return ['https://www.vla.nrao.edu/astro/archive/pipeline/position/'
+                'synthetic/{}.imfits'.format(i) for i in range(3)]
+
+    @staticmethod
+    def _coord(position):
+        if isinstance(position, coordinates.SkyCoord):
+            return position
+        return coordinates.SkyCoord(CENTER[0]*ut.deg, CENTER[1]*ut.deg, frame='fk5')
+
+
+@contextmanager
+def offline(sky=None):
+    """
+    replaces SkyView.get_images, Vizier.query_region, Nvas.get_image_list and
+    SkyCoord.from_name with the stand-ins of sky (a new SyntheticSky when
+    None) while the block runs, yields sky.
+    """
+    from astroquery.nvas import Nvas
+    from astroquery.skyview import SkyView
+    from astroquery.vizier import VizierClass
+
+    sky = sky if sky is not None else SyntheticSky()
+
+    def _query_region(vizier, coordinates, radius=None, catalog=None, **kwargs):
+        return sky.query_region(coordinates, radius, catalog, columns=vizier.columns)
+
+    def _from_name(cls, name, frame='icrs', **kwargs):
+        return sky.from_name(name, frame)
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(SkyView, 'get_images', sky.get_images))
+        stack.enter_context(mock.patch.object(VizierClass, 'query_region', _query_region))
+        stack.enter_context(mock.patch.object(Nvas, 'get_image_list', sky.get_image_list))
+        stack.enter_context(mock.patch.object(coordinates.SkyCoord, 'from_name',
+                                              classmethod(_from_name)))
+        yield sky
+
+
+def write_spidx(path, rows=1_000_000, seed=0):
+    """
+    writes a spectral index catalog of rows sources (uniform over the TGSS sky,
+    dec > -53) as a (3, rows) float64 image [RA, DEC, Spidx] like the file
+    find_spidx() reads, returns path.
+    """
+    rng = np.random.default_rng(seed)
+    ra = rng.uniform(0., 360., rows)
+    dec = np.degrees(np.arcsin(rng.uniform(np.sin(np.radians(-53.)), 1., rows)))
+    spidx = rng.normal(-0.75, 0.25, rows)
+    fits.PrimaryHDU(np.vstack((ra, dec, spidx))).writeto(path, overwrite=True)
+    return path
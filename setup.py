@@ -24,7 +24,7 @@ setup(
     long_description_content_type = "text/markdown",
     install_requires=["astropy>=4.2.1", "matplotlib>= 3.4.2, <=3.5.3",
                       "regions", "numpy>= 1.20.3", "astroquery","requests",
-                      "scipy",
+                      "scipy", "pillow",
                       ],
     extras_require = {
         "dev" : ["pytest>=3.7",
@@ -1,21 +1,47 @@
 #-- author: @avialxee ---#--#
-import requests
-from astropy import coordinates, units as ut
-from astropy.wcs import WCS
-from astroquery.skyview import SkyView as skv
-
-import numpy as np
 from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
 
 from warnings import simplefilter
-from astroquery.nvas import Nvas
-from astroquery.vizier import Vizier
+import os
+import tempfile
+from rgbmaker.lazy import lazy
+from rgbmaker.cache import default_cache
+from rgbmaker.resolve import resolve
+from rgbmaker.catalog import CatalogMirror, default_catalog_cache
+from rgbmaker.timings import Timings, nbytes
+
+#--- heavy dependencies are imported on first use (see rgbmaker.lazy) ---#-#
+np = lazy('numpy')
+asyncio = lazy('asyncio')
+requests = lazy('requests')
+coordinates, ut = lazy('astropy.coordinates'), lazy('astropy.units')
+WCS = lazy('astropy.wcs', 'WCS')
+Table = lazy('astropy.table', 'Table')
+fits = lazy('astropy.io.fits')
+skv = lazy('astroquery.skyview', 'SkyView')
+Nvas = lazy('astroquery.nvas', 'Nvas')
+Vizier = lazy('astroquery.vizier', 'Vizier')
 
 class RGBMaker:
 
-    def __init__(self, name="", position="", radius=float(0.12), archives=1, imagesopt=2, px=480):
+    def __init__(self, name="", position="", radius=float(0.12), archives=1, imagesopt=2, px=480, workers=None, batch=False, cache=True, mirror=None, memmap=False):
         """
         creating instance for variables to be used throughout the process.
+
+        workers : number of threads used to fetch surveys from SkyView,
+        None uses one thread per survey (upto 8), 1 fetches one by one.
+        batch : when True surveys sharing a sampler are requested from
+        SkyView in a single query (see _get_imgl_batch).
+        cache : True uses the shared rgbmaker.cache.default_cache() (in memory,
+        on disk only when $RGBMAKER_CACHE is set), a CutoutCache instance uses
+        that cache and False/None disables caching (Vizier and NVAS responses
+        are cached in default_catalog_cache() unless cache is False/None).
+        mirror : path of a local TGSS/NVSS mirror (see rgbmaker.catalog) or a
+        CatalogMirror, used for Vizier cone searches instead of the network.
+        memmap : cutouts read from (or just written to) the disk tier of the
+        cache are memory maps of the cache files instead of arrays in memory,
+        without a disk tier downloads are mapped from temporary files.
         """
 
         #--- input variables -----#-#
@@ -33,9 +59,22 @@ class RGBMaker:
         self.info = ""
         self.imglt = []
         self.wcs = None
+        self.wcs_local = False
+        self.wcs_match = None
+        self.vz_error = None
+        self.on_survey = None
+        self.plan = None
+        self.timings = Timings()
         self.status = "info"
         self.otext = []
         self.px = px
+        self.workers = workers
+        self.batch = batch
+        self.cache = default_cache() if cache is True else (cache or None)
+        self.catalog_cache = default_catalog_cache() if cache else None
+        self.memmap = memmap
+        self.mirror = mirror if (mirror is None or isinstance(mirror, CatalogMirror)) else CatalogMirror(mirror)
+        self._resolved = None
         self.name, self.c, self.r = self._inp_sanitize()
         self.server_down = False
 
@@ -62,12 +101,49 @@ class RGBMaker:
         _input_svys, _input_sampler = self._sanitize_rgb()
         self.name, self.c, self.r = self._inp_sanitize()
         if self.c is not None :
-            self._getNVAS(self.archives)
-            
+            #-- NVAS is listed while surveys are fetched, its otext goes first --#
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                _nvas = pool.submit(self._nvas_otext)
+                try:
+                    hdu_d_list, error = self.getdd(_input_svys, _input_sampler)
+                    self._add_otext(_nvas.result())
+                    if error:self.otext.append(error)
+                except:
+                    self._add_otext(_nvas.result())
+                    if self.c :
+                        if self.imagesopt == 1 or self.imagesopt == 2 or self.imagesopt == 3:
+                            self.server_down=True
+                            self.status, self.info = 'info', 'error fetching data from SkyView'
+                            
+                        else:
+                            self.status, self.info = 'info', 'No images to return'
+                    return self.throw_output()
+            return self._arr_rgb(_input_svys, hdu_d_list)
+        else :
+            self.status, self.info = 'warning', 'Please check Coordinates'
+            return self.throw_output()
+        
+        #return hdu_d_list #DEBUG
+
+    async def asubmit_query(self, executor=None):
+        """
+        awaitable version of submit_query() for asyncio applications.
+        Name resolution, NVAS and SkyView surveys are run in the executor 
+        (None uses the event loop's default executor) concurrently, 
+        so the event loop is never blocked on the network.
+        """
+        simplefilter('ignore', category=UserWarning)
+        loop = asyncio.get_running_loop()
+        _input_svys, _input_sampler = self._sanitize_rgb()
+        self.name, self.c, self.r = await loop.run_in_executor(executor, self._inp_sanitize)
+        if self.c is not None :
+            _nvas = loop.run_in_executor(executor, self._nvas_otext)
             try:
-                hdu_d_list, error = self.getdd(_input_svys, _input_sampler)
+                hdu_d_list, error = await self.agetdd(_input_svys, _input_sampler, executor)
+                self._add_otext(await _nvas)
                 if error:self.otext.append(error)
             except:
+                self._add_otext(await _nvas)
                 if self.c :
                     if self.imagesopt == 1 or self.imagesopt == 2 or self.imagesopt == 3:
                         self.server_down=True
@@ -80,8 +156,6 @@ class RGBMaker:
         else :
             self.status, self.info = 'warning', 'Please check Coordinates'
             return self.throw_output()
-        
-        #return hdu_d_list #DEBUG
 
     def _arr_rgb(self, input_svys, hdu_d_list):
         """
@@ -93,8 +167,7 @@ class RGBMaker:
         _svys_res = None
         if hdu_d_list is not None:
             for result in hdu_d_list:
-                if not self.wcs:
-                    self.wcs = WCS(result[1])
+                self._set_wcs(result[1])
             _key_svy_dict = list(self.svy_dict('*').keys())
             _val_svy_dict = list(self.svy_dict('*').values())
             _svys_res = {}
@@ -109,6 +182,7 @@ class RGBMaker:
                     if _svy_sname == 'tgss' or _svy_sname == 'nvss' or _svy_sname=='first':
                         self.otext.append(
                             {input_svys[i]  :  _svys_res[_svy_sname]['range']})
+                self._timed('collect', _start, 'surveys', [v['data'] for v in _svys_res.values()])
                 
             else:
                 self.info = "No images found."
@@ -156,25 +230,117 @@ class RGBMaker:
         takes input svys (array) and fetches fits from skyview using astroquery.
         returns [list([hdulist[0].data, hdulist[0].header]), error]
         """
-        _imglt = []
         _imgls, _error = self._run_imgl(
             self.c, self.r, input_svys, sampler)
+        return self._collect_imgl(_imgls), _error
+
+    async def agetdd(self, input_svys, sampler, executor=None):
+        """
+        awaitable getdd(), every survey (or sampler group) is fetched in the 
+        executor concurrently without blocking the event loop.
+        returns [list([hdulist[0].data, hdulist[0].header]), error]
+        """
+        loop = asyncio.get_running_loop()
+        result = [0]*len(input_svys)
+        _error = {"survey_err":[],"exception":[]}
+        _tasks = self._imgl_tasks(self.c, self.r, input_svys, sampler, result)
+        _outs = await asyncio.gather(*[loop.run_in_executor(executor, _fn, _cals)
+                                       for _fn, _cals in _tasks], return_exceptions=True)
+        for _out in _outs:
+            if isinstance(_out, Exception):
+                _error["exception"].append(f"{str(_out)}")
+        self._imgl_errors(input_svys, result, _error)
+        return self._collect_imgl(result), _error
+
+    def _collect_imgl(self, _imgls):
+        """
+        converts hdul returned by _run_imgl to [data, header] pairs of float32 
+        data, missing surveys are filled with zeros (np.zeros pages are only
+        allocated when written).
+        """
+        _imglt = []
         for i in range(len(_imgls)):
             if _imgls[i] == 0 or len(_imgls[i])==0:
                 _imglt.insert(
-                    i, [np.zeros((int(self.px), int(self.px))), None])
+                    i, [np.zeros((int(self.px), int(self.px)), np.float32), None])
             else:
-                _imglt.append([_imgls[i][0][0].data, _imgls[i][0][0].header])
-                if not self.wcs:
-                    self.wcs = WCS(_imgls[i][0][0].header)
-        return _imglt, _error
+                _imglt.append([self._float32(_imgls[i][0][0].data), _imgls[i][0][0].header])
+                self._set_wcs(_imgls[i][0][0].header)
+        return _imglt
+
+    @staticmethod
+    def _float32(data):
+        """
+        data as float32, float32 data (also big endian memory maps of FITS 
+        files) is used as it is.
+        """
+        if data is None or (data.dtype.kind == 'f' and data.dtype.itemsize == 4):
+            return data
+        return data.astype(np.float32)
+
+    def local_wcs(self):
+        """
+        builds the WCS of the SkyView cutouts from position, radius and px 
+        (TAN projection, J2000, 2*radius across) without fetching any FITS.
+        """
+        _px = int(self.px)
+        _cdelt = 2*self.r.to(ut.deg).value/_px
+        _wcs = WCS(naxis=2)
+        _wcs.wcs.ctype = ['RA---TAN', 'DEC--TAN']
+        _wcs.wcs.crval = [self.c.ra.deg, self.c.dec.deg]
+        _wcs.wcs.crpix = [(_px + 1)/2., (_px + 1)/2.]
+        _wcs.wcs.cdelt = [-_cdelt, _cdelt]
+        _wcs.wcs.radesys = 'FK5'
+        _wcs.wcs.equinox = 2000.
+        _wcs.pixel_shape = (_px, _px)
+        return _wcs
+
+    def use_local_wcs(self):
+        """
+        sets self.wcs to local_wcs() so catalog stages can run before the
+        first FITS arrives, it is checked against the first header in _set_wcs.
+        """
+        self.wcs = self.local_wcs()
+        self.wcs_local = True
+        self.wcs_match = None
+        return self.wcs
+
+    def _set_wcs(self, header):
+        """
+        sets self.wcs from a FITS header unless already set. A WCS from 
+        local_wcs() is replaced by the header WCS when they differ by more
+        than 0.05 px at the image corners (self.wcs_match is set to False).
+        """
+        if not self.wcs:
+            self.wcs = WCS(header)
+        elif self.wcs_local and header is not None:
+            _real = WCS(header)
+            _px = int(self.px) - 1
+            _x, _y = np.array([0, _px, 0, _px]), np.array([0, 0, _px, _px])
+            try:
+                _xl, _yl = self.wcs.world_to_pixel_values(*_real.pixel_to_world_values(_x, _y))
+                self.wcs_match = bool(np.max(np.hypot(_xl - _x, _yl - _y)) < 0.05)
+            except Exception:
+                self.wcs_match = False
+            if not self.wcs_match:
+                self.wcs = _real
+            self.wcs_local = False
 
     def _getNVAS(self, archives):
+        self._add_otext(self._nvas_otext())
+
+    def _nvas_otext(self):
+        """
+        returns the NVAS otext entry (None unless archives=2), submit_query
+        appends it once the surveys are fetched so otext keeps its order.
+        """
         archives = self.archives
         if archives and int(archives) == 2 and self.c:
             text=""     
             try :
-                nvas_urls = Nvas.get_image_list(self.c,radius=2*ut.arcsec)
+                with self.timings.span('nvas', 'nvas') as _rec:
+                    nvas_urls = self._nvas_list()
+                    _rec['images'] = len(nvas_urls)
                 text += " " + str(len(nvas_urls)) + \
                     " Image(s) found in NVAS: "
                 i = 1
@@ -182,54 +348,226 @@ class RGBMaker:
                     if i<=5 :
                         text += " <a href='" + str(nvas) + "' target='_blank' rel='noreferrer noopener'>[" + str(i) + "]</a>"
                         i+=1
-                self.otext.append({'NVAS': text})
+                return {'NVAS': text}
             except :
-                self.otext.append({'NVAS' : 'NVAS server error'})
+                return {'NVAS' : 'NVAS server error'}
+
+    def _add_otext(self, entry):
+        if entry is not None:
+            self.otext.append(entry)
 
     def _run_imgl(self, c, r, _in_svys, sam):
         """
         Takes coordinate, radius and surveys to be fetched from 
-        skyview and sends to _get_imgl_pool.
+        skyview and sends to _get_imgl_pool (or _get_imgl_batch when
+        self.batch is set) using a bounded thread pool of self.workers threads.
         returns a list of hdul and errors requested by getdd.
         """
         result = [0]*len(_in_svys)
         imglt, _error = None, {"survey_err":[],"exception":[]}
-        _sam = sam
+        _tasks = self._imgl_tasks(c, r, _in_svys, sam, result)
+        _workers = self._n_workers(len(_tasks))
         try:
-            #print(_in_svys)
-            try:
-                for ind in range(len(_in_svys)):
-                    imglt = self._get_imgl_pool(
-                        [c, _in_svys[ind], r, result, ind,  _sam[ind]])
-                    if len(imglt[ind])==0:_error["survey_err"].append(str(_in_svys[ind]))
-            except Exception as e:
-                _error["exception"].append(f"{str(e)}")
+            if _workers <= 1:
+                for _fn, _cals in _tasks:
+                    try:
+                        _fn(_cals)
+                    except Exception as e:
+                        _error["exception"].append(f"{str(e)}")
+            else:
+                with ThreadPoolExecutor(max_workers=_workers) as pool:
+                    futures = [pool.submit(_fn, _cals) for _fn, _cals in _tasks]
+                    for future in futures:
+                        try:
+                            future.result()
+                        except Exception as e:
+                            _error["exception"].append(f"{str(e)}")
+            imglt = result
+            self._imgl_errors(_in_svys, imglt, _error)
         except Exception as e:
             _error["exception"].append(f"{str(e)}")
         return imglt, _error
 
+    def _imgl_tasks(self, c, r, _in_svys, sam, result):
+        """
+        returns a list of (function, cals) to fill result, one per survey or 
+        one per sampler group when self.batch is set.
+        """
+        if self.batch:
+            return [(self._get_imgl_batch, [c, [_in_svys[i] for i in inds], r, result, inds, _s])
+                    for _s, inds in self._group_sampler(sam).items()]
+        return [(self._get_imgl_pool, [c, _in_svys[ind], r, result, ind, sam[ind]])
+                for ind in range(len(_in_svys))]
+
+    @staticmethod
+    def _imgl_errors(_in_svys, imglt, _error):
+        """
+        appends surveys with an empty result slot to _error["survey_err"].
+        """
+        for ind in range(len(_in_svys)):
+            if not imglt[ind]:_error["survey_err"].append(str(_in_svys[ind]))
+
+    @staticmethod
+    def _group_sampler(sam):
+        """
+        groups survey indices by sampler, preserving order.
+        returns {sampler: [indices]}
+        """
+        _groups = {}
+        for ind, _s in enumerate(sam):
+            _groups.setdefault(None if _s in (None, 'None') else str(_s), []).append(ind)
+        return _groups
+
+    def _n_workers(self, n_svys):
+        """
+        number of threads to be used for n_svys surveys.
+        """
+        if self.workers is None:
+            return max(1, min(int(n_svys), 8))
+        return max(1, min(int(self.workers), int(n_svys) or 1))
+
     def _get_imgl_pool(self, cals):
         """
-        Requests Fits from Skyview one by one. Written for multithread pooling.
+        Requests Fits from Skyview for a single survey, called from the
+        thread pool in _run_imgl. Each call only writes its own slot queue[ind].
         returns a list of hdul requested by _run_imgl
         """
         c, svy, r, queue, ind, _sam = cals
         if _sam == 'None':
             _sam = None
+        _key = None
+        _t = perf_counter()
+        if self.cache is not None:
+            _key = self.cache.key(c, svy, r, self.px, _sam)
+            _cached = self.cache.hdul(_key, memmap=self.memmap)
+            if _cached is not None:
+                queue[ind] = _cached
+                self._timed('skyview', _t, svy, _cached, cached=True)
+                self._survey_done(svy, queue[ind])
+                return queue
         try:
             imglr = skv.get_images(position=c, survey=svy, pixels=str(
                 self.px), radius=r, scaling="Linear", sampler=_sam, cache='True')
-            queue[ind] = imglr
+            self._timed('skyview', _t, svy, imglr, cached=False)
+            queue[ind] = self._cache_put(_key, imglr)
+            self._survey_done(svy, imglr)
         except requests.exceptions.ConnectionError as e:
+            self._timed('skyview', _t, svy, cached=False, error=str(e))
             self.server_down = True
             self.status, self.info = 'warning', 'SkyView is down!'
+            self._survey_done(svy, None)
             
         except Exception as e:
             # --- if file not found/doesn't exist. Program will continue.
+            self._timed('skyview', _t, svy, cached=False, error=str(e))
             print("{} not found ".format(svy))
-            pass
+            self._survey_done(svy, None)
+        return queue
+
+    def _survey_done(self, svy, imglr):
+        """
+        calls self.on_survey(svy, found) when set, from the fetching thread.
+        """
+        if self.on_survey is not None:
+            self.on_survey(svy, bool(imglr))
+
+    def _timed(self, stage, start, name, out=None, **meta):
+        """
+        records stage (name) started at start (perf_counter) in self.timings
+        with the size of out, returns out.
+        """
+        self.timings.add(stage, perf_counter() - start, name, nbytes(out), start=start, **meta)
+        return out
+
+    def _get_imgl_batch(self, cals):
+        """
+        Requests Fits of several surveys sharing one sampler from Skyview
+        in a single query. Results are mapped back onto queue[inds] in the
+        order SkyView returns them, falling back to _get_imgl_pool survey by
+        survey when the combined query fails or comes back incomplete.
+        returns a list of hdul requested by _run_imgl
+        """
+        c, svys, r, queue, inds, _sam = cals
+        _keys = [None]*len(svys)
+        if self.cache is not None:
+            _missing = []
+            for svy, ind in zip(svys, inds):
+                _t = perf_counter()
+                _key = self.cache.key(c, svy, r, self.px, _sam)
+                _cached = self.cache.hdul(_key, memmap=self.memmap)
+                if _cached is not None:
+                    queue[ind] = _cached
+                    self._timed('skyview', _t, svy, _cached, cached=True)
+                    self._survey_done(svy, _cached)
+                else:
+                    _missing.append((svy, ind, _key))
+            if not _missing:
+                return queue
+            svys, inds, _keys = [list(m) for m in zip(*_missing)]
+        _t = perf_counter()
+        try:
+            imglr = skv.get_images(position=c, survey=list(svys), pixels=str(
+                self.px), radius=r, scaling="Linear", sampler=_sam, cache='True')
+            self._timed('skyview', _t, ', '.join(svys), imglr, cached=False, batch=True)
+            if len(imglr) != len(svys):
+                raise ValueError("{} of {} surveys returned".format(len(imglr), len(svys)))
+            for svy, ind, hdul, _key in zip(svys, inds, imglr, _keys):
+                queue[ind] = self._cache_put(_key, [hdul])
+                self._survey_done(svy, [hdul])
+        except requests.exceptions.ConnectionError as e:
+            self._timed('skyview', _t, ', '.join(svys), cached=False, batch=True, error=str(e))
+            self.server_down = True
+            self.status, self.info = 'warning', 'SkyView is down!'
+            for svy in svys:
+                self._survey_done(svy, None)
+        except Exception as e:
+            print("batch query failed ({}), fetching {} one by one".format(e, ', '.join(svys)))
+            for svy, ind in zip(svys, inds):
+                self._get_imgl_pool([c, svy, r, queue, ind, _sam])
         return queue
 
+    def _cache_put(self, key, imglr):
+        """
+        stores the first hdu of a SkyView result in self.cache.
+        returns imglr, read back as a memory map of the cache file when 
+        self.memmap is set so the downloaded copy can be released (of a
+        temporary file when there is no disk tier, see _spool).
+        """
+        if not imglr:
+            return imglr
+        if key is not None and self.cache is not None:
+            try:
+                self.cache.put(key, imglr[0][0].data, imglr[0][0].header)
+                if self.memmap and self.cache.path:
+                    return self.cache.hdul(key, memmap=True) or imglr
+            except Exception as e:
+                print("cutout cache: {}".format(e))
+        if self.memmap:
+            try:
+                return self._spool(imglr)
+            except Exception as e:
+                print("cutout spool: {}".format(e))
+        return imglr
+
+    @staticmethod
+    def _spool(imglr):
+        """
+        first hdu of a SkyView result as a memory map of a temporary FITS 
+        file, the file is removed once mapped (the map stays valid).
+        """
+        _fd, _f = tempfile.mkstemp(prefix='rgbmaker-', suffix='.fits')
+        os.close(_fd)
+        try:
+            fits.PrimaryHDU(data=imglr[0][0].data, header=imglr[0][0].header).writeto(_f, overwrite=True)
+            with fits.open(_f, memmap=True) as hdul:
+                data, header = hdul[0].data, hdul[0].header
+            return [fits.HDUList([fits.PrimaryHDU(data=data, header=header)])]
+        finally:
+            try:
+                os.remove(_f)
+            except OSError:
+                pass
+
     def _inp_sanitize(self):
         """
         sanitizing inputs: name, radius, position
@@ -251,7 +589,13 @@ class RGBMaker:
         c = None
         try:
             if not ('' or None) :
-                c = coordinates.SkyCoord.from_name(self.position, frame='fk5')
+                #-- resolved once per instance, see rgbmaker.resolve --#
+                if self._resolved is not None and self._resolved[0] == self.position:
+                    c = self._resolved[1]
+                else:
+                    with self.timings.span('resolve', self.position):
+                        c = resolve(self.position)
+                    self._resolved = (self.position, c)
                 self.info = "success"
                 self.status = "success"
                 return name, c, r
@@ -292,9 +636,13 @@ class RGBMaker:
 
         return {'rgb': [_r, _g, _b], 'sampler': [None, None, _sampling_b]}
     
-    def vz_query(self):
+    def vz_query(self, wcs=None, set_info=True):
         """
         query from vizier for NVSS and TGSS.
+        @input
+            wcs used for pixel positions (default self.wcs), set_info=False 
+            keeps self.info untouched (error is kept in self.vz_error) for 
+            calls running alongside submit_query.
         @returns:
             MajorAxis (unitless) (Vizier : arcsec), 
             MinorAxis (unitless) (Vizier : arcsec),
@@ -302,11 +650,11 @@ class RGBMaker:
             pixel based position (single arguement)
         """
         _tgss_viz, _nvss_viz = [None]*2
+        _wcs = wcs or self.wcs
         if self.imagesopt == 2:
             try:
                 try: 
-                    _tviz = Vizier(columns=self.vzc_dict('tgss')).query_region(
-                        self.c, self.r, catalog=self.vzb_dict('tgss'))
+                    _tviz = self._vizier('tgss')
                     _tra = _tviz[0]['RAJ2000']  # *ut.deg
                     _tdec = _tviz[0]['DEJ2000']  # *ut.deg
                     _tMaj = _tviz[0]['Maj']
@@ -318,11 +666,10 @@ class RGBMaker:
                     else:
                         _tPA = 0
                     _center_tgss = coordinates.SkyCoord(ra=_tra, dec=_tdec)
-                    _center_tgss_px = self.wcs.world_to_pixel(_center_tgss)
+                    _center_tgss_px = _wcs.world_to_pixel(_center_tgss)
                     _tgss_viz = [_tMaj, _tMin, _tPA, _center_tgss_px, _s_tgss, _es_tgss]
                 finally:
-                    _nviz = Vizier(columns=self.vzc_dict('nvss')).query_region(
-                        self.c,self.r, catalog=self.vzb_dict('nvss'))
+                    _nviz = self._vizier('nvss')
                     _nra = coordinates.Angle(_nviz[0]['RAJ2000'], unit=ut.hour)  # .deg
                     _ndec = coordinates.Angle(_nviz[0]['DEJ2000'], unit=ut.deg)  # .deg
                     #_nrad = coordinates.Angle(_nviz[0]['RAJ2000'], unit=ut.hour).deg
@@ -336,13 +683,57 @@ class RGBMaker:
                     else:
                         _nPA = 0
                     _center_nvss = coordinates.SkyCoord(ra=_nra, dec=_ndec)
-                    _center_nvss_px = self.wcs.world_to_pixel(_center_nvss)
+                    _center_nvss_px = _wcs.world_to_pixel(_center_nvss)
                     _nvss_viz = [_nMaj, _nMin, _nPA, _center_nvss_px, _s_nvss, _es_nvss]
             except:
-                self.info = " no data in catalog"
+                self.vz_error = " no data in catalog"
+                if set_info:
+                    self.info = self.vz_error
 
         return _tgss_viz, _nvss_viz
 
+    def _vizier(self, svy):
+        """
+        cone search of svy ('tgss' or 'nvss') around self.c within self.r,
+        answered by self.mirror, self.catalog_cache or Vizier in that order.
+        returns a list of tables like Vizier.query_region
+        """
+        _t = perf_counter()
+        if self.mirror is not None and self.mirror.has(svy):
+            return self._timed('vizier', _t, svy, source='mirror', out=self.mirror.query_region(
+                svy, self.c, self.r, columns=self.vzc_dict(svy)))
+        _key = None
+        if self.catalog_cache is not None:
+            _key = self.catalog_cache.key(self.vzb_dict(svy), self.vzc_dict(svy), self.c, self.r)
+            _cached = self.catalog_cache.get(_key)
+            if _cached is not None:
+                return self._timed('vizier', _t, svy, _cached, source='cache')
+        try:
+            _viz = Vizier(columns=self.vzc_dict(svy)).query_region(
+                self.c, self.r, catalog=self.vzb_dict(svy))
+        except Exception as e:
+            self._timed('vizier', _t, svy, source='vizier', error=str(e))
+            raise
+        self._timed('vizier', _t, svy, _viz, source='vizier')
+        if _key is not None:
+            self.catalog_cache.put(_key, _viz)
+        return _viz
+
+    def _nvas_list(self):
+        """
+        list of NVAS image urls at self.c, cached in self.catalog_cache.
+        """
+        _key = None
+        if self.catalog_cache is not None:
+            _key = self.catalog_cache.key('nvas', [], self.c, 2*ut.arcsec)
+            _cached = self.catalog_cache.get(_key)
+            if _cached is not None:
+                return [str(u) for t in _cached for u in t['url']]
+        nvas_urls = Nvas.get_image_list(self.c,radius=2*ut.arcsec)
+        if _key is not None:
+            self.catalog_cache.put(_key, [Table({'url': [str(u) for u in nvas_urls]})] if len(nvas_urls) else [])
+        return nvas_urls
+
     @classmethod
     def svy_dict(cls, svy=None):
         """
@@ -0,0 +1,320 @@
+"""
+Cutout cache used by RGBMaker to avoid refetching FITS from SkyView.
+
+Two tiers are kept:
+
+    - memory : per process LRU, bounded by mem_bytes.
+    - disk   : (opt-in, a path or $RGBMAKER_CACHE) FITS files in a directory 
+               shared between processes, bounded
+               by max_bytes. Least recently used files (by mtime) are evicted
+               first. Writes are atomic and guarded by a lock file so several
+               worker processes can use the same directory.
+
+.. code-block:: python
+
+    >>> from rgbmaker.cache import CutoutCache
+    >>> cache = CutoutCache('/tmp/rgbmaker-cache', max_bytes=2*1024**3)
+    >>> query(position='3C 33.1', cache=cache)
+    >>> cache.stats()
+    {'hits': 0, 'misses': 4, 'mem_hits': 0, 'disk_hits': 0, ...}
+"""
+from collections import OrderedDict
+from hashlib import sha1
+from threading import RLock
+import os
+
+from rgbmaker.lazy import lazy
+
+np = lazy('numpy')
+fits = lazy('astropy.io.fits')
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+# no disk tier unless asked for, ex. RGBMAKER_CACHE=~/.rgbmaker/cutouts
+DEFAULT_PATH = os.environ.get('RGBMAKER_CACHE') or None
+DEFAULT_MAX_BYTES = 1024**3
+DEFAULT_MEM_BYTES = 128*1024**2
+
+
+class _FileLock:
+    """
+    exclusive inter-process lock on a file, used as a context manager.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+class CutoutCache:
+    """
+    LRU cache of FITS cutouts keyed on (coordinate, survey, radius, px, sampler).
+
+    *Parameters*
+
+        :path:
+            (default=None or $RGBMAKER_CACHE)
+            directory for the disk tier, None keeps the cache in memory only.
+        :max_bytes:
+            (default=1 GB)
+            byte budget of the disk tier.
+        :mem_bytes:
+            (default=128 MB)
+            byte budget of the in-memory tier, 0 disables it.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, mem_bytes=DEFAULT_MEM_BYTES):
+        self.path = os.path.expanduser(str(path)) if path else None
+        self.max_bytes = int(max_bytes)
+        self.mem_bytes = int(mem_bytes)
+        self._mem = OrderedDict()
+        self._mem_size = 0
+        self._lock = RLock()
+        self._stats = {'hits': 0, 'misses': 0, 'mem_hits': 0, 'disk_hits': 0,
+                       'writes': 0, 'evictions': 0}
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def key(c, svy, r, px, sampler=None):
+        """
+        returns the cache key for a cutout.
+        coordinates and radius are rounded to 1e-6 deg.
+        """
+        r = getattr(r, 'value', r)
+        if sampler in (None, 'None'):
+            sampler = None
+        _raw = "{:.6f}|{:.6f}|{}|{:.6f}|{}|{}".format(
+            c.ra.deg, c.dec.deg, svy, float(r), int(px), sampler)
+        return sha1(_raw.encode()).hexdigest()
+
+    def get(self, key, memmap=False):
+        """
+        returns (data, header) for key or None on a miss, data is a read-only
+        view (the cached array is shared) and header a copy.
+        memmap=True returns the data of the disk tier as a read-only memory 
+        map of the cache file (not kept in the memory tier).
+        """
+        if memmap and self.path:
+            _item = self._disk_get(key, memmap=True)
+            if _item is not None:
+                with self._lock:
+                    self._stats['hits'] += 1
+                    self._stats['disk_hits'] += 1
+                return _item
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                self._stats['hits'] += 1
+                self._stats['mem_hits'] += 1
+                return self._view(self._mem[key])
+        _item = self._disk_get(key)
+        with self._lock:
+            if _item is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            self._stats['disk_hits'] += 1
+            self._mem_put(key, _item)
+        return self._view(_item)
+
+    def put(self, key, data, header):
+        """
+        stores a cutout in both tiers.
+        """
+        if data is None:
+            return
+        self._store(key, (data, header))
+
+    def hdul(self, key, memmap=False):
+        """
+        returns the cached cutout as [HDUList] (the format returned by
+        SkyView.get_images for one survey) or None on a miss, see get().
+        """
+        _item = self.get(key, memmap=memmap)
+        if _item is None:
+            return None
+        return [fits.HDUList([fits.PrimaryHDU(data=_item[0], header=_item[1])])]
+
+    def stats(self):
+        """
+        returns hit/miss counters of this process and the size of each tier.
+        """
+        with self._lock:
+            _stats = dict(self._stats)
+            _stats['mem_bytes'] = self._mem_size
+            _stats['mem_entries'] = len(self._mem)
+        _files = self._disk_files()
+        _stats['disk_bytes'] = sum(f[2] for f in _files)
+        _stats['disk_entries'] = len(_files)
+        return _stats
+
+    def clear(self):
+        """
+        removes every entry of both tiers.
+        """
+        with self._lock:
+            self._mem.clear()
+            self._mem_size = 0
+        if self.path:
+            with _FileLock(os.path.join(self.path, '.lock')):
+                for _f, _, _ in self._disk_files():
+                    self._remove(_f)
+
+    def _store(self, key, item):
+        with self._lock:
+            self._mem_put(key, item)
+            self._stats['writes'] += 1
+        self._disk_put(key, item)
+
+    #-------- memory tier -----#-#
+
+    def _mem_put(self, key, item):
+        if self.mem_bytes <= 0:
+            return
+        _size = self._sizeof(item)
+        if _size > self.mem_bytes:
+            return
+        if key in self._mem:
+            self._mem_size -= self._sizeof(self._mem.pop(key))
+        self._mem[key] = item
+        self._mem_size += _size
+        while self._mem_size > self.mem_bytes:
+            _, _old = self._mem.popitem(last=False)
+            self._mem_size -= self._sizeof(_old)
+
+    @staticmethod
+    def _view(item):
+        data, header = item
+        if hasattr(data, 'view'):
+            data = data.view()
+            data.flags.writeable = False
+        return data, (header.copy() if header is not None else None)
+
+    @staticmethod
+    def _sizeof(item):
+        data, header = item
+        return np.asarray(data).nbytes + (len(header) * 80 if header is not None else 0)
+
+    #-------- disk tier -----#-#
+
+    ext = '.fits'
+
+    def _file(self, key):
+        return os.path.join(self.path, key + self.ext)
+
+    def _read(self, _f, memmap=False):
+        """
+        returns the item stored in file _f, memmap=True maps the data of the
+        file instead of reading it (the map outlives the closed HDUList).
+        """
+        with fits.open(_f, memmap=memmap) as hdul:
+            return hdul[0].data, hdul[0].header
+
+    def _write(self, _f, item):
+        """
+        writes item to file _f.
+        """
+        data, header = item
+        fits.PrimaryHDU(data=data, header=header).writeto(_f, overwrite=True)
+
+    def _disk_get(self, key, memmap=False):
+        if not self.path:
+            return None
+        _f = self._file(key)
+        try:
+            _item = self._read(_f, memmap=True) if memmap else self._read(_f)
+            os.utime(_f)
+            return _item
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def _disk_put(self, key, item):
+        if not self.path:
+            return
+        _f = self._file(key)
+        _tmp = '{}.{}.tmp'.format(_f, os.getpid())
+        with _FileLock(os.path.join(self.path, '.lock')):
+            try:
+                self._write(_tmp, item)
+                os.replace(_tmp, _f)
+            finally:
+                if os.path.exists(_tmp):
+                    self._remove(_tmp)
+            self._evict()
+
+    def _disk_files(self):
+        """
+        returns [(path, mtime, size)] of the disk tier.
+        """
+        if not self.path:
+            return []
+        _files = []
+        for _e in os.scandir(self.path):
+            if _e.name.endswith(self.ext):
+                try:
+                    _st = _e.stat()
+                    _files.append((_e.path, _st.st_mtime, _st.st_size))
+                except OSError:
+                    pass
+        return _files
+
+    def _evict(self):
+        """
+        removes least recently used files until the disk tier fits max_bytes,
+        called with the lock held.
+        """
+        _files = sorted(self._disk_files(), key=lambda f: f[1])
+        _total = sum(f[2] for f in _files)
+        for _f, _, _size in _files:
+            if _total <= self.max_bytes:
+                break
+            if self._remove(_f):
+                _total -= _size
+                with self._lock:
+                    self._stats['evictions'] += 1
+
+    @staticmethod
+    def _remove(_f):
+        try:
+            os.remove(_f)
+            return True
+        except OSError:
+            return False
+
+
+_DEFAULT_CACHE = None
+
+def default_cache():
+    """
+    returns the process wide CutoutCache used when RGBMaker(cache=True).
+    """
+    global _DEFAULT_CACHE
+    if _DEFAULT_CACHE is None:
+        _DEFAULT_CACHE = CutoutCache()
+    return _DEFAULT_CACHE
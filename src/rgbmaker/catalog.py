@@ -0,0 +1,199 @@
+"""
+Cache and local mirror for the catalog queries of RGBMaker.vz_query
+(Vizier TGSS/NVSS) and RGBMaker._getNVAS (NVAS image list).
+
+    - CatalogCache  : LRU cache (memory and disk) of query responses keyed on
+                      (catalog, columns, cone).
+    - CatalogMirror : answers TGSS/NVSS cone searches from locally stored, DEC
+                      sorted copies of the full tables, without any network call.
+
+.. code-block:: python
+
+    >>> from rgbmaker.catalog import build_mirror
+    >>> build_mirror('tgss', 'TGSSADR1_7sigma_catalog.fits', '~/.rgbmaker/mirror')
+    >>> query(position='3C 33.1', mirror='~/.rgbmaker/mirror')
+"""
+from hashlib import sha1
+import os
+
+from rgbmaker.cache import CutoutCache
+from rgbmaker.lazy import lazy
+
+np = lazy('numpy')
+coordinates, ut = lazy('astropy.coordinates'), lazy('astropy.units')
+Table, MaskedColumn = lazy('astropy.table', 'Table'), lazy('astropy.table', 'MaskedColumn')
+
+# no disk tier unless asked for, ex. RGBMAKER_CATALOGS=~/.rgbmaker/catalogs
+DEFAULT_PATH = os.environ.get('RGBMAKER_CATALOGS') or None
+DEFAULT_MAX_BYTES = 256*1024**2
+DEFAULT_MEM_BYTES = 16*1024**2
+
+
+class CatalogCache(CutoutCache):
+    """
+    LRU cache of catalog responses, stored as a list of astropy Tables
+    (at most one, like vz_query uses) in ECSV files.
+
+    *Parameters*
+
+        :path:
+            (default=None or $RGBMAKER_CATALOGS)
+            directory for the disk tier, None keeps the cache in memory only.
+        :max_bytes:
+            (default=256 MB)
+            byte budget of the disk tier.
+        :mem_bytes:
+            (default=16 MB)
+            byte budget of the in-memory tier, 0 disables it.
+    """
+
+    ext = '.ecsv'
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, mem_bytes=DEFAULT_MEM_BYTES):
+        super().__init__(path=path, max_bytes=max_bytes, mem_bytes=mem_bytes)
+
+    @staticmethod
+    def key(catalog, columns, c, r):
+        """
+        returns the cache key for a cone search of catalog with columns.
+        """
+        r = r.to(ut.deg).value if hasattr(r, 'to') else float(r)
+        _raw = "{}|{}|{:.6f}|{:.6f}|{:.6f}".format(
+            catalog, ','.join(columns or []), c.ra.deg, c.dec.deg, r)
+        return sha1(_raw.encode()).hexdigest()
+
+    def put(self, key, tables):
+        """
+        stores a query response, tables is a list (or TableList) of Tables.
+        """
+        if tables is None:
+            return
+        self._store(key, [Table(t) for t in list(tables)[:1]])
+
+    def _read(self, _f):
+        if os.path.getsize(_f) == 0:
+            return []
+        return [Table.read(_f, format='ascii.ecsv')]
+
+    def _write(self, _f, tables):
+        if not tables:
+            open(_f, 'w').close()
+        else:
+            tables[0].write(_f, format='ascii.ecsv', overwrite=True)
+
+    @staticmethod
+    def _view(tables):
+        return [t.copy() for t in tables]
+
+    @staticmethod
+    def _sizeof(tables):
+        return sum(sum(np.asarray(col).nbytes for col in t.itercols()) for t in tables) + 1
+
+
+class CatalogMirror:
+    """
+    local copy of the full TGSS/NVSS tables, DEC sorted by build_mirror().
+
+    *Parameters*
+
+        :path:
+            directory holding tgss.fits and/or nvss.fits written by build_mirror().
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(str(path))
+        self._tables = {}
+
+    def has(self, svy):
+        """
+        True if svy ('tgss', 'nvss') is mirrored.
+        """
+        return os.path.exists(self._file(svy))
+
+    def query_region(self, svy, c, r, columns=None):
+        """
+        cone search of radius r around c, answered like Vizier.query_region,
+        returns a list with one Table (empty list when nothing is found).
+        """
+        table, dec = self._load(svy)
+        r = r.to(ut.deg).value if hasattr(r, 'to') else float(r)
+        lo = np.searchsorted(dec, c.dec.deg - r, side='left')
+        hi = np.searchsorted(dec, c.dec.deg + r, side='right')
+        band = table[lo:hi]
+        if len(band) == 0:
+            return []
+        _sep = c.separation(coordinates.SkyCoord(band['_RAdeg'], band['_DEdeg'], unit=ut.deg))
+        band = band[_sep.deg <= r]
+        if len(band) == 0:
+            return []
+        _cols = [col.strip().lstrip('+-') for col in (columns or band.colnames)]
+        return [band[[col for col in _cols if col in band.colnames and not col.startswith('_')]]]
+
+    def _file(self, svy):
+        return os.path.join(self.path, '{}.fits'.format(svy))
+
+    def _load(self, svy):
+        if svy not in self._tables:
+            table = Table.read(self._file(svy), memmap=True)
+            for name in table.colnames:
+                col = table[name]
+                if col.dtype.kind == 'f' and np.isnan(col).any():
+                    table[name] = MaskedColumn(col, mask=np.isnan(col))
+            self._tables[svy] = (table, np.asarray(table['_DEdeg']))
+        return self._tables[svy]
+
+
+def build_mirror(svy, source, path):
+    """
+    one-time build of a local mirror table.
+
+    *Parameters*
+
+        :svy:
+            'tgss' or 'nvss'
+        :source:
+            full catalog table readable by astropy (ex. a Vizier/CDS download
+            of J/A+A/598/A78/table3 or VIII/65/nvss) with RAJ2000/DEJ2000
+            columns, in degrees or sexagesimal strings. They are stored the
+            way Vizier returns them (TGSS in deg, NVSS as sexagesimal strings)
+            since vz_query reads mirror and Vizier results alike.
+        :path:
+            mirror directory used with CatalogMirror(path).
+
+    *Returns*
+
+        :path:
+            of the written table.
+    """
+    path = os.path.expanduser(str(path))
+    table = source if isinstance(source, Table) else Table.read(source)
+    ra, dec = table['RAJ2000'], table['DEJ2000']
+    if ra.dtype.kind in 'US':
+        _c = coordinates.SkyCoord(ra, dec, unit=(ut.hourangle, ut.deg))
+    else:
+        _c = coordinates.SkyCoord(np.asarray(ra), np.asarray(dec), unit=ut.deg)
+    table['_RAdeg'], table['_DEdeg'] = _c.ra.deg, _c.dec.deg
+    if svy == 'nvss':
+        if ra.dtype.kind not in 'US':
+            table['RAJ2000'] = _c.ra.to_string(ut.hour, sep=' ', precision=2, pad=True)
+            table['DEJ2000'] = _c.dec.to_string(sep=' ', precision=1, alwayssign=True, pad=True)
+    else:
+        table['RAJ2000'], table['DEJ2000'] = _c.ra.deg, _c.dec.deg
+        table['RAJ2000'].unit = table['DEJ2000'].unit = ut.deg
+    table = table[np.argsort(table['_DEdeg'], kind='stable')]
+    os.makedirs(path, exist_ok=True)
+    _f = os.path.join(path, '{}.fits'.format(svy))
+    table.write(_f, overwrite=True)
+    return _f
+
+
+_DEFAULT_CACHE = None
+
+def default_catalog_cache():
+    """
+    returns the process wide CatalogCache used when RGBMaker(cache=True).
+    """
+    global _DEFAULT_CACHE
+    if _DEFAULT_CACHE is None:
+        _DEFAULT_CACHE = CatalogCache()
+    return _DEFAULT_CACHE
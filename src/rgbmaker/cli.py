@@ -1,5 +1,3 @@
-from rgbmaker.fetch import query
-from rgbmaker.imgplt import pl_powerlawsi
 import argparse
 
 def cli_ASCII():
@@ -50,10 +48,27 @@ parser.add_argument('-S_e', '--flux_error', type=str, help="""(Optional)(list)(D
         Takes input as list for spectral index calculation.""")
 parser.add_argument('-freq', '--freq_list', type=str, help="""(Optional) (Default=None)
         Takes input as list for spectral index calculation.""")
-args=parser.parse_args()
+parser.add_argument('-w', '--workers', type=int, help="""(Optional) (Default=None)
+        number of threads used to fetch surveys from SkyView concurrently.""")
+parser.add_argument('-b', '--batch', action='store_true', help="""(Optional) (Default=False)
+        request all surveys sharing a sampler in a single SkyView query.""")
+parser.add_argument('-F', '--fast', action='store_true', help="""(Optional) (Default=False)
+        write the composite images directly without matplotlib (no axes or annotations).""")
+parser.add_argument('--serve', action='store_true', help="""(Optional) (Default=False)
+        run the long running rgbmaker service (see rgbmaker.service) instead of a query.""")
+parser.add_argument('--host', type=str, help="""(Optional) (Default=127.0.0.1)
+        address the service listens on.""")
+parser.add_argument('--port', type=int, help="""(Optional) (Default=8787)
+        port the service listens on.""")
+parser.add_argument('--concurrency', type=int, help="""(Optional) (Default=4)
+        queries the service computes at the same time, others are queued.""")
+parser.add_argument('--server', type=str, help="""(Optional) (Default=None)
+        url of a running service (ex. http://127.0.0.1:8787), the query is sent 
+        there instead of being computed in this process (png/jpg files are 
+        still written in output/ here).""")
 
-def cli():
-    
+def cli(argv=None):
+    args=parser.parse_args(argv)
     position=args.position or ""
     radius=args.radius or float(0.12)
     imagesopt=args.imagesopt or 2
@@ -66,14 +81,33 @@ def cli():
     S=args.flux_list 
     S_e=args.flux_error or "0,0"
     freq=args.freq_list or "150,1420"
+    if args.serve:
+        from rgbmaker.service import serve, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_CONCURRENCY
+        serve(host=args.host or DEFAULT_HOST, port=args.port or DEFAULT_PORT,
+              concurrency=args.concurrency or DEFAULT_CONCURRENCY)
+        return
     if S:
+        from rgbmaker.imgplt import pl_powerlawsi
         S=list(map(float, S.split(',')))
         S_e=list(map(float, S_e.split(',')))
         freq=list(map(float, freq.split(',')))
         sindex = pl_powerlawsi(S,S_e,freq, kind='png', label="output")
     if position:
-        q = query(name=name,position=position,radius=radius,imagesopt=imagesopt,archives=archives,kind=kind,spidx_file=spidx_file,
-        px=pixels,annot=annot)
+        params = dict(name=name,position=position,radius=radius,imagesopt=imagesopt,archives=archives,kind=kind,spidx_file=spidx_file,
+        px=pixels,annot=annot,workers=args.workers,batch=args.batch,fast=args.fast)
+        if args.server:
+            # thin client, nothing but the standard library is used here
+            from rgbmaker.service import Client, write_images
+            if kind in ('base64', 'uri', 'bytes'):
+                q = Client(args.server).query(**params)
+            else:
+                #-- files are written here, the service returns the encoded images --#
+                params.update(kind='bytes', encoder={'fmt': kind, 'transparent': False})
+                q = Client(args.server).query(**params)
+                q = (q[0], write_images(q[1], kind)) + q[2:]
+        else:
+            from rgbmaker.fetch import query
+            q = query(**params)
         print(q)
 
 
@@ -1,26 +1,45 @@
 from rgbmaker import RGBMaker as rgbmaker
-from rgbmaker.imgplt import pl_RGB, to_pixel, pl_RGBC, overlayc, overlayo, sqrt, save_fig
+from rgbmaker.imgplt import pl_RGB, pl_RGBC, overlayo, overlay_catalog, sqrt, save_fig
+from rgbmaker.imgplt import save_img, gray_rgb, raster_contours, raster_ellipses, new_figure
+from rgbmaker.imgplt import channel_stats, ContourCache, ror_channel, smooth as smooth_svy
+from rgbmaker.plan import Plan
+from rgbmaker import tiles
 from rgbmaker.tgss_spidx import find_spidx
+from rgbmaker.timings import nbytes
 
-from matplotlib import pyplot as plt
-from regions import PixCoord, EllipsePixelRegion
-from astropy.coordinates import Angle, SkyCoord
-from astropy import units as ut
-from matplotlib.collections import PatchCollection
-
-import matplotlib.patches as mpatches
+from rgbmaker.lazy import lazy
 import numpy as np
 
-from scipy.ndimage import gaussian_filter
+# matplotlib and astropy are imported when a figure is first rendered
+plt = lazy('matplotlib.pyplot')
+SkyCoord = lazy('astropy.coordinates', 'SkyCoord')
+ut = lazy('astropy.units')
+mpatches = lazy('matplotlib.patches')
+# multiprocessing.shared_memory (python 3.8+) only when a render_pool is used
+SharedArrays = lazy('rgbmaker.renderpool', 'SharedArrays')
+default_render_pool = lazy('rgbmaker.renderpool', 'default_render_pool')
 
 import urllib
 
 from time import perf_counter
+from functools import partial
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+
+import asyncio
+import queue
 
-import sys
+#-- survey : (lowest level, number of levels) of the contours ---#-#
+CONTOUR_LEVELS = {'tgss': (0.015, 4), 'nvss': (0.0015, 4), 'first': (0.0005, 4)}
+CONTOUR_DECIMALS = {'TGSS': 3, 'FIRST': 4, 'NVSS': 4}
+#-- colors of the fast and tiled paths ---#-#
+WHITE, CYAN, MAGENTA, YELLOW = (255, 255, 255), (0, 255, 255), (255, 0, 255), (255, 255, 0)
 
 def query(name="", position="", radius=float(0.12), archives=1, 
-                    imagesopt=2, kind='base64', spidx_file=None, px=480, annot=True):
+                    imagesopt=2, kind='base64', spidx_file=None, px=480, annot=True,
+                    workers=None, batch=False, cache=True, mirror=None, fast=False,
+                    template=False, fixed_layout=False, encoder=None, smooth=None,
+                    tiled=False, render_pool=None, timings=False, on_timings=None):
     """
     
 .. jupyter-execute::
@@ -88,7 +107,41 @@ def query(name="", position="", radius=float(0.12), archives=1,
     
     :kind:
         (default='base64')
-        choose from base64, plot, png, jpg to show base64 of resultant image, plot on output, save png/jpg files
+        choose from base64, plot, png, jpg to show base64 of resultant image, plot on output, save png/jpg files.
+        base64 images are returned as ready data uris (png), 'bytes' returns the raw png bytes.
+
+    :encoder:
+        (default=None)
+        dict of output encoder options (see rgbmaker.imgplt.encode), ex.
+        {'compression': 1} for faster png, {'quality': 80} for jpg/webp 
+        files, {'dpi': 72} for smaller figures.
+
+    :smooth:
+        (default=None)
+        gaussian smoothing (sigma in pixels) of the contoured surveys, ex.
+        {'tgss': 1.5, 'nvss': 1}. FIRST is smoothed with sigma=1 (2 when 
+        radius < 0.12) unless set here, 0 disables it. Contour levels are 
+        taken from the unsmoothed surveys.
+
+    :tiled:
+        (default=False)
+        bounded memory version of fast=True for large px (see rgbmaker.tiles):
+        cutouts are memory mapped (cache files, or temporary files when the 
+        cache has no disk tier), composites are stretched, overlaid 
+        and written to the png a band of rows at a time (True uses 
+        tiles.TILE_ROWS rows, an int sets the rows per band). Percentiles are
+        histogram estimates once a survey has too many distinct values. Png 
+        output only (base64, uri, bytes, stream or png files), other kinds
+        or encoder fmt raise ValueError.
+
+    :render_pool:
+        (default=None)
+        render the matplotlib figures in worker processes, a 
+        rgbmaker.renderpool.RenderPool or True for the shared 
+        default_render_pool(). Surveys and composites are passed through 
+        shared memory, img1 and img2 of imagesopt=1 are rendered at the same
+        time and concurrent queries (threads, aquery) use several cores. 
+        Ignored for kind='plot'/'stream', fast and tiled.
         
     :spidx_file:
         (Default=None)
@@ -102,214 +155,834 @@ def query(name="", position="", radius=float(0.12), archives=1,
         (default=True)
         remove any annotation by setting this to False.
 
+    :workers:
+        (default=None)
+        number of threads used to fetch surveys from SkyView concurrently.
+        None uses one thread per survey (upto 8), 1 fetches them one by one.
+
+    :batch:
+        (default=False)
+        request all surveys sharing a sampler in a single SkyView query, 
+        e.g. ROR/IOU/Optical need two queries instead of seven.
+
+    :cache:
+        (default=True)
+        cutout cache, True uses rgbmaker.cache.default_cache() (memory, and
+        disk when $RGBMAKER_CACHE is set), a rgbmaker.cache.CutoutCache 
+        instance uses that cache and False disables it. Vizier and NVAS responses are cached in 
+        rgbmaker.catalog.default_catalog_cache() unless cache is False.
+
+    :mirror:
+        (default=None)
+        path to a local TGSS/NVSS mirror built with rgbmaker.catalog.build_mirror,
+        catalog overlays are then answered locally without Vizier.
+
+    :fast:
+        (default=False)
+        skip matplotlib, the composites are written directly (png for base64,
+        png/jpg/webp files) with contours and catalog ellipses rasterized into
+        the image. No axes, titles, annotations or spidx labels are drawn.
+
+    :template:
+        (default=False)
+        reuse the figure and WCS axes of the previous query with the same
+        layout and cutout size (one per thread), only the image data and
+        overlays are replaced. Ignored for kind='plot'.
+
+    :fixed_layout:
+        (default=False)
+        figure with a fixed size and axes placement (15.5x7.75 inches) saved
+        without bbox_inches='tight', so the layout is not recomputed on save.
+        Output images keep the same pixel size from one query to the next.
+
+    :timings:
+        (default=False)
+        also return the wall time (and bytes) of each stage and survey as a
+        5th output, the report of rgbmaker.timings.Timings: name resolution,
+        every SkyView survey, Vizier, NVAS, spidx, the Plan products 
+        (stretches, composites), rendering and encoding of each image.
+
+    :on_timings:
+        (default=None)
+        called with the same timings report once the query is done, ex. to
+        forward it to a tracing system.
+
     """
     fetch_q = rgbmaker(name=name, position=position,
-                  radius=radius, archives=archives, imagesopt=imagesopt)
-    name = fetch_q.name
+                  radius=radius, archives=archives, imagesopt=imagesopt, workers=workers,
+                  batch=batch, cache=cache, mirror=mirror, memmap=bool(tiled))
     start = perf_counter()
     fetch_q.px = px
-    val = fetch_q.submit_query()
-    
-    level_contour=4
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        _viz, _spidx = _prefetch(fetch_q, pool.submit, spidx_file)
+        val = fetch_q.submit_query()
+        viz, spidx = _prefetched(fetch_q, _viz and _viz.result(), _spidx and _spidx.result())
+    output = _render(fetch_q, val, start, kind=kind, spidx_file=spidx_file, px=px,
+                   annot=annot, radius=radius, viz=viz, spidx=spidx, fast=fast,
+                   template=template, fixed_layout=fixed_layout, encoder=encoder, smooth=smooth,
+                   tiled=tiled, render_pool=render_pool)
+    return _with_timings(fetch_q, output, timings, on_timings)
+
+
+def iquery(name="", position="", radius=float(0.12), archives=1, 
+                    imagesopt=2, kind='base64', spidx_file=None, px=480, annot=True,
+                    workers=None, batch=False, cache=True, mirror=None, fast=False,
+                    template=False, fixed_layout=False, encoder=None, smooth=None,
+                    tiled=False, render_pool=None, paths=False, on_timings=None):
+    """
+    generator version of query(), takes the same parameters and yields 
+    events (dict with key 'event') in order as soon as each stage is ready:
+
+.. code-block:: python
+
+    >>> for ev in iquery(position='3C 33.1', imagesopt=1):
+    ...     print(ev['event'])
+    resolved, survey (one per survey as it arrives), contour, image (img1), image (img2), done
+
+*Events*
+
+    :resolved:
+        name, position (hmsdms, None if not resolved), status
+    :survey:
+        survey, found (False when missing from SkyView)
+    :contour:
+        survey, levels (list or None), paths when paths=True: contour vertices
+        [level][line][point] = [x, y] in pixels (see imgplt.ContourCache.vertices)
+    :image:
+        name (img1, img2), uri
+    :done:
+        output, the same tuple returned by query(), plan: report of the 
+        computed and reused products (see rgbmaker.plan.Plan.report),
+        timings: time of each stage (see query(timings=True)), also passed
+        to on_timings when set
+    """
+    fetch_q = rgbmaker(name=name, position=position,
+                  radius=radius, archives=archives, imagesopt=imagesopt, workers=workers,
+                  batch=batch, cache=cache, mirror=mirror, memmap=bool(tiled))
+    yield _event('resolved', name=fetch_q.name, status=fetch_q.status,
+                 position=fetch_q.c.to_string('hmsdms') if fetch_q.c else None)
+    start = perf_counter()
+    fetch_q.px = px
+    _events = queue.Queue()
+    fetch_q.on_survey = lambda svy, found: _events.put(_event('survey', survey=svy, found=found))
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        _viz, _spidx = _prefetch(fetch_q, pool.submit, spidx_file)
+        _val = pool.submit(fetch_q.submit_query)
+        _val.add_done_callback(lambda f: _events.put(None))
+        for ev in iter(_events.get, None):
+            yield ev
+        val = _val.result()
+        viz, spidx = _prefetched(fetch_q, _viz and _viz.result(), _spidx and _spidx.result())
+    yield from _render_events(fetch_q, val, start, kind=kind, spidx_file=spidx_file, px=px,
+                   annot=annot, radius=radius, viz=viz, spidx=spidx, fast=fast,
+                   template=template, fixed_layout=fixed_layout, encoder=encoder, smooth=smooth,
+                   tiled=tiled, render_pool=render_pool, paths=paths)
+    yield _event('done', output=fetch_q.throw_output(),
+                 plan=fetch_q.plan.report() if fetch_q.plan is not None else None,
+                 timings=_timings(fetch_q, on_timings))
+
+
+def _event(event, **kwargs):
+    """
+    event yielded by iquery(), numpy levels are converted to lists.
+    """
+    for k, v in kwargs.items():
+        if isinstance(v, np.ndarray):
+            kwargs[k] = v.tolist()
+    return dict(event=event, **kwargs)
+
+
+def _contour_event(survey, svy, levels, contours=None):
+    """
+    'contour' event of survey, with the contour vertices of svy when a 
+    ContourCache is given.
+    """
+    if contours is None:
+        return _event('contour', survey=survey, levels=levels)
+    return _event('contour', survey=survey, levels=levels, paths=contours.vertices(svy, levels))
+
+
+def _prefetch(fetch_q, submit, spidx_file=None):
+    """
+    for imagesopt=2, builds the cutout WCS locally (RGBMaker.use_local_wcs) and
+    submits the Vizier and spidx lookups, so they run while the SkyView images
+    are fetched.
+    returns (viz, spidx) futures, None for stages that are not needed.
+    """
+    if not (fetch_q.c and fetch_q.imagesopt == 2):
+        return None, None
+    _wcs = fetch_q.use_local_wcs()
+    _viz = submit(partial(fetch_q.vz_query, wcs=_wcs, set_info=False))
+    _spidx = None
+    if spidx_file is not None:
+        _spidx = submit(partial(_find_spidx, fetch_q, spidx_file))
+    return _viz, _spidx
+
+
+def _find_spidx(fetch_q, spidx_file):
+    """
+    find_spidx() around fetch_q.c recorded as the 'spidx' stage.
+    """
+    with fetch_q.timings.span('spidx', spidx_file):
+        return find_spidx(spidx_file, fetch_q.c, fetch_q.r)
+
+
+def _prefetched(fetch_q, viz, spidx):
+    """
+    returns the results of _prefetch() for _render(). Vizier pixel positions
+    are dropped (and recomputed by _render) when the local WCS did not match
+    the FITS header.
+    """
+    if fetch_q.wcs_match is False:
+        viz = None
+    return viz, spidx
+
+
+async def aquery(name="", position="", radius=float(0.12), archives=1, 
+                    imagesopt=2, kind='base64', spidx_file=None, px=480, annot=True,
+                    workers=None, batch=False, cache=True, mirror=None, fast=False,
+                    template=False, fixed_layout=False, encoder=None, smooth=None,
+                    tiled=False, render_pool=None, executor=None, timings=False,
+                    on_timings=None):
+    """
+    awaitable version of query() for asyncio applications, takes the same 
+    parameters and returns the same output.
+
+.. code-block:: python
+
+    >>> from rgbmaker.fetch import aquery
+    >>> results = await asyncio.gather(aquery(position='3C 33.1'), aquery(position='M87'))
+
+    Name resolution, SkyView surveys and NVAS are fetched concurrently through 
+    RGBMaker.asubmit_query(). For imagesopt=2 the Vizier and spidx lookups run 
+    concurrently with the image fetch (on a locally built WCS), while stretching
+    and rendering run on a single rendering thread (matplotlib is not thread 
+    safe) so the event loop is never blocked.
+
+    :executor:
+        (default=None)
+        concurrent.futures executor used for the blocking I/O, None uses the
+        event loop's default executor.
+    """
+    loop = asyncio.get_running_loop()
+    fetch_q = await loop.run_in_executor(executor, partial(rgbmaker, name=name, 
+                  position=position, radius=radius, archives=archives, imagesopt=imagesopt,
+                  workers=workers, batch=batch, cache=cache, mirror=mirror,
+                  memmap=bool(tiled)))
+    start = perf_counter()
+    fetch_q.px = px
+    _viz, _spidx = _prefetch(fetch_q, partial(loop.run_in_executor, executor), spidx_file)
+    val = await fetch_q.asubmit_query(executor=executor)
+    viz, spidx = _prefetched(fetch_q, _viz and await _viz, _spidx and await _spidx)
+    output = await loop.run_in_executor(_render_executor(), partial(_render, fetch_q, val, start,
+                   kind=kind, spidx_file=spidx_file, px=px, annot=annot, radius=radius, 
+                   viz=viz, spidx=spidx, fast=fast, template=template,
+                   fixed_layout=fixed_layout, encoder=encoder, smooth=smooth,
+                   tiled=tiled, render_pool=render_pool))
+    return _with_timings(fetch_q, output, timings, on_timings)
+
+
+_RENDER_EXECUTOR = None
+
+def _render_executor():
+    """
+    single thread executor shared by aquery() for matplotlib rendering.
+    """
+    global _RENDER_EXECUTOR
+    if _RENDER_EXECUTOR is None:
+        _RENDER_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rgbmaker-render')
+    return _RENDER_EXECUTOR
+
+
+def _render(fetch_q, val, start, **kwargs):
+    """
+    creates composite images and plots from the surveys returned by 
+    RGBMaker.submit_query() and returns fetch_q.throw_output().
+    takes the keyword arguments of _render_events().
+    """
+    for _ in _render_events(fetch_q, val, start, **kwargs):
+        pass
+    return fetch_q.throw_output()
+
+
+def _timings(fetch_q, on_timings=None):
+    """
+    adds the compute time of the Plan products to fetch_q.timings (the 'viz'
+    product is already recorded as vizier stages, 'spidx' as spidx), calls 
+    on_timings with its report and returns the report.
+    """
+    if fetch_q.plan is not None:
+        for node, t in fetch_q.plan.report()['time'].items():
+            if node != 'viz':
+                fetch_q.timings.add('spidx' if node == 'spidx' else 'plan', t, node)
+    report = fetch_q.timings.report()
+    if on_timings is not None:
+        on_timings(report)
+    return report
+
+
+def _with_timings(fetch_q, output, timings=False, on_timings=None):
+    """
+    output of query()/aquery(), with the timings report appended when asked.
+    """
+    if not (timings or on_timings):
+        return output
+    report = _timings(fetch_q, on_timings)
+    return tuple(output) + (report,) if timings else output
+
+
+def _out_bytes(string, kind):
+    """
+    size of an encoded image kept in memory, None for files and plots.
+    """
+    return nbytes(string) if kind in ('base64', 'uri', 'bytes') else None
+
+
+def _figure_timings(fetch_q, name, spans, string, kind):
+    """
+    records the render/encode spans returned by _rgbc_figure/_rgb_figure.
+    """
+    fetch_q.timings.add('render', spans['render'], name)
+    fetch_q.timings.add('encode', spans['encode'], name, _out_bytes(string, kind))
+
+
+def _flux_otext(fetch_q, label, s, es):
+    """
+    appends catalog fluxes and errors (S_<label>-i, S_<label>_e-i) to otext.
+    """
+    _s, _es = s.tolist(), es.tolist()
+    for i in range(len(_s)):
+        fetch_q.otext.append({f'S_{label}-{i+1}': f'{_s[i]} {str(s.unit)}'})
+        fetch_q.otext.append({f'S_{label}_e-{i+1}': f'{np.round(_es[i],3)} {str(es.unit)}'})
+
+
+def _save_kind(kind):
+    """
+    kind passed to save_fig/save_img, base64 output is encoded as a data uri.
+    """
+    return 'uri' if kind == 'base64' else kind
+
+
+def _uri(string, kind):
+    """
+    fetch_q.uri entry of a saved image: data uris and raw bytes are used as 
+    returned by the encoder, other outputs (paths) are quoted as before.
+    """
+    if kind in ('base64', 'uri', 'bytes'):
+        return string
+    return 'data:image/png;base64,' + urllib.parse.quote(string)
+
+
+def _render_events(fetch_q, val, start, kind='base64', spidx_file=None, px=480, annot=True,
+            radius=float(0.12), viz=None, spidx=None, fast=False, template=False,
+            fixed_layout=False, encoder=None, smooth=None, tiled=False, render_pool=None,
+            paths=False):
+    """
+    generator behind _render() and iquery(), yields 'contour' events when 
+    contour levels are known and an 'image' event as soon as each image is encoded.
+
+    viz and spidx take precomputed results of fetch_q.vz_query() and 
+    find_spidx(), these are queried here when None.
+    fast=True writes the composites without matplotlib (_render_fast_events),
+    tiled does the same band by band (_render_tiled_events). render_pool
+    renders the figures in worker processes (_rgbc_figure/_rgb_figure).
+    template and fixed_layout are passed to imgplt.new_figure(), encoder to
+    imgplt.save_fig(). Contours are computed once per (survey, levels) in a 
+    ContourCache, paths=True adds their vertices to the 'contour' events.
+    Composites, stretches, smoothing and catalog lookups are products of a 
+    Plan (see _plan) computed once, fetch_q.plan.report() lists reused nodes.
+    """
+    name = fetch_q.name
+    template = template and kind != 'plot'
+    encoder, _kind = encoder or {}, _save_kind(kind)
+    contours = ContourCache()
+    smoothing = _smoothing(radius, smooth)
 
     if fetch_q.server_down:
-        return fetch_q.throw_output()
+        return
+    if tiled:
+        yield from _render_tiled_events(fetch_q, val, start, kind=kind, px=px, radius=radius,
+                                        viz=viz, encoder=encoder, smoothing=smoothing,
+                                        rows=tiles.TILE_ROWS if tiled is True else int(tiled))
+        return
+    plan = _plan(fetch_q, val, radius=radius, viz=viz, spidx=spidx, spidx_file=spidx_file,
+                 smoothing=smoothing)
+    if fast:
+        yield from _render_fast_events(fetch_q, val, start, kind=kind, px=px, 
+                                       radius=radius, viz=viz, encoder=encoder,
+                                       contours=contours if paths else None, plan=plan,
+                                       smoothing=smoothing)
+        return
 
     else:
         if fetch_q.c:
             fetch_q.otext.append({'Target center': fetch_q.c.to_string('hmsdms')})
-        if fetch_q.imagesopt == 1 and fetch_q.c:
-            # --- using variables for readability -#--#
-            tgss, dss2r, nvss, w22, gnuv, dss2i, dss2b = val['tgss']['data'], val[
-                'dss2r']['data'], val['nvss']['data'], val['w22']['data'], val[
-                    'gnuv']['data'], val['dss2ir']['data'], val['dss2b']['data']
-
-            # --- creating images ----------#--#
-            img1, lvlc1 = overlayc(tgss, dss2r, nvss, nvss, level_contour, 0.0015) # NVSS
-            img2, lvlc2 = overlayc(tgss, dss2r, nvss, tgss, level_contour, 0.015) # TGSS
-            img3 = overlayo(w22,dss2r,gnuv, kind='IOU')
-            img4 = overlayo(dss2i,dss2r,dss2b, kind='Optical')
-            if lvlc2 is not None:
-                fetch_q.otext.append({'TGSS contour ': (str(np.round(lvlc2, 3)))}) # TGSS
-            if lvlc1 is not None:
-                fetch_q.otext.append({'NVSS contour ': (str(np.round(lvlc1, 4)))}) # NVSS
-
-            # -------- plotting first plot -------------#--#
-            plt.ioff()
-            fig = plt.figure(figsize=(20, 20))
-
-            pl_RGBC(1, 2, 1, fetch_q.wcs, val['nvss']['data'], lvlc1, img1, fig, name,annot=annot)
-            pl_RGBC(1, 2, 2, fetch_q.wcs, val['tgss']['data'], lvlc2, img2, fig, name,annot=annot)
-            plt.subplots_adjust(wspace=0.01, hspace=0.01)
-
-            #-------- Saving first plot ------#--#
-            string = save_fig(plt, fig, kind)
-            
-            fetch_q.uri.append(
-                {'img1': 'data:image/png;base64,' + urllib.parse.quote(string)})
-
-            #-------- plotting second plot -----#--#
-            plt.ioff()
-            fig1 = plt.figure(figsize=(20, 20))
-            pl_RGBC(1, 2, 1, fetch_q.wcs, val['tgss']['data'], lvlc2, img3, fig1, name, pkind='iou',annot=annot)
-            pl_RGBC(1, 2, 2, fetch_q.wcs,
-                val['tgss']['data'], lvlc2, img4, fig1, name, pkind='iou',annot=annot)
-            plt.subplots_adjust(wspace=0.01, hspace=0.01)
-
-            #-------- Saving second plot ------#--#
-            string1 = save_fig(plt, fig1, kind)
-            
-            fetch_q.uri.append(
-                {'img2': 'data:image/png;base64,' + urllib.parse.quote(string1)})
+        pool = _render_pool(render_pool, kind)
+        shared = SharedArrays() if pool is not None else None
+        _fkw = dict(name=name, annot=annot, kind=_kind, template=template, 
+                    fixed_layout=fixed_layout, encoder=encoder)
+        if pool is None:
+            _fkw['contours'] = contours
+        try:
+            if fetch_q.imagesopt == 1 and fetch_q.c:
+                # --- creating images ----------#--#
+                plan.run('ror:tgss', 'ror:dss2r', 'ror:nvss', 'levels:nvss', 'levels:tgss')
+                plan.start('iou', 'optical')
+                tgss, nvss = plan[_contour_node('tgss', smoothing)], plan[_contour_node('nvss', smoothing)]
+                img1, lvlc1 = plan['ror'], plan['levels:nvss'] # NVSS
+                img2, lvlc2 = plan['ror'], plan['levels:tgss'] # TGSS
+                yield from _contour_events(fetch_q, [('TGSS', tgss, lvlc2), ('NVSS', nvss, lvlc1)],
+                                           contours if paths else None)
+
+                # -------- plotting first plot -------------#--#
+                _f1 = _figure(pool, shared, _rgbc_figure, fetch_q.wcs, nvss, lvlc1, img1,
+                              tgss, lvlc2, img2, pkind='ror', **_fkw)
+                _second = lambda: _figure(pool, shared, _rgbc_figure, fetch_q.wcs, tgss, lvlc2,
+                                          plan['iou'], tgss, lvlc2, plan['optical'], pkind='iou', **_fkw)
+                # in a pool both figures are rendered at the same time
+                _f2 = _second() if pool is not None else None
+
+                #-------- Saving first plot ------#--#
+                string, spans = _f1.result()
+                _figure_timings(fetch_q, 'img1', spans, string, kind)
+                fetch_q.uri.append(
+                    {'img1': _uri(string, kind)})
+                yield _event('image', name='img1', uri=fetch_q.uri[-1]['img1'])
 
-            #-------- Output for success -----#--#
-            time_taken = perf_counter()-start
-            fetch_q.info = 'completed in ' + str(np.round(time_taken, 3))+". "
-            fetch_q.status = "success"
-            
-        elif fetch_q.imagesopt == 2 and fetch_q.c:
-            
-            tgss, dss2r, nvss, first = val['tgss']['data'], val[
-                'dss2r']['data'], val['nvss']['data'], val['first']['data']
-
-            # --- plots initialization ------#--#
-            #img1, lvlc1 = overlayc(tgss, dss2r, nvss, tgss, level_contour, 0.015)
-            if tgss.max() > 0.015:
-                lvlct = np.arange(0.015, tgss.max(), ((tgss.max() - 0.015)/level_contour))
-                fetch_q.otext.append({'TGSS contour ': (str(np.round(lvlct.tolist(), 3)))})
-            else:
-                lvlct = None
-            if first.max() > 0.0005:
-                lvlcf = np.arange(0.0005, first.max(),
-                                    ((first.max() - 0.0005)/level_contour))
-                fetch_q.otext.append({'FIRST contour ': (str(np.round(lvlcf, 4)))})
-            else:
-                lvlcf = None
-            if nvss.max() > 0.0015:
-                lvlcn = np.arange(0.0015, nvss.max(), ((nvss.max() - 0.0015)/level_contour))
-                fetch_q.otext.append({'NVSS contour ': (str(np.round(lvlcn.tolist(), 4)))})
-            else:
-                lvlcn = None
-
-            #--- plotting --------------------#--#
-            plt.ioff()
-            fig = plt.figure(figsize=(20, 20))
-            title = ' TGSS(GMRT)-NVSS(VLA)-DSS2R(DSS)'
-            dss2r = sqrt(dss2r, scale_min=np.percentile(
-                np.unique(dss2r), 1.), scale_max=np.percentile(np.unique(dss2r), 100.))
-
-            #--- RGBC plot -------------------#--#
-            ax1 = fig.add_subplot(1,2,1, projection=fetch_q.wcs) 
-            pl_RGB(ax1, dss2r, title, name, annot)
-            
-            #--- vizier access ---------------#--
-            # TODO : return table in output
-            tgss_viz, nvss_viz = fetch_q.vz_query()
-            if tgss_viz is not None:
-                tmaj, tmin, tPA, tcen, s_tgss, es_tgss = tgss_viz
-            if nvss_viz is not None:
-                nmaj, nmin, nPA, ncen, s_nvss, es_nvss = nvss_viz
-            try:
-                try:
-                    patch1 = []
-                    for i in range(len(tcen[0])):
-                        x, y = tcen[0][i], tcen[1][i]
-                        ce = PixCoord(x, y)
-                        a = to_pixel(tmaj[i], fetch_q.r, px)
-                        b = to_pixel(tmin[i], fetch_q.r, px)
-                        theta =Angle(tPA[i], 'deg') + 90*ut.deg
-
-                        reg = EllipsePixelRegion(center=ce, width=a, height=b, angle=theta)
-                        ellipse = reg.as_artist(facecolor='none', edgecolor='magenta', lw=2)
-                        patch1.append(ellipse)
-                        #kwar = dict(arrowprops=dict(arrowstyle="->", ec=".5",
-                        #                              relpos=(0.5, 0.5)),
-                        #              bbox=dict(boxstyle="round", ec="none", fc="w"))
-                        ax1.annotate(i+1, xy=(x,y),
-                                    xytext=(0, 0), textcoords="offset points", color="magenta")
-                                    #ha="right", va="top")#, **kwar)
-                        fetch_q.otext.append({f'S_TGSS-{i+1}': f'{s_tgss.tolist()[i]} {str(s_tgss.unit)}'})
-                        fetch_q.otext.append({f'S_TGSS_e-{i+1}': f'{np.round(es_tgss.tolist()[i],3)} {str(es_tgss.unit)}'})
-                    tgss_catalog = PatchCollection(
-                    patch1, edgecolor='magenta', facecolor='None')
-                    
-                    ax1.add_collection(tgss_catalog)
-                
-                finally:
-                    patch2 = []
-                    for i in range(len(ncen[0])):
-                        x, y = ncen[0][i], ncen[1][i]
-                        ce = PixCoord(x, y)
-                        a = to_pixel(nmaj[i], fetch_q.r, px)
-                        b = to_pixel(nmin[i], fetch_q.r, px)
-                        if nPA[i] != 0 and nPA[i] != '--':
-                            theta = Angle(nPA[i], 'deg') + 90*ut.deg
-                        else:
-                            theta = 0*ut.deg + 90*ut.deg
-
-                        reg = EllipsePixelRegion(
-                            center=ce, width=a, height=b, angle=theta)
-                        ellipse = reg.as_artist(
-                            facecolor='none', edgecolor='cyan', lw=2)
-                        patch2.append(ellipse)
-                        ax1.annotate(i+1, xy=(x, y),
-                                    xytext=(0, 0), textcoords="offset points", color="cyan",
-                                        ha="right", va="top")#, **kwar)
-                        
-                        fetch_q.otext.append({f'S_NVSS-{i+1}': f'{s_nvss.tolist()[i]} {str(s_nvss.unit)}'})
-                        fetch_q.otext.append({f'S_NVSS_e-{i+1}': f'{np.round(es_nvss.tolist()[i],3)} {str(es_nvss.unit)}'})
-                    nvss_catalog = PatchCollection(
-                        patch2, edgecolor='cyan', facecolor='None')
-                    ax1.add_collection(nvss_catalog)                
-            except:
-                fetch_q.info = "catalog data missing"
-            finally:
-                #ax1.legend(framealpha=0.0, labelcolor='white')
-                if spidx_file is not None:
-                    kwargs = dict(arrowprops=dict(arrowstyle="->", ec=".5",
-                                    relpos=(0.5, 0.5)),
-                    bbox=dict(boxstyle="round", ec="none", fc="w"))
-                    xi, yi, spidx = find_spidx(spidx_file, fetch_q.c, fetch_q.r)
-                    for ien in range(len(xi)):
-                        #print(ien)
-                        Xi, Yi = fetch_q.wcs.world_to_pixel(SkyCoord(xi[ien]*ut.deg, yi[ien]*ut.deg)) 
-                        #print(Xi,Yi, spidx)
-                        ax1.annotate(f'{spidx[ien]}', xy=(Xi, Yi),
-                                        xytext=(1, -40), textcoords="offset points",
-                                        ha="right", va="top", **kwargs)
-
-                #-------- single survey plot ---------#--#
-                dss2r = sqrt(dss2r, scale_min=np.percentile(
-                    np.unique(dss2r), 1.), scale_max=np.percentile(np.unique(dss2r), 100.))
-                ax2 = fig.add_subplot(1, 2, 2, projection=fetch_q.wcs)
-                pl_RGB(ax2, dss2r, title='TGSS(GMRT)-NVSS(VLA)-FIRST(VLA)-DSS2R(DSS)', name=name, annot=annot)
-                
-                ax2.contour(nvss, lvlcn, colors='cyan')
-                ax2.contour(tgss, lvlct, colors='magenta')
-                smooth_first        =   gaussian_filter(first, sigma=1)
-                if float(radius)<0.12:
-                    smooth_first    =   gaussian_filter(first, sigma=2)
-                ax2.contour(smooth_first, lvlcf, colors='yellow')
-
-                leg1 = mpatches.Patch(color='cyan', label='NVSS')
-                leg2 = mpatches.Patch(color='magenta', label='TGSS')
-                leg3 = mpatches.Patch(color='yellow', label='FIRST')
-                leg4 = mpatches.Patch(color='white', label='DSS2R')
-                
-                ax2.legend(handles=[leg1, leg2, leg3, leg4],
-                        labelcolor='linecolor', framealpha=0.0,)
-                ax2.autoscale(False)
-                plt.subplots_adjust(wspace=0.01, hspace=0.01)
+                #-------- plotting second plot -----#--#
+                _f2 = _f2 or _second()
+
+                #-------- Saving second plot ------#--#
+                string1, spans = _f2.result()
+                _figure_timings(fetch_q, 'img2', spans, string1, kind)
+                fetch_q.uri.append(
+                    {'img2': _uri(string1, kind)})
+                yield _event('image', name='img2', uri=fetch_q.uri[-1]['img2'])
 
-                #-------- Saving final plot ------#--#
-                string1 = save_fig(plt, fig, kind)
+                #-------- Output for success -----#--#
+                time_taken = perf_counter()-start
+                fetch_q.info = 'completed in ' + str(np.round(time_taken, 3))+". "
+                fetch_q.status = "success"
+                
+            elif fetch_q.imagesopt == 2 and fetch_q.c:
                 
+                _svys = [_contour_node(svy, smoothing) for svy in ('tgss', 'nvss', 'first')]
+                plan.start(*[n for n in ['viz', 'spidx', 'dss2r:sqrt2'] + _svys if n in plan])
+                tgss, nvss, smooth_first = [plan[n] for n in _svys]
+
+                # --- plots initialization ------#--#
+                lvlct, lvlcf, lvlcn = plan['levels:tgss'], plan['levels:first'], plan['levels:nvss']
+                yield from _contour_events(fetch_q, [('TGSS', tgss, lvlct), ('FIRST', smooth_first, lvlcf),
+                                                     ('NVSS', nvss, lvlcn)], contours if paths else None)
+
+                #--- plotting --------------------#--#
+                _f1 = _figure(pool, shared, _rgb_figure, fetch_q.wcs, plan['dss2r:sqrt'],
+                              plan['dss2r:sqrt2'], nvss, lvlcn, tgss, lvlct, smooth_first, lvlcf,
+                              plan['viz'], plan['spidx'] if spidx_file is not None else None,
+                              fetch_q.r, px, **_fkw)
+                string1, otext, info, spans = _f1.result()
+                _figure_timings(fetch_q, 'img1', spans, string1, kind)
+                fetch_q.otext.extend(otext)
+                if info is not None:
+                    fetch_q.info = info
 
                 #-------- Output for success -----#--#
                 fetch_q.uri.append(
-                    {'img1': 'data:image/png;base64,' + urllib.parse.quote(string1)})
+                    {'img1': _uri(string1, kind)})
+                yield _event('image', name='img1', uri=fetch_q.uri[-1]['img1'])
                 time_taken = perf_counter()-start
                 fetch_q.info = 'completed in ' + str(np.round(time_taken, 3))+". "
                 fetch_q.status = "success"
+        finally:
+            if shared is not None:
+                shared.close()
 
-        return fetch_q.throw_output()
\ No newline at end of file
+
+def _render_pool(render_pool, kind):
+    """
+    RenderPool used for the figures, None renders them in the calling thread
+    (always for kind='plot' and 'stream').
+    """
+    if not render_pool or kind in ('plot', 'stream'):
+        return None
+    return default_render_pool() if render_pool is True else render_pool
+
+
+def _figure(pool, shared, func, *args, **kwargs):
+    """
+    Future of func(*args, **kwargs), rendered right away in the calling thread
+    or submitted to pool with the array arguments in shared memory.
+    """
+    if pool is None:
+        _f = Future()
+        _f.set_result(func(*args, **kwargs))
+        return _f
+    return pool.submit(func, *[shared.share(a) if isinstance(a, np.ndarray) else a for a in args],
+                       **kwargs)
+
+
+def _rgbc_figure(wcs, svy1, lvlc1, img1, svy2, lvlc2, img2, name='', pkind='ror', annot=True,
+                 kind='uri', template=False, fixed_layout=False, encoder=None, contours=None):
+    """
+    saved figure of two pl_RGBC panels (img1 and img2 of imagesopt=1), 
+    run in the calling thread or in a RenderPool worker.
+    returns (saved figure, {'render': seconds, 'encode': seconds})
+    """
+    _t = perf_counter()
+    contours = contours if contours is not None else ContourCache()
+    fig, tpl = new_figure('rgbc', wcs, svy2.shape, template, fixed_layout)
+    pl_RGBC(1, 2, 1, wcs, svy1, lvlc1, img1, fig, name, pkind=pkind, annot=annot, tpl=tpl,
+            contours=contours)
+    pl_RGBC(1, 2, 2, wcs, svy2, lvlc2, img2, fig, name, pkind=pkind, annot=annot, tpl=tpl,
+            contours=contours)
+    fig.subplots_adjust(wspace=0.01, hspace=0.01)
+    _t1 = perf_counter()
+    saved = save_fig(plt, fig, kind, tight=not fixed_layout, close=tpl is None, **(encoder or {}))
+    return saved, {'render': _t1 - _t, 'encode': perf_counter() - _t1}
+
+
+def _rgb_figure(wcs, dss2r, dss2r2, nvss, lvlcn, tgss, lvlct, first, lvlcf, viz, spidx, r, px=480,
+                name='', annot=True, kind='uri', template=False, fixed_layout=False, encoder=None,
+                contours=None):
+    """
+    saved figure of imagesopt=2 (catalog and contour panels), run in the 
+    calling thread or in a RenderPool worker.
+    returns (saved figure, catalog otext, info or None, {'render': seconds, 
+    'encode': seconds})
+    """
+    _t = perf_counter()
+    contours = contours if contours is not None else ContourCache()
+    out = SimpleNamespace(otext=[], info=None)
+    fig, tpl = new_figure('rgb', wcs, dss2r.shape, template, fixed_layout)
+    title = ' TGSS(GMRT)-NVSS(VLA)-DSS2R(DSS)'
+
+    #--- RGBC plot -------------------#--#
+    ax1 = tpl.axes[0] if tpl else fig.add_subplot(1,2,1, projection=wcs) 
+    pl_RGB(ax1, dss2r, title, name, annot, tpl=tpl)
+    
+    #--- vizier access ---------------#--
+    # TODO : return table in output
+    tgss_viz, nvss_viz = viz
+    if tgss_viz is not None:
+        tmaj, tmin, tPA, tcen, s_tgss, es_tgss = tgss_viz
+    if nvss_viz is not None:
+        nmaj, nmin, nPA, ncen, s_nvss, es_nvss = nvss_viz
+    try:
+        try:
+            overlay_catalog(ax1, tcen, tmaj, tmin, tPA, r, px, color='magenta')
+            _flux_otext(out, 'TGSS', s_tgss, es_tgss)
+        
+        finally:
+            overlay_catalog(ax1, ncen, nmaj, nmin, nPA, r, px, color='cyan',
+                            ha="right", va="top")
+            _flux_otext(out, 'NVSS', s_nvss, es_nvss)
+    except:
+        out.info = "catalog data missing"
+    finally:
+        #ax1.legend(framealpha=0.0, labelcolor='white')
+        if spidx is not None:
+            kwargs = dict(arrowprops=dict(arrowstyle="->", ec=".5",
+                            relpos=(0.5, 0.5)),
+            bbox=dict(boxstyle="round", ec="none", fc="w"))
+            xi, yi, spidx = spidx
+            Xi, Yi = wcs.world_to_pixel(SkyCoord(np.asarray(xi)*ut.deg, np.asarray(yi)*ut.deg))
+            Xi, Yi = np.atleast_1d(Xi), np.atleast_1d(Yi)
+            for ien in range(len(xi)):
+                ax1.annotate(f'{spidx[ien]}', xy=(Xi[ien], Yi[ien]),
+                                xytext=(1, -40), textcoords="offset points",
+                                ha="right", va="top", **kwargs)
+
+        #-------- single survey plot ---------#--#
+        ax2 = tpl.axes[1] if tpl else fig.add_subplot(1, 2, 2, projection=wcs)
+        pl_RGB(ax2, dss2r2, title='TGSS(GMRT)-NVSS(VLA)-FIRST(VLA)-DSS2R(DSS)', name=name, annot=annot, tpl=tpl)
+        
+        contours.draw(ax2, nvss, lvlcn, colors='cyan')
+        contours.draw(ax2, tgss, lvlct, colors='magenta')
+        contours.draw(ax2, first, lvlcf, colors='yellow')
+
+        leg1 = mpatches.Patch(color='cyan', label='NVSS')
+        leg2 = mpatches.Patch(color='magenta', label='TGSS')
+        leg3 = mpatches.Patch(color='yellow', label='FIRST')
+        leg4 = mpatches.Patch(color='white', label='DSS2R')
+        
+        ax2.legend(handles=[leg1, leg2, leg3, leg4],
+                labelcolor='linecolor', framealpha=0.0,)
+        ax2.autoscale(False)
+        fig.subplots_adjust(wspace=0.01, hspace=0.01)
+
+        #-------- Saving final plot ------#--#
+        _t1 = perf_counter()
+        string1 = save_fig(plt, fig, kind, tight=not fixed_layout, close=tpl is None,
+            **(encoder or {}))
+    return string1, out.otext, out.info, {'render': _t1 - _t, 'encode': perf_counter() - _t1}
+
+def _render_fast_events(fetch_q, val, start, kind='base64', px=480, radius=float(0.12), viz=None,
+                        encoder=None, contours=None, plan=None, smoothing=None):
+    """
+    matplotlib free _render_events(), the composite arrays are written 
+    directly by imgplt.save_img with contours and catalog ellipses rasterized 
+    into the arrays. Panels are placed side by side as in the figures, without
+    axes, titles, annotations or spidx labels.
+    """
+    encoder = encoder or {}
+    smoothing = smoothing or _smoothing(radius)
+    plan = plan or _plan(fetch_q, val, radius=radius, viz=viz, smoothing=smoothing)
+    if fetch_q.c:
+        fetch_q.otext.append({'Target center': fetch_q.c.to_string('hmsdms')})
+    if fetch_q.imagesopt == 1 and fetch_q.c:
+        plan.run('ror:tgss', 'ror:dss2r', 'ror:nvss', 'levels:nvss', 'levels:tgss')
+        plan.start('iou', 'optical')
+        tgss, nvss = plan[_contour_node('tgss', smoothing)], plan[_contour_node('nvss', smoothing)]
+        # contours are drawn into the arrays, each panel gets its own copy
+        img1, lvlc1 = plan['ror'].copy(), plan['levels:nvss'] # NVSS
+        img2, lvlc2 = plan['ror'].copy(), plan['levels:tgss'] # TGSS
+        yield from _contour_events(fetch_q, [('TGSS', tgss, lvlc2), ('NVSS', nvss, lvlc1)], contours)
+
+        with fetch_q.timings.span('render', 'img1'):
+            _img = np.hstack((raster_contours(img1, nvss, lvlc1, WHITE),
+                              raster_contours(img2, tgss, lvlc2, WHITE)))
+        string = _save_img(fetch_q, _img, kind, 'img1', encoder)
+        fetch_q.uri.append({'img1': _uri(string, kind)})
+        yield _event('image', name='img1', uri=fetch_q.uri[-1]['img1'])
+
+        img3, img4 = plan['iou'], plan['optical']
+        with fetch_q.timings.span('render', 'img2'):
+            _img = np.hstack((raster_contours(img3, tgss, lvlc2, WHITE),
+                              raster_contours(img4, tgss, lvlc2, WHITE)))
+        string1 = _save_img(fetch_q, _img, kind, 'img2', encoder)
+        fetch_q.uri.append({'img2': _uri(string1, kind)})
+        yield _event('image', name='img2', uri=fetch_q.uri[-1]['img2'])
+
+    elif fetch_q.imagesopt == 2 and fetch_q.c:
+        _svys = [_contour_node(svy, smoothing) for svy in ('tgss', 'nvss', 'first')]
+        plan.start(*['viz', 'dss2r:gray', 'dss2r:gray2'] + _svys)
+        tgss, nvss, smooth_first = [plan[n] for n in _svys]
+        lvlct, lvlcf, lvlcn = plan['levels:tgss'], plan['levels:first'], plan['levels:nvss']
+        yield from _contour_events(fetch_q, [('TGSS', tgss, lvlct), ('FIRST', smooth_first, lvlcf),
+                                             ('NVSS', nvss, lvlcn)], contours)
+
+        _t = perf_counter()
+        # same stretches as the figure panels, the second one shows dss2r:sqrt2
+        panel1, panel2 = plan['dss2r:gray'].copy(), plan['dss2r:gray2'].copy()
+        _catalog_overlay(fetch_q, plan['viz'], lambda cen, maj, mn, pa, color:
+                         raster_ellipses(panel1, cen, maj, mn, pa, fetch_q.r, px, color=color))
+        raster_contours(panel2, nvss, lvlcn, CYAN)
+        raster_contours(panel2, tgss, lvlct, MAGENTA)
+        raster_contours(panel2, smooth_first, lvlcf, YELLOW)
+        _img = np.hstack((panel1, panel2))
+        fetch_q._timed('render', _t, 'img1')
+        string1 = _save_img(fetch_q, _img, kind, 'img1', encoder)
+        fetch_q.uri.append({'img1': _uri(string1, kind)})
+        yield _event('image', name='img1', uri=fetch_q.uri[-1]['img1'])
+
+    _completed(fetch_q, start)
+
+
+def _save_img(fetch_q, img, kind, name, encoder):
+    """
+    save_img() of img as name, recorded as the 'encode' stage of name.
+    """
+    with fetch_q.timings.span('encode', name) as _rec:
+        string = save_img(img, _save_kind(kind), output=name, **encoder)
+        _rec['bytes'] = _out_bytes(string, kind)
+    return string
+
+
+def _render_tiled_events(fetch_q, val, start, kind='base64', px=480, radius=float(0.12),
+                         viz=None, encoder=None, smoothing=None, rows=tiles.TILE_ROWS):
+    """
+    _render_fast_events() in bands of rows with rgbmaker.tiles, no full size
+    composite or stretched copy of a survey is made.
+    """
+    encoder, _kind = encoder or {}, _save_kind(kind)
+    _enc = dict(rows=rows, compression=encoder.get('compression'), fmt=encoder.get('fmt', 'png'))
+    smoothing = smoothing or _smoothing(radius)
+    data = {svy: _val['data'] for svy, _val in (val.items() if isinstance(val, dict) else ())}
+    if fetch_q.c:
+        fetch_q.otext.append({'Target center': fetch_q.c.to_string('hmsdms')})
+    if fetch_q.imagesopt == 1 and fetch_q.c:
+        tgss, nvss = data['tgss'], data['nvss']
+        lvlc1, lvlc2 = _survey_levels('nvss', nvss), _survey_levels('tgss', tgss)
+        yield from _contour_events(fetch_q, [('TGSS', tgss, lvlc2), ('NVSS', nvss, lvlc1)])
+        st, sn = smoothing.get('tgss'), smoothing.get('nvss')
+
+        ror = [tiles.ror_channel(data[svy], rows) for svy in ('tgss', 'dss2r', 'nvss')]
+        panels = [tiles.Panel(ror).contours(nvss, lvlc1, WHITE, sn),
+                  tiles.Panel(ror).contours(tgss, lvlc2, WHITE, st)]
+        with fetch_q.timings.span('render', 'img1') as _rec:
+            string = tiles.save_tiles(panels, tgss.shape, _kind, output='img1', **_enc)
+            _rec['bytes'] = _out_bytes(string, kind)
+        fetch_q.uri.append({'img1': _uri(string, kind)})
+        yield _event('image', name='img1', uri=fetch_q.uri[-1]['img1'])
+
+        iou = tiles.overlayo(data['w22'], data['dss2r'], data['gnuv'], 'IOU', rows)
+        optical = tiles.overlayo(data['dss2ir'], data['dss2r'], data['dss2b'], 'Optical', rows)
+        panels = [tiles.Panel(iou).contours(tgss, lvlc2, WHITE, st),
+                  tiles.Panel(optical).contours(tgss, lvlc2, WHITE, st)]
+        with fetch_q.timings.span('render', 'img2') as _rec:
+            string1 = tiles.save_tiles(panels, tgss.shape, _kind, output='img2', **_enc)
+            _rec['bytes'] = _out_bytes(string1, kind)
+        fetch_q.uri.append({'img2': _uri(string1, kind)})
+        yield _event('image', name='img2', uri=fetch_q.uri[-1]['img2'])
+
+    elif fetch_q.imagesopt == 2 and fetch_q.c:
+        tgss, nvss, first = data['tgss'], data['nvss'], data['first']
+        lvlct, lvlcn, lvlcf = [_survey_levels(svy, data[svy]) for svy in ('tgss', 'nvss', 'first')]
+        yield from _contour_events(fetch_q, [('TGSS', tgss, lvlct), ('FIRST', first, lvlcf),
+                                             ('NVSS', nvss, lvlcn)])
+
+        panel1 = tiles.Panel([tiles.gray_channel(data['dss2r'], rows)])
+        # same stretches as the figure panels, the second one shows dss2r:sqrt2
+        panel2 = (tiles.Panel([tiles.gray_channel(data['dss2r'], rows, twice=True)])
+                  .contours(nvss, lvlcn, CYAN, smoothing.get('nvss'))
+                  .contours(tgss, lvlct, MAGENTA, smoothing.get('tgss'))
+                  .contours(first, lvlcf, YELLOW, smoothing.get('first')))
+        _catalog_overlay(fetch_q, viz if viz is not None else fetch_q.vz_query(),
+                         lambda cen, maj, mn, pa, color:
+                         panel1.ellipses(cen, maj, mn, pa, fetch_q.r, px, color=color))
+        with fetch_q.timings.span('render', 'img1') as _rec:
+            string1 = tiles.save_tiles([panel1, panel2], tgss.shape, _kind, output='img1', **_enc)
+            _rec['bytes'] = _out_bytes(string1, kind)
+        fetch_q.uri.append({'img1': _uri(string1, kind)})
+        yield _event('image', name='img1', uri=fetch_q.uri[-1]['img1'])
+
+    _completed(fetch_q, start)
+
+
+def _contour_events(fetch_q, contoured, contours=None):
+    """
+    appends the levels of each (survey, svy, levels) of contoured to otext 
+    and yields their 'contour' events (see _contour_event).
+    """
+    for survey, svy, levels in contoured:
+        if levels is not None:
+            fetch_q.otext.append({survey + ' contour ': str(np.round(levels, CONTOUR_DECIMALS[survey]))})
+    for survey, svy, levels in contoured:
+        yield _contour_event(survey, svy, levels, contours)
+
+
+def _catalog_overlay(fetch_q, viz, draw):
+    """
+    draws the TGSS and NVSS sources of viz (vz_query() output) with 
+    draw(center, major, minor, pa, color) and appends their fluxes to otext,
+    sets info when the catalog data is missing.
+    """
+    tgss_viz, nvss_viz = viz
+    try:
+        try:
+            tmaj, tmin, tPA, tcen, s_tgss, es_tgss = tgss_viz
+            draw(tcen, tmaj, tmin, tPA, MAGENTA)
+            _flux_otext(fetch_q, 'TGSS', s_tgss, es_tgss)
+        finally:
+            nmaj, nmin, nPA, ncen, s_nvss, es_nvss = nvss_viz
+            draw(ncen, nmaj, nmin, nPA, CYAN)
+            _flux_otext(fetch_q, 'NVSS', s_nvss, es_nvss)
+    except:
+        fetch_q.info = "catalog data missing"
+
+
+def _completed(fetch_q, start):
+    """
+    success status and time taken once images were written.
+    """
+    if fetch_q.uri:
+        time_taken = perf_counter()-start
+        fetch_q.info = 'completed in ' + str(np.round(time_taken, 3))+". "
+        fetch_q.status = "success"
+
+
+def _plan(fetch_q, val, radius=float(0.12), viz=None, spidx=None, spidx_file=None, smoothing=None):
+    """
+    returns the Plan of the products rendered for fetch_q.imagesopt (also set
+    as fetch_q.plan). Surveys of val are value nodes, viz and spidx are used
+    when precomputed, else the 'viz'/'spidx' nodes query them.
+
+        - imagesopt=1 : ror:<svy> (stretched channels), ror (composite of img1
+                        and img2), iou, optical, levels:tgss/nvss
+        - imagesopt=2 : dss2r:sqrt, dss2r:sqrt2 (stretch of dss2r:sqrt shown 
+                        on the second panel), dss2r:gray/gray2 (uint8 of both
+                        for fast=True), levels:tgss/first/nvss,
+                        viz, spidx
+        - smooth:<svy>:<sigma> for each survey of smoothing (see _smoothing)
+    """
+    plan = Plan()
+    for svy, _val in (val.items() if isinstance(val, dict) else ()):
+        plan.add(svy, value=_val['data'])
+    plan.add('levels:tgss', _contour_levels, 'tgss', *CONTOUR_LEVELS['tgss'])
+    plan.add('levels:nvss', _contour_levels, 'nvss', *CONTOUR_LEVELS['nvss'])
+    if fetch_q.imagesopt == 1:
+        for svy in ('tgss', 'dss2r', 'nvss'):
+            plan.add('ror:' + svy, ror_channel, svy)
+        plan.add('ror', _stack, 'ror:tgss', 'ror:dss2r', 'ror:nvss')
+        plan.add('iou', overlayo, 'w22', 'dss2r', 'gnuv', kind='IOU')
+        plan.add('optical', overlayo, 'dss2ir', 'dss2r', 'dss2b', kind='Optical')
+    elif fetch_q.imagesopt == 2:
+        plan.add('levels:first', _contour_levels, 'first', *CONTOUR_LEVELS['first'])
+        plan.add('dss2r:sqrt', _sqrt_dss2r, 'dss2r')
+        plan.add('dss2r:sqrt2', _sqrt_dss2r, 'dss2r:sqrt')
+        plan.add('dss2r:gray', gray_rgb, 'dss2r:sqrt')
+        plan.add('dss2r:gray2', gray_rgb, 'dss2r:sqrt2')
+        if viz is not None:
+            plan.add('viz', value=viz)
+        else:
+            plan.add('viz', fetch_q.vz_query)
+        if spidx is not None:
+            plan.add('spidx', value=spidx)
+        elif spidx_file is not None:
+            plan.add('spidx', find_spidx, spidx_file, fetch_q.c, fetch_q.r)
+    smoothing = smoothing or _smoothing(radius)
+    for svy, sigma in smoothing.items():
+        if sigma and svy in plan:
+            plan.add(_contour_node(svy, smoothing), smooth_svy, svy, sigma)
+    fetch_q.plan = plan
+    return plan
+
+
+def _smoothing(radius=float(0.12), smooth=None):
+    """
+    gaussian sigma (px) of each contoured survey: FIRST is smoothed with 
+    sigma=1 (2 when radius < 0.12) unless smooth overrides it.
+    """
+    smoothing = {'first': 2 if float(radius)<0.12 else 1}
+    smoothing.update({str(k).lower(): v for k, v in (smooth or {}).items()})
+    return smoothing
+
+
+def _contour_node(svy, smoothing):
+    """
+    plan node of the array contoured for svy, smooth:<svy>:<sigma> or svy.
+    """
+    sigma = smoothing.get(svy)
+    return 'smooth:{}:{}'.format(svy, sigma) if sigma else svy
+
+
+def _stack(*channels):
+    """
+    (px,px,3) composite of three channels.
+    """
+    return np.dstack(channels)
+
+
+def _sqrt_dss2r(dss2r, approx=False):
+    """
+    sqrt stretch of DSS2R between the 1st and 100th percentile of its distinct
+    values, both from one channel_stats() call.
+    """
+    _min, _max = channel_stats(dss2r, (1., 100.), approx=approx)
+    return sqrt(dss2r, scale_min=_min, scale_max=_max)
+
+
+def _survey_levels(name, svy):
+    """
+    contour levels of survey name (see CONTOUR_LEVELS) for the array svy.
+    """
+    return _contour_levels(svy, *CONTOUR_LEVELS[name])
+
+
+def _contour_levels(svy, cmin, lvl):
+    """
+    lvl contour levels from cmin to svy.max() or None when svy.max() <= cmin.
+    """
+    if svy.max() > cmin:
+        return np.arange(cmin, svy.max(), ((svy.max() - cmin)/lvl))
+    return None
@@ -1,12 +1,16 @@
 import numpy as np
 import math
 
-from astropy import units as ut
-from matplotlib import pyplot as plt
-from matplotlib.offsetbox import AnchoredText
+from rgbmaker.lazy import lazy
 from os import path, makedirs
 import base64
 import io
+import threading
+
+# matplotlib and astropy are only imported by the plotting functions
+ut = lazy('astropy.units')
+plt = lazy('matplotlib.pyplot')
+AnchoredText = lazy('matplotlib.offsetbox', 'AnchoredText')
 
 # -- below are slight modifications of
 # original author: Min-Su Shin , University of Michigan ----- #-#
@@ -129,43 +133,595 @@ Performs log10 scaling of the input numpy array.
         print ("Error on math.log10 ")
     return imageData
 
+# ---------- fused stretch engine -----------------------#-#
+
+_SCRATCH = threading.local()
+SCRATCH_MAX_BYTES = 4*1024**2   # 1024x1024 float32
+
+def _scratch(shape, slot=0):
+  """
+  float32 work buffer of this thread, reallocated only when the shape changes.
+  Buffers over SCRATCH_MAX_BYTES are allocated per call and not kept, so long
+  lived threads (service, Plan executor) do not hold large px buffers.
+  """
+  shape = tuple(shape)
+  if 4*int(np.prod(shape)) > SCRATCH_MAX_BYTES:
+    return np.empty(shape, np.float32)
+  if not hasattr(_SCRATCH, 'bufs'):
+    _SCRATCH.bufs = {}
+  buf = _SCRATCH.bufs.get(slot)
+  if buf is None or buf.shape != shape:
+    buf = _SCRATCH.bufs[slot] = np.empty(shape, np.float32)
+  return buf
+
+def stretch(inputArray, kind='linear', scale_min=None, scale_max=None, factor=2.0,
+            scale=None, clip=False, out=None):
+  """
+Fused version of linear(), sqrt() and log(): clipping, transfer function and
+(optionally) uint8 quantization are done with in-place ufuncs on one float32
+buffer instead of copies and np.where index passes. The input is not modified.
+
+  :inputArray:
+    numpy array
+    image data array
+  :kind:
+    'linear', 'sqrt', 'log' or None (no transfer function, quantization only)
+  :scale_min/scale_max:
+    float
+    minimum/maximum data value, None uses the data min/max
+  :factor:
+    float
+    logarithm factor of kind='log'
+  :scale:
+    None returns the float32 result, a number returns uint8 of result*scale,
+    'max' uses 255/max(result) (as overlayo).
+  :clip:
+    clamp the result to 1 before quantization (as overlayc)
+  :out:
+    preallocated output, float32 when scale is None else uint8 
+    (ex. a channel view img[..., i] of the final image).
+  :return:
+    out
+  """
+  x = np.asarray(inputArray)
+  if kind is not None:
+    if scale_min is None:
+      scale_min = x.min()
+    if scale_max is None:
+      scale_max = x.max()
+  if scale is None:
+    buf = np.empty(x.shape, np.float32) if out is None else out
+  else:
+    buf = _scratch(x.shape)
+  if kind == 'log':
+    _in = (x >= scale_min) & (x <= scale_max)
+    np.copyto(buf, x, casting='unsafe')
+    np.putmask(buf, x < 0, 0.)
+    np.putmask(buf, x > scale_max, 1.)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      # negative values inside the range are 0 by now (-inf, as log() gives)
+      np.log10(buf, out=buf, where=_in)
+      np.divide(buf, factor, out=buf, where=_in)
+  elif kind in ('linear', 'sqrt'):
+    # bounds rounded like the buffer, so that clipped values map to 0 and 1 exactly
+    _min, _max = buf.dtype.type(scale_min), buf.dtype.type(scale_max)
+    np.clip(x, _min, _max, out=buf)
+    np.subtract(buf, _min, out=buf)
+    if kind == 'sqrt':
+      np.sqrt(buf, out=buf)
+      np.divide(buf, math.sqrt(scale_max - scale_min), out=buf)
+    else:
+      np.divide(buf, scale_max - scale_min, out=buf)
+  elif buf is not x:
+    np.copyto(buf, x, casting='unsafe')
+  if scale is None:
+    return buf
+  if clip:
+    np.minimum(buf, 1., out=buf)
+  if isinstance(scale, str):
+    scale = 255/buf.max()
+  np.multiply(buf, scale, out=buf)
+  if out is None:
+    out = np.empty(x.shape, np.uint8)
+  np.copyto(out, buf, casting='unsafe')
+  return out
+
+def channel_stats(x, q=(1., 100.), unique=True, approx=False, bins=4096):
+  """
+Percentiles q of one channel computed together, replaces repeated calls of
+np.percentile(np.unique(x), q) (one sort per channel instead of one per 
+percentile). 0 and 100 are the min and max, without sorting.
+
+  :x:
+    numpy array
+    image data array
+  :q:
+    sequence of percentiles
+  :unique:
+    percentiles of the distinct values (as used by the stretches), 
+    False uses all pixel values.
+  :approx:
+    O(n) estimate from a histogram of the pixel values instead of sorting.
+    The result is within (max-min)/bins of np.percentile(x, q). Repeated 
+    values are counted, so it matches the distinct value percentiles only 
+    when pixel values do not repeat (float surveys).
+  :bins:
+    histogram bins of approx
+  :return:
+    numpy array of len(q)
+  """
+  x = np.asarray(x).ravel()
+  q = np.asarray(q, dtype=float)
+  if np.all((q == 0) | (q == 100)):
+    return np.where(q == 0, x.min(), x.max())
+  if approx:
+    return _hist_percentile(x, q, bins)
+  #-- one scalar q at a time keeps the dtype of x (float32 surveys), as the
+  #-- separate np.percentile(np.unique(x), 1.) calls did ---#-#
+  _x = np.unique(x) if unique else x
+  return np.array([np.percentile(_x, p) for p in q.tolist()])
+
+def _hist_percentile(x, q, bins):
+  """
+  percentiles of x from a histogram of bins equal bins, each order statistic
+  is estimated by the center of its bin (error <= half a bin) and interpolated
+  like np.percentile.
+  """
+  lo, hi = x.min(), x.max()
+  if not (np.isfinite(lo) and np.isfinite(hi)) or lo == hi:
+    return np.full(len(q), hi, dtype=float)
+  _w = (float(hi) - float(lo))/bins
+  _dt = np.float32 if x.dtype == np.float32 else np.float64
+  counts = np.zeros(bins, np.intp)
+  _tmp = np.empty(min(len(x), 1 << 20), _dt)
+  for i in range(0, len(x), len(_tmp)):
+    _t = _tmp[:min(len(_tmp), len(x) - i)]
+    np.subtract(x[i:i + len(_t)], lo, out=_t, casting='unsafe')
+    np.multiply(_t, _dt(1/_w), out=_t)
+    _idx = _t.astype(np.int32)
+    np.minimum(_idx, bins - 1, out=_idx)
+    counts += np.bincount(_idx, minlength=bins)
+  cdf = np.cumsum(counts)
+  rank = q/100*(len(x) - 1)
+  _lo, _hi = np.floor(rank), np.ceil(rank)
+  v_lo = lo + (np.searchsorted(cdf, _lo, side='right') + 0.5)*_w
+  v_hi = lo + (np.searchsorted(cdf, _hi, side='right') + 0.5)*_w
+  val = np.clip(v_lo + (v_hi - v_lo)*(rank - _lo), lo, hi)
+  return np.where(q == 0, lo, np.where(q == 100, hi, val))
+
+SMOOTH_FFT_SIGMA = 4
+SMOOTH_FFT_PX = 512
+
+def smooth(img, sigma, method='auto', truncate=4.0):
+  """
+Gaussian smoothing of a survey for contours, same result as 
+scipy.ndimage.gaussian_filter(img, sigma, truncate=truncate) (mode='reflect').
+
+  :img:
+    (2D array)
+  :sigma:
+    float
+    gaussian sigma in pixels, 0 or None returns img.
+  :method:
+    'direct' : separable gaussian_filter, fastest for narrow kernels.
+    'fft'    : one fftconvolve of the reflect padded image, its cost does 
+               not grow with sigma.
+    'auto'   : fft when sigma > SMOOTH_FFT_SIGMA and the image is at least
+               SMOOTH_FFT_PX wide, else direct.
+  :return:
+    (2D array) smoothed image (float32 stays float32).
+  """
+  from scipy.ndimage import gaussian_filter
+
+  if not sigma:
+    return img
+  img = np.asarray(img)
+  if method == 'auto':
+    method = 'fft' if sigma > SMOOTH_FFT_SIGMA and min(img.shape) >= SMOOTH_FFT_PX else 'direct'
+  if method == 'direct':
+    return gaussian_filter(img, sigma, truncate=truncate)
+  from scipy.signal import fftconvolve
+
+  _dt = img.dtype if img.dtype.kind == 'f' else np.float64
+  r = int(truncate*float(sigma) + 0.5)
+  k = np.exp(-0.5*(np.arange(-r, r + 1)/float(sigma))**2)
+  k = (k/k.sum()).astype(_dt)
+  _pad = np.pad(img.astype(_dt, copy=False), r, mode='symmetric')
+  return fftconvolve(_pad, np.outer(k, k), mode='valid').astype(_dt, copy=False)
+
 # ---------- author : @avialxee ---------#-#
 
 
-def save_fig(plt, fig, kind='base64', output='output.jpg'):
+def save_fig(plt, fig, kind='base64', output='output.jpg', tight=True, close=True, **encoder):
+    """
+    saves fig with encode(), kind is one of
     
-    if kind == 'base64':
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight',
-                    transparent=True, pad_inches=0)
-        buf.seek(0)
-        string = base64.b64encode(buf.read())
-        plt.close()
-        return string
-    elif kind == 'plot':
+        - 'base64' : base64 of the png (bytes)
+        - 'uri'    : ready data uri of the png (str)
+        - 'bytes'  : encoded png (bytes)
+        - 'stream' : writes the png into the file object output, returns output
+        - 'plot'   : shows the figure
+        - others   : format of the file output/<output> (png, jpg, ...), returns the path
+
+    tight=False skips the bbox_inches='tight' pass for figures with a fixed 
+    layout, close=False keeps the figure open (figure templates).
+    encoder takes the options of encode() (fmt, dpi, compression, quality).
+    """
+    if kind == 'plot':
         plt.show()
         return 'plotted'
+    _res = _encode_kind(fig, kind, output, tight=tight, **encoder)
+    if close:
+        plt.close()
+    return _res
+
+# ---------- encoders ---------------------------------------#-#
+
+def encode(src, fmt='png', dest=None, tight=True, transparent=False, dpi=None,
+           compression=None, quality=None):
+    """
+Encodes a matplotlib figure or a uint8 image array (origin='lower') once.
+
+  *Input*
+
+    :src:
+      matplotlib Figure or (np array) (px,px,3) / (px,px) uint8 image
+    :fmt:
+      (str) png, jpg, jpeg, webp, ... (default='png')
+    :dest:
+      None returns the encoded bytes, a path or a writable file object
+      receives the data directly (no copy held in memory).
+    :tight:
+      (bool) bbox_inches='tight' for figures
+    :transparent:
+      (bool) transparent figure background
+    :dpi:
+      (int) resolution of figures, None uses the figure dpi
+    :compression:
+      (int) png zlib level 0-9 (default 6)
+    :quality:
+      (int) jpeg/webp quality 1-100 (default 90)
+
+  *Returns*
+
+    bytes when dest is None else dest.
+  """
+    fmt = fmt.lower()
+    _pil_fmt = 'JPEG' if fmt in ('jpg', 'jpeg') else fmt.upper()
+    if fmt == 'png':
+        _opts = {'compress_level': 6 if compression is None else int(compression)}
+    elif fmt in ('jpg', 'jpeg', 'webp'):
+        _opts = {'quality': 90 if quality is None else int(quality)}
+    else:
+        _opts = {}
+    _f = io.BytesIO() if dest is None else dest
+    if hasattr(src, 'savefig'):
+        _kw = dict(format=fmt, bbox_inches='tight' if tight else None, pad_inches=0,
+                   transparent=transparent)
+        if dpi is not None:
+            _kw['dpi'] = dpi
+        if _opts:
+            _kw['pil_kwargs'] = _opts
+        src.savefig(_f, **_kw)
+    else:
+        from PIL import Image
+        
+        Image.fromarray(np.ascontiguousarray(np.flipud(src))).save(_f, format=_pil_fmt, **_opts)
+    return _f.getvalue() if dest is None else dest
+
+def data_uri(data, fmt='png'):
+    """
+    data uri (str) of encoded bytes, base64 output is already uri safe.
+    """
+    _mime = 'jpeg' if fmt in ('jpg', 'jpeg') else fmt
+    return 'data:image/{};base64,'.format(_mime) + base64.b64encode(data).decode('ascii')
+
+def _encode_kind(src, kind, output, tight=True, fmt='png', **encoder):
+    """
+    encode() for the kinds of save_fig()/save_img().
+    """
+    if kind in ('base64', 'uri', 'bytes', 'stream'):
+        encoder.setdefault('transparent', True)
+    if kind in ('base64', 'uri', 'bytes'):
+        _buf = io.BytesIO()
+        encode(src, fmt, _buf, tight=tight, **encoder)
+        if kind == 'bytes':
+            return _buf.getvalue()
+        if kind == 'uri':
+            return data_uri(_buf.getbuffer(), fmt)
+        return base64.b64encode(_buf.getbuffer())
+    elif kind == 'stream':
+        return encode(src, fmt, output, tight=tight, **encoder)
     else :
-        if not path.exists('output'):
-            makedirs('output')
-        newPath = 'output/'+output
-        opt = newPath
-        if path.exists(newPath):
-            numb = 1
-            while path.exists(newPath):
-                newPath = "{0}_{2}{1}".format(
-                    *path.splitext(opt) + (numb,))
-                try :
-                    if path.exists(newPath):
-                        numb += 1 
-                except:
-                    pass               
-        fig.savefig(newPath, format=kind, bbox_inches='tight',
-                    pad_inches=0)
+        newPath = _new_path(output)
+        with open(newPath, 'wb') as f:
+            encode(src, kind, f, tight=tight, **encoder)
         print("saved {}".format(newPath))
-        plt.close()
         return newPath
 
+def _new_path(output):
+    """
+    returns an unused path output/<output>, numbered when it already exists.
+    """
+    if not path.exists('output'):
+        makedirs('output')
+    newPath = 'output/'+output
+    opt = newPath
+    if path.exists(newPath):
+        numb = 1
+        while path.exists(newPath):
+            newPath = "{0}_{2}{1}".format(
+                *path.splitext(opt) + (numb,))
+            try :
+                if path.exists(newPath):
+                    numb += 1 
+            except:
+                pass
+    return newPath
+
+# ---------- figure templates ------------------------------#-#
+
+_TEMPLATES = threading.local()
+_FIXED_FIGSIZE = (15.5, 7.75)
+
+class FigureTemplate:
+  """
+  A 1x2 figure of WCS axes kept between renders. Reusing it only swaps image
+  data, contours, catalogs, texts and titles instead of building a new
+  figure and axes. Templates are not managed by pyplot (never plt.close them).
+
+  :fixed:
+    fixed layout, axes fill a (15.5, 7.75) inch figure (about the size of the
+    tight 20x20 output) so that save_fig can be called with tight=False (no
+    extra tight bbox draw pass).
+  """
+
+  def __init__(self, wcs, fixed=False):
+    from matplotlib.figure import Figure
+
+    self.wcs = wcs
+    self.fixed = fixed
+    self.fig = Figure(figsize=_FIXED_FIGSIZE if fixed else (20, 20))
+    self.axes = [self.fig.add_subplot(1, 2, i, projection=wcs) for i in (1, 2)]
+    if fixed:
+      self.fig.subplots_adjust(left=0, right=1, bottom=0, top=1, wspace=0.01, hspace=0.01)
+    else:
+      self.fig.subplots_adjust(wspace=0.01, hspace=0.01)
+
+  def reset(self, wcs):
+    """
+    removes everything drawn by the previous render except the images.
+    """
+    for ax in self.axes:
+      for artist in list(ax.collections) + list(ax.texts) + list(ax.patches) + list(ax.lines):
+        artist.remove()
+      if ax.legend_ is not None:
+        ax.legend_.remove()
+      ax.set_title('')
+      if wcs is not self.wcs and not wcs.wcs.compare(self.wcs.wcs):
+        ax.reset_wcs(wcs)
+    self.wcs = wcs
+
+def get_template(layout, wcs, shape, fixed=False):
+  """
+  returns the FigureTemplate of this thread for (layout, image shape, fixed),
+  cleared and ready to draw on.
+  """
+  if not hasattr(_TEMPLATES, 'cache'):
+    _TEMPLATES.cache = {}
+  key = (layout, tuple(shape), bool(fixed))
+  if key not in _TEMPLATES.cache:
+    _TEMPLATES.cache[key] = FigureTemplate(wcs, fixed)
+  else:
+    _TEMPLATES.cache[key].reset(wcs)
+  return _TEMPLATES.cache[key]
+
+def new_figure(layout, wcs, shape, template=False, fixed=False):
+  """
+  returns (fig, tpl): a template figure when template is True,
+  else a new pyplot figure and None.
+  """
+  if template:
+    tpl = get_template(layout, wcs, shape, fixed)
+    return tpl.fig, tpl
+  plt.ioff()
+  fig = plt.figure(figsize=_FIXED_FIGSIZE if fixed else (20, 20))
+  if fixed:
+    fig.subplots_adjust(left=0, right=1, bottom=0, top=1)
+  return fig, None
+
+def _imshow(ax, img, tpl=None, **kwargs):
+  """
+  ax.imshow, or swaps the data of the image already on a template axes.
+  """
+  if tpl is not None and ax.images:
+    im = ax.images[0]
+    im.set_data(img)
+    if np.ndim(img) == 2:
+      im.autoscale()
+    return im
+  return ax.imshow(img, **kwargs)
+
+# ---------- contour cache ---------------------------------#-#
+
+class ContourCache:
+  """
+  Contour lines of a (survey array, levels) pair computed once and replayed on
+  any number of axes as a PathCollection, ex. the TGSS contours of img2, IOU
+  and Optical with imagesopt=1. Entries are matched on the array object
+  itself, so a cache belongs to one query.
+  """
+
+  def __init__(self):
+    self._lines = []
+
+  def lines(self, svy, lvlc):
+    """
+    returns [(vertices, codes)] per level, vertices as lists of (N, 2) pixel
+    coordinate arrays and codes as matplotlib Path codes.
+    """
+    _lvlc = tuple(np.atleast_1d(lvlc).tolist())
+    for _svy, _key, _lines in self._lines:
+      if _svy is svy and _key == _lvlc:
+        return _lines
+    _lines = _contour_lines(svy, _lvlc)
+    self._lines.append((svy, _lvlc, _lines))
+    return _lines
+
+  def vertices(self, svy, lvlc):
+    """
+    contour paths as nested lists [level][line][point] = [x, y] (pixels,
+    origin='lower'), for clients that draw their own overlays.
+    """
+    if lvlc is None:
+      return None
+    return [[v.tolist() for v in _verts] for _verts, _ in self.lines(svy, lvlc)]
+
+  def draw(self, ax, svy, lvlc, colors='white'):
+    """
+    draws the contours of svy at levels lvlc on ax like ax.contour. 
+    lvlc=None (automatic levels) is passed on to ax.contour.
+    """
+    if lvlc is None:
+      return ax.contour(svy, lvlc, colors=colors)
+    from matplotlib.collections import PathCollection
+    from matplotlib.path import Path
+
+    # one compound path per level, as ContourSet draws them
+    paths = [Path(np.concatenate(_verts), np.concatenate(_codes)) if len(_verts) else 
+             Path(np.empty((0, 2))) for _verts, _codes in self.lines(svy, lvlc)]
+    lw = plt.rcParams.get('contour.linewidth') or plt.rcParams['lines.linewidth']
+    contours = PathCollection(paths, facecolors='none', edgecolors=colors, linewidths=lw,
+                              transform=ax.transData, zorder=2)
+    ax.add_collection(contours, autolim=False)
+    return contours
+
+def _contour_lines(svy, lvlc):
+  """
+  marching squares of svy at each level of lvlc with the settings of
+  ax.contour (contourpy, or a throwaway Figure when it is not installed).
+  """
+  z = np.ma.masked_invalid(svy)
+  try:
+    import contourpy
+  except ImportError:
+    from matplotlib.figure import Figure
+
+    cs = Figure().add_subplot().contour(z, lvlc)
+    allkinds = cs.allkinds or [None]*len(cs.allsegs)
+    # matplotlib<=3.5 leaves the kinds of plain lines as None
+    return [(list(_segs), [_line_codes(v, c) for v, c in zip(_segs, _kinds or [None]*len(_segs))])
+            for _segs, _kinds in zip(cs.allsegs, allkinds)]
+  gen = contourpy.contour_generator(z=z, name=plt.rcParams.get('contour.algorithm', 'mpl2014'),
+                                    corner_mask=plt.rcParams['contour.corner_mask'],
+                                    line_type=contourpy.LineType.SeparateCode)
+  return [tuple(gen.lines(lvl)) for lvl in lvlc]
+
+def _line_codes(verts, kinds):
+  """
+  path codes of one contour line, MOVETO then LINETO when kinds is None.
+  """
+  if kinds is not None:
+    return kinds
+  from matplotlib.path import Path
+
+  codes = np.full(len(verts), Path.LINETO, dtype=Path.code_type)
+  codes[:1] = Path.MOVETO
+  return codes
+
+# ---------- matplotlib free output -----------------------#-#
+
+def save_img(img, kind='base64', output='output', **encoder):
+  """
+Writes a finished uint8 image array directly, without creating a figure.
+
+  *Input*
+
+    :img:
+      (np array)
+      dimension (px,px,3) or (px,px) with origin='lower' like the figures,
+      i.e. row 0 is the bottom of the image.
+    :kind:
+      (str) choose from 'base64', 'uri', 'bytes', 'stream', 'plot', 'png', 'jpg', 'jpeg', 'webp'
+        - 'base64', 'uri', 'bytes', 'stream' : png, as in save_fig()
+        - 'plot' : shows the image
+        - others : saves output/<output>.<kind>
+    :encoder:
+      options of encode() (fmt, compression, quality)
+
+  *Returns*
+
+    same as save_fig().
+  """
+  if kind == 'plot':
+    from PIL import Image
+
+    Image.fromarray(np.ascontiguousarray(np.flipud(img))).show()
+    return 'plotted'
+  if kind not in ('base64', 'uri', 'bytes', 'stream'):
+    output = '{}.{}'.format(output, kind)
+  return _encode_kind(img, kind, output, **encoder)
+
+def gray_rgb(img):
+  """
+  (px,px) image scaled to 0..1 as (px,px,3) uint8.
+  """
+  g = (np.clip(np.nan_to_num(img), 0, 1)*255.99).astype(np.uint8)
+  return np.dstack((g, g, g))
+
+def raster_contours(img, svy, lvlc, color=(255, 255, 255)):
+  """
+Draws contours of svy at levels lvlc into img (in place) without matplotlib.
+A pixel is on the contour of a level when it is above the level and one of
+its 4 neighbours is not (or the other way round), giving 1 px wide lines.
+
+  *Input*
+
+    :img:
+      (np array) uint8 (px,px,3)
+    :svy:
+      (2-D array) survey for contours, rows after the rows of img are only 
+      used as neighbours (bands of rows drawn by rgbmaker.tiles).
+    :lvlc:
+      (list) contour levels or None
+    :color:
+      (tuple) RGB color
+
+  *Returns*
+
+    img
+  """
+  if lvlc is None:
+    return img
+  for lvl in np.atleast_1d(lvlc):
+    above = svy >= lvl
+    edge = np.zeros(above.shape, dtype=bool)
+    edge[:-1, :] |= above[:-1, :] != above[1:, :]
+    edge[:, :-1] |= above[:, :-1] != above[:, 1:]
+    img[(edge & above)[:img.shape[0]]] = color
+  return img
+
+def raster_ellipses(img, cen, maj, mnr, pa, r, px=480, color=(255, 0, 255)):
+  """
+Draws catalog ellipses (see overlay_catalog) into img (in place) without matplotlib.
+
+  *Returns*
+
+    img
+  """
+  x = np.atleast_1d(np.asarray(cen[0], dtype=float))
+  y = np.atleast_1d(np.asarray(cen[1], dtype=float))
+  a = np.broadcast_to(to_pixel(_filled(maj), r, int(px)), x.shape)/2.
+  b = np.broadcast_to(to_pixel(_filled(mnr), r, int(px)), x.shape)/2.
+  theta = np.deg2rad(np.broadcast_to(_filled(pa), x.shape) + 90.)
+  t = np.linspace(0, 2*np.pi, 2*int(np.ceil(np.max(a, initial=1)))*4 + 16)[:, None]
+  xs = x + a*np.cos(t)*np.cos(theta) - b*np.sin(t)*np.sin(theta)
+  ys = y + a*np.cos(t)*np.sin(theta) + b*np.sin(t)*np.cos(theta)
+  xs, ys = np.rint(xs).astype(int).ravel(), np.rint(ys).astype(int).ravel()
+  inside = (xs >= 0) & (ys >= 0) & (xs < img.shape[1]) & (ys < img.shape[0])
+  img[ys[inside], xs[inside]] = color
+  return img
+
 
 def overlayc (r,g,b,c,lvl,cmin) :
   """
@@ -203,31 +759,42 @@ def overlayc (r,g,b,c,lvl,cmin) :
     (list)
     dimension: None or of length len(lvl)
   """
-  ri = normals(r)
-  gi = normals(g)
-  bi = normals(b)
-  if ri.max() != 0 and ri.min()!=0 :
-    ri = sqrt(ri,scale_min=0.1*np.std(ri),scale_max=np.max(ri))
-  if gi.max() != 0 and gi.min()!=0 :
-    gi = sqrt(gi, scale_min=0.1*np.std(gi), scale_max=np.max(gi))
-  if bi.max() != 0 and bi.min()!=0 :
-    bi = sqrt(bi,scale_min=0.1*np.std(bi),scale_max=np.max(bi))
-  replace = bi > 1
-  bi[replace] = 1
-  replace = gi > 1
-  gi[replace] = 1
-  replace = ri > 1
-  ri[replace] = 1
-
-  # Stacking the Images and set up as 8-bit integers (highest value 2^8 = 256)
-  img = (np.dstack((ri,gi,bi))*255.99).astype(np.uint8)
+  img = np.empty(np.shape(r) + (3,), np.uint8)
+  for i, o in enumerate((r, g, b)):
+    ror_channel(o, out=img[..., i])
+
   if c.max() > cmin :
     lvlc = np.arange(cmin, c.max(),((c.max() - cmin)/lvl))
   else :
     lvlc = None
   return img, lvlc
 
-def normals(o) :
+def ror_channel(o, out=None) :
+  """
+one channel of the overlayc composite: normals() and the sqrt stretch from
+0.1*std to max, quantized to uint8.
+
+*Input*
+
+  :o:
+    (2D array)
+    input survey
+  :out:
+    (2D array)
+    preallocated uint8 array (ex. img[..., i]) for the result.
+
+*Returns*
+
+  :(2D array):
+    uint8, dimension same as input survey
+  """
+  oi = normals(o, out=_scratch(np.shape(o), 1))
+  if oi.max() != 0 and oi.min()!=0 :
+    return stretch(oi, 'sqrt', scale_min=0.1*np.std(oi), scale_max=np.max(oi), scale=255.99,
+                   clip=True, out=out)
+  return stretch(oi, None, scale=255.99, clip=True, out=out)
+
+def normals(o, out=None) :
   """
 normalizing before scaling
 
@@ -236,6 +803,9 @@ normalizing before scaling
   :o:
     (2D array)
     input survey
+  :out:
+    (2D array)
+    preallocated float32 array for the result, computed in place.
 
 *Returns*
 
@@ -243,6 +813,11 @@ normalizing before scaling
     dimension same as input survey
 
   """
+  if out is not None :
+    np.subtract(o, np.median(o), out=out)
+    if o.max()!=0 :
+      np.divide(out, o.max(), out=out)
+    return out
   X_scaled =(o - np.median(o))
   if o.max()!=0 :
     X = X_scaled/o.max()
@@ -296,7 +871,7 @@ plot powerlaw of spectralindex
   label=f"{label}.{kind}"
   outputfile = save_fig(plt,fig,kind,output=label)
   
-def pl_RGB(ax, img,title,name,annot=True):
+def pl_RGB(ax, img,title,name,annot=True, tpl=None):
   """
     *Inputs*
     
@@ -320,6 +895,9 @@ def pl_RGB(ax, img,title,name,annot=True):
         :name:
           (string)
           input name to be show on figure
+        :tpl:
+          (FigureTemplate)
+          reuse the image of ax from a previous render, see get_template().
 
     *Returns*
     
@@ -328,7 +906,7 @@ def pl_RGB(ax, img,title,name,annot=True):
   #--- RGBC plot -------------------#--#
 
   ax.axis('off')
-  ax.imshow(img, origin='lower', cmap='gist_gray')
+  _imshow(ax, img, tpl, origin='lower', cmap='gist_gray')
   if annot:
       ax.annotate("#RADatHomeIndia",(10,10),color='white')
       ax.annotate("By " + str(name),(400-5*len(name),10),color='white')
@@ -336,7 +914,7 @@ def pl_RGB(ax, img,title,name,annot=True):
                     y=1, pad=-16, color="white")
   ax.set_autoscale_on(False)
 
-def overlayo(ri, gi, bi, kind = 'IOU'):
+def overlayo(ri, gi, bi, kind = 'IOU', approx=False):
   """
   Returns RGB stacked image.
 
@@ -348,6 +926,9 @@ def overlayo(ri, gi, bi, kind = 'IOU'):
     :kind:
       (string)
       either IOU or Optical
+    :approx:
+      (bool)
+      histogram estimate of the percentiles, see channel_stats().
 
   *Returns*
 
@@ -361,23 +942,22 @@ def overlayo(ri, gi, bi, kind = 'IOU'):
         - Optical
           - sqrt, sqrt, sqrt (min to max)
   """
+  img = np.empty(np.shape(ri) + (3,), np.uint8)
   if kind == 'IOU':
-    ri = sqrt(ri, scale_min=np.percentile(np.unique(ri),1.), scale_max=np.percentile(np.unique(ri),100.))
-    gi = sqrt(gi, scale_min=np.percentile(np.unique(gi),1.), scale_max=np.percentile(np.unique(gi),100.))
-    bi = log(bi, scale_min=np.percentile(np.unique(bi), 5.),
-             scale_max=np.percentile(np.unique(bi), 100.), factor=3.15)
-    mul_factor = 255/ri.max()
-    img = (np.transpose([(ri*mul_factor).astype(np.uint8),(gi*255/gi.max()).astype(np.uint8),(bi*255).astype(np.uint8)], (1, 2, 0)))
+    (r1, r100), (g1, g100), (b5, b100) = (channel_stats(ri, (1., 100.), approx=approx),
+      channel_stats(gi, (1., 100.), approx=approx), channel_stats(bi, (5., 100.), approx=approx))
+    stretch(ri, 'sqrt', scale_min=r1, scale_max=r100, scale='max', out=img[..., 0])
+    stretch(gi, 'sqrt', scale_min=g1, scale_max=g100, scale='max', out=img[..., 1])
+    stretch(bi, 'log', scale_min=b5, scale_max=b100, factor=3.15, scale=255, out=img[..., 2])
 
   if kind == 'Optical':
-    ri = sqrt(ri, scale_min=np.min(ri), scale_max=np.percentile(np.unique(ri),100.))
-    gi = sqrt(gi, scale_min=1.15*np.min(gi), scale_max=np.percentile(np.unique(gi),100.))
-    bi = sqrt(bi, scale_min=np.min(bi), scale_max=np.percentile(np.unique(bi),100.))
-    mul_factor = 255/ri.max()
-    img = (np.transpose([(ri*mul_factor).astype(np.uint8),(gi*255.99).astype(np.uint8),(bi*256).astype(np.uint8)], (1, 2, 0)))
+    stretch(ri, 'sqrt', scale_min=np.min(ri), scale_max=np.max(ri), scale='max', out=img[..., 0])
+    stretch(gi, 'sqrt', scale_min=1.15*np.min(gi), scale_max=np.max(gi), scale=255.99, 
+            out=img[..., 1])
+    stretch(bi, 'sqrt', scale_min=np.min(bi), scale_max=np.max(bi), scale=256, out=img[..., 2])
   return img
 
-def pl_RGBC(rows,columns,i,wcs,svy,lvlc,img,fig,name, pkind='ror',annot=True) :
+def pl_RGBC(rows,columns,i,wcs,svy,lvlc,img,fig,name, pkind='ror',annot=True, tpl=None, contours=None) :
     """
     *Inputs*
 
@@ -411,20 +991,33 @@ def pl_RGBC(rows,columns,i,wcs,svy,lvlc,img,fig,name, pkind='ror',annot=True) :
           (str)
           ror/iou;
           default='ror'
+        :tpl:
+          (FigureTemplate)
+          draw on axes i of a reused figure template instead of adding a 
+          subplot to fig, see get_template().
+        :contours:
+          (ContourCache)
+          replay contours computed once for several panels.
 
     *Returns*
     
         plots the ror/iou figure.
     """
-    ax = fig.add_subplot(rows, columns, i, projection=wcs)
+    if tpl is not None:
+      ax = tpl.axes[i-1]
+    else:
+      ax = fig.add_subplot(rows, columns, i, projection=wcs)
     ax.axis( 'off')
-    ax.imshow(img, origin='lower', interpolation='nearest')
+    _imshow(ax, img, tpl, origin='lower', interpolation='nearest')
     if annot:
       ax.annotate("#RADatHomeIndia",(10,10),color='white')
       ax.annotate("By " + str(name),((400-5*len(name)),10),color='white')
     ax.set_autoscale_on(False)
 
-    plt.contour(svy, lvlc, colors='white')
+    if contours is not None:
+      contours.draw(ax, svy, lvlc, colors='white')
+    else:
+      ax.contour(svy, lvlc, colors='white')
     if pkind == 'ror' and annot:
       if i==1 :
           ax.set_title("ROR-RGB-C: TGSS(GMRT)-DSS2-NVSS(VLA)-NVSS",
@@ -442,6 +1035,68 @@ def pl_RGBC(rows,columns,i,wcs,svy,lvlc,img,fig,name, pkind='ror',annot=True) :
                       y=1, pad=-16, color="white")
 
 
+LABEL_MAX = 50
+
+def overlay_catalog(ax, cen, maj, mnr, pa, r, px=480, color='magenta', ha='left', va='baseline',
+                    label_max=LABEL_MAX):
+    """
+Draws all catalog sources on ax as a single EllipseCollection and numbers them.
+Numbers are one Text artist each (matplotlib has no collection of texts), so
+they are only drawn up to label_max sources, above that they would overlap
+anyway and cost one artist per source.
+
+    *Inputs*
+
+        :ax:
+          matplotlib (WCS) axes
+        :cen:
+          (x, y) pixel positions, as returned by wcs.world_to_pixel
+        :maj/mnr:
+          major and minor axes (arcsec)
+        :pa:
+          position angle (deg), scalar or per source; masked or missing values are 0
+        :r:
+          length of square image in deg (astropy unit)
+        :px:
+          total pixels in one length
+        :color:
+          edge and label color
+        :ha/va:
+          alignment of the source numbers
+        :label_max:
+          (default=50) sources numbered at most, None numbers all of them
+
+    *Returns*
+
+        the EllipseCollection added to ax.
+    """
+    from matplotlib.collections import EllipseCollection
+
+    x = np.atleast_1d(np.asarray(cen[0], dtype=float))
+    y = np.atleast_1d(np.asarray(cen[1], dtype=float))
+    widths = np.broadcast_to(to_pixel(_filled(maj), r, int(px)), x.shape)
+    heights = np.broadcast_to(to_pixel(_filled(mnr), r, int(px)), x.shape)
+    angles = np.broadcast_to(_filled(pa), x.shape) + 90.
+    _kw = dict(units='xy', offsets=np.column_stack((x, y)),
+               facecolors='none', edgecolors=color)
+    try:
+        catalog = EllipseCollection(widths, heights, angles, offset_transform=ax.transData, **_kw)
+    except TypeError:
+        # -- matplotlib < 3.6 ----#-#
+        catalog = EllipseCollection(widths, heights, angles, transOffset=ax.transData, **_kw)
+    ax.add_collection(catalog)
+    if label_max is None or len(x) <= label_max:
+        for i in range(len(x)):
+            ax.text(x[i], y[i], str(i+1), color=color, ha=ha, va=va)
+    return catalog
+
+def _filled(values, fill=0.):
+    """
+    float array of values with masked, non numeric and nan entries set to fill.
+    """
+    values = np.ma.masked_invalid(np.ma.array(values, dtype=float))
+    return np.ma.filled(values, fill)
+
 # ------------ arcsec to pixel conversion ----------------------------#-#
 
 def to_pixel(unit_inarcsec, r, px = 480):
@@ -0,0 +1,75 @@
+"""
+Deferred imports: the heavy dependencies of rgbmaker (astropy, astroquery,
+requests, matplotlib) are imported the first time they are used, so
+`import rgbmaker`, `rgbmaker --help` and the scaling helpers of imgplt start
+quickly (see benchmarks/bench_import.py).
+
+.. code-block:: python
+
+    >>> from rgbmaker.lazy import lazy
+    >>> plt = lazy('matplotlib.pyplot')                  # module
+    >>> SkyCoord = lazy('astropy.coordinates', 'SkyCoord')  # attribute
+    >>> plt.figure()                                     # imported here
+"""
+from threading import RLock
+import importlib
+
+_LOCK = RLock()
+
+
+class LazyImport:
+    """
+    stands for a module (or an attribute of it) until it is first used, then
+    forwards attribute access and assignment, calls and isinstance() to it.
+
+    *Parameters*
+
+        :module:
+            dotted module name.
+        :attr:
+            (default=None)
+            name of the attribute of module, None stands for the module.
+    """
+
+    __slots__ = ('_module', '_attr', '_obj')
+
+    def __init__(self, module, attr=None):
+        object.__setattr__(self, '_module', module)
+        object.__setattr__(self, '_attr', attr)
+        object.__setattr__(self, '_obj', None)
+
+    def _load(self):
+        if self._obj is None:
+            with _LOCK:
+                if self._obj is None:
+                    _obj = importlib.import_module(self._module)
+                    if self._attr is not None:
+                        _obj = getattr(_obj, self._attr)
+                    object.__setattr__(self, '_obj', _obj)
+        return self._obj
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __instancecheck__(self, obj):
+        return isinstance(obj, self._load())
+
+    def __subclasscheck__(self, cls):
+        return issubclass(cls, self._load())
+
+    def __repr__(self):
+        _name = self._module + ('.' + self._attr if self._attr else '')
+        return '<lazy {}{}>'.format(_name, '' if self._obj is None else ' (imported)')
+
+
+def lazy(module, attr=None):
+    """
+    returns a LazyImport of module (or of module.attr).
+    """
+    return LazyImport(module, attr)
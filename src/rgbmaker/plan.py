@@ -0,0 +1,149 @@
+"""
+Render planner used by fetch._render_events: a small DAG of named products
+(raw survey -> normalized/stretched channel -> composite -> rendered panel)
+where each node is computed at most once per query.
+
+.. code-block:: python
+
+    >>> from rgbmaker.plan import Plan
+    >>> plan = Plan()
+    >>> plan.add('tgss', value=tgss)
+    >>> plan.add('levels:tgss', _contour_levels, 'tgss', 0.015, 4)
+    >>> plan.run('levels:tgss', 'ror')      # independent nodes run in parallel
+    >>> plan['levels:tgss'], plan['levels:tgss']    # memoized, second use is reused
+    >>> plan.report()
+    {'computed': ['levels:tgss', ...], 'time': {...}, 'reused': {'levels:tgss': 1}}
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from time import perf_counter
+import os
+
+_MISSING = object()
+
+
+class Plan:
+    """
+    memoized DAG of named products.
+
+    *Parameters*
+
+        :executor:
+            (default=None)
+            concurrent.futures executor used by run() for independent nodes,
+            None uses default_executor().
+    """
+
+    def __init__(self, executor=None):
+        self.executor = executor
+        self._nodes = {}
+        self._futures = {}
+        self._lock = Lock()
+        self._computed = []
+        self._uses = {}
+        self._time = {}
+
+    def add(self, name, func=None, *deps, value=_MISSING, **kwargs):
+        """
+        registers node name computed as func(*deps, **kwargs), deps naming
+        other nodes are replaced by their values (other deps are passed as
+        they are). value sets a precomputed node (ex. a raw survey).
+        """
+        if value is not _MISSING:
+            _f = Future()
+            _f.set_result(value)
+            with self._lock:
+                self._futures[name] = _f
+        else:
+            self._nodes[name] = (func, deps, kwargs)
+        return self
+
+    def __contains__(self, name):
+        return name in self._nodes or name in self._futures
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def get(self, name):
+        """
+        returns the value of node name, computing it (and its dependencies)
+        in the calling thread the first time.
+        """
+        return self._get(name)
+
+    def _get(self, name, use=True):
+        """
+        get(), use=False for run()/start() so that only consumers of a value
+        are counted in report().
+        """
+        with self._lock:
+            if use:
+                self._uses[name] = self._uses.get(name, 0) + 1
+            _f = self._futures.get(name)
+            _owner = _f is None
+            if _owner:
+                _f = self._futures[name] = Future()
+        if not _owner:
+            return _f.result()
+        try:
+            func, deps, kwargs = self._nodes[name]
+        except KeyError:
+            _f.set_exception(KeyError("no product named {!r}".format(name)))
+            raise
+        try:
+            args = [self._get(d) if isinstance(d, str) and d in self else d for d in deps]
+            _t = perf_counter()
+            _val = func(*args, **kwargs)
+            with self._lock:
+                self._time[name] = perf_counter() - _t
+                self._computed.append(name)
+            _f.set_result(_val)
+        except BaseException as e:
+            _f.set_exception(e)
+            raise
+        return _val
+
+    def run(self, *names):
+        """
+        computes names in parallel (their shared dependencies once) and
+        waits for them.
+        """
+        _futures = self.start(*names[1:])
+        if names:
+            self._get(names[0], use=False)
+        for _f in _futures:
+            _f.result()
+        return self
+
+    def start(self, *names):
+        """
+        starts computing names in the background and returns their futures,
+        get() waits for a node that is being computed.
+        """
+        _pool = self.executor or default_executor()
+        return [_pool.submit(self._get, n, False) for n in names]
+
+    def report(self):
+        """
+        returns the computed nodes in order, how many times the value of each
+        node was used again instead of being recomputed and the compute time 
+        of each node.
+        """
+        with self._lock:
+            return {'computed': list(self._computed), 'time': dict(self._time),
+                    'reused': {n: u - 1 for n, u in self._uses.items()
+                               if u > 1 and n in self._nodes}}
+
+
+_DEFAULT_EXECUTOR = None
+
+def default_executor():
+    """
+    thread pool shared by every Plan.run(), numpy releases the GIL for the
+    array operations of the products.
+    """
+    global _DEFAULT_EXECUTOR
+    if _DEFAULT_EXECUTOR is None:
+        _DEFAULT_EXECUTOR = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1),
+                                               thread_name_prefix='rgbmaker-plan')
+    return _DEFAULT_EXECUTOR
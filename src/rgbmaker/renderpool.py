@@ -0,0 +1,179 @@
+"""
+Process pool for the matplotlib figures of query(), rendering and encoding
+hold the GIL so figures of one query (img1 and img2 of imagesopt=1) and of
+concurrent queries only use several cores in separate processes.
+
+Survey arrays and composites are passed to the workers through
+multiprocessing.shared_memory, only a SharedArray reference (name, shape,
+dtype) is pickled.
+
+.. code-block:: python
+
+    >>> from rgbmaker.renderpool import RenderPool
+    >>> pool = RenderPool(processes=32)
+    >>> query(position='3C 33.1', imagesopt=1, render_pool=pool)
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, resource_tracker, shared_memory
+from threading import Lock
+import os
+
+import numpy as np
+
+_OPEN = []
+
+
+class SharedArray:
+    """
+    picklable reference to an array copied into a shared memory block, a
+    SharedArray argument of RenderPool.submit() is the array in the worker.
+    """
+
+    __slots__ = ('name', 'shape', 'dtype')
+
+    def __init__(self, name, shape, dtype):
+        self.name, self.shape, self.dtype = name, tuple(shape), np.dtype(dtype).str
+
+    def __getstate__(self):
+        return self.name, self.shape, self.dtype
+
+    def __setstate__(self, state):
+        self.name, self.shape, self.dtype = state
+
+
+class SharedArrays:
+    """
+    shared memory blocks of the arrays of one query, used as a context manager,
+    the blocks are released on exit (the workers must be done with them).
+    """
+
+    def __init__(self):
+        self._blocks = []
+        self._refs = {}
+
+    def share(self, arr):
+        """
+        copies arr into a new shared memory block (once per array object) and
+        returns its SharedArray.
+        """
+        if id(arr) in self._refs:
+            return self._refs[id(arr)][1]
+        _arr = np.asarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(_arr.nbytes, 1))
+        np.ndarray(_arr.shape, _arr.dtype, buffer=shm.buf)[...] = _arr
+        self._blocks.append(shm)
+        ref = SharedArray(shm.name, _arr.shape, _arr.dtype)
+        self._refs[id(arr)] = (arr, ref)
+        return ref
+
+    def close(self):
+        """
+        unlinks every block.
+        """
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks, self._refs = [], {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _call(func, args, kwargs):
+    """
+    runs func(*args, **kwargs) in a worker, SharedArray arguments are attached
+    (each block once) and closed when func returns.
+    """
+    _close(_OPEN)
+    _blocks = {}
+
+    def _arg(a):
+        if not isinstance(a, SharedArray):
+            return a
+        if a.name not in _blocks:
+            shm = shared_memory.SharedMemory(name=a.name)
+            _blocks[a.name] = (shm, np.ndarray(a.shape, np.dtype(a.dtype), buffer=shm.buf))
+        return _blocks[a.name][1]
+
+    try:
+        return func(*[_arg(a) for a in args], **{k: _arg(v) for k, v in kwargs.items()})
+    finally:
+        _shms = [shm for shm, _ in _blocks.values()]
+        _blocks.clear()
+        _close(_shms)
+
+
+def _close(blocks):
+    """
+    closes attached blocks, blocks still referenced (ex. by a figure template
+    of the worker) are kept in _OPEN and closed by a later call.
+    """
+    _left = []
+    for shm in blocks:
+        try:
+            shm.close()
+        except BufferError:
+            _left.append(shm)
+    _OPEN[:] = _left
+
+
+def _init_worker():
+    import matplotlib
+
+    matplotlib.use('Agg')
+
+
+class RenderPool:
+    """
+    process pool rendering figures, see fetch._rgbc_figure/_rgb_figure.
+
+    *Parameters*
+
+        :processes:
+            (default=None)
+            number of worker processes, None uses os.cpu_count().
+        :context:
+            (default='spawn')
+            multiprocessing start method of the workers, spawn does not
+            inherit the threads (and locks) of the calling process.
+    """
+
+    def __init__(self, processes=None, context='spawn'):
+        self.processes = int(processes or os.cpu_count() or 1)
+        # workers share the tracker of this process, blocks are unlinked once
+        resource_tracker.ensure_running()
+        self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=get_context(context),
+                                         initializer=_init_worker)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        returns a Future of func(*args, **kwargs) run in a worker, func must
+        be a module level function.
+        """
+        return self._pool.submit(_call, func, args, kwargs)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+_DEFAULT_POOL = None
+_DEFAULT_LOCK = Lock()
+
+def default_render_pool():
+    """
+    returns the process wide RenderPool used by query(render_pool=True).
+    """
+    global _DEFAULT_POOL
+    with _DEFAULT_LOCK:
+        if _DEFAULT_POOL is None:
+            _DEFAULT_POOL = RenderPool()
+    return _DEFAULT_POOL
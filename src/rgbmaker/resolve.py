@@ -0,0 +1,181 @@
+"""
+Name resolution used by RGBMaker._inp_sanitize.
+
+Explicit coordinates (sexagesimal or decimal degrees) are parsed locally,
+object names are resolved once through Sesame (SkyCoord.from_name) and kept
+in memory for ttl seconds, and in a json file shared between processes when
+a path (or $RGBMAKER_NAMES) is given.
+
+.. code-block:: python
+
+    >>> from rgbmaker.resolve import resolve
+    >>> resolve("14 09 48.86 -03 02 32.6")   # no network call
+    >>> resolve("3C 33.1")                   # Sesame once, cached afterwards
+"""
+from threading import RLock
+from time import time
+import json
+import os
+import re
+
+from rgbmaker.cache import _FileLock
+from rgbmaker.lazy import lazy
+
+coordinates, ut = lazy('astropy.coordinates'), lazy('astropy.units')
+
+# no json file unless asked for, ex. RGBMAKER_NAMES=~/.rgbmaker/names.json
+DEFAULT_PATH = os.environ.get('RGBMAKER_NAMES') or None
+DEFAULT_TTL = 30*24*3600
+
+_NUM = r'[+-]?(?:\d+\.?\d*|\.\d+)'
+_SEXAGESIMAL = re.compile(
+    r'^\s*(\d{1,2})[\s:h]+(\d{1,2})[\s:m]+(\d{1,2}(?:\.\d*)?)s?\s*,?\s*'
+    r'([+-]?\d{1,2})[\s:d]+(\d{1,2})[\s:m]+(\d{1,2}(?:\.\d*)?)s?\s*$')
+_DECIMAL = re.compile(r'^\s*({0})\s*[,\s]\s*({0})\s*$'.format(_NUM))
+
+
+def parse_coordinates(position):
+    """
+    parses explicit FK5 (J2000) coordinates without any network call.
+
+    Ex: "14 09 48.86 -03 02 32.6", "14:09:48.86 -03:02:32.6",
+    "14h09m48.86s -03d02m32.6s" or "212.4536 -3.0424" (degrees).
+
+    returns SkyCoord or None when position is not an explicit coordinate
+    or is out of range (RA outside [0, 24h), |DEC| > 90, minutes or seconds
+    of 60 or more).
+    """
+    position = str(position)
+    try:
+        if _SEXAGESIMAL.match(position):
+            _m = _SEXAGESIMAL.match(position).groups()
+            h, m, sec, d, dm, ds = map(float, _m)
+            if h >= 24 or max(m, sec, dm, ds) >= 60 or abs(d) + dm/60 + ds/3600 > 90:
+                return None
+            return coordinates.SkyCoord('{}h{}m{}s'.format(*_m[:3]),
+                                        '{}d{}m{}s'.format(*_m[3:]), frame='fk5')
+        if _DECIMAL.match(position):
+            ra, dec = map(float, _DECIMAL.match(position).groups())
+            if not (0 <= ra < 360 and abs(dec) <= 90):
+                return None
+            return coordinates.SkyCoord(ra*ut.deg, dec*ut.deg, frame='fk5')
+    except ValueError:
+        return None
+    return None
+
+
+class NameResolver:
+    """
+    memoized resolver with a persistent cache.
+
+    *Parameters*
+
+        :path:
+            (default=None or $RGBMAKER_NAMES)
+            json file for the persistent cache, None keeps names in memory only.
+        :ttl:
+            (default=30 days)
+            seconds after which a resolved name is looked up again.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL):
+        self.path = os.path.expanduser(str(path)) if path else None
+        self.ttl = ttl
+        self._names = None
+        self._lock = RLock()
+        self._stats = {'local': 0, 'hits': 0, 'misses': 0}
+
+    def __call__(self, position):
+        return self.resolve(position)
+
+    def resolve(self, position):
+        """
+        returns SkyCoord (fk5) of position, raises like SkyCoord.from_name
+        when the name can not be resolved.
+        """
+        c = parse_coordinates(position)
+        if c is not None:
+            with self._lock:
+                self._stats['local'] += 1
+            return c
+        _key = ' '.join(str(position).split()).lower()
+        with self._lock:
+            _names = self._load()
+            if _key in _names and time() - _names[_key][2] < self.ttl:
+                self._stats['hits'] += 1
+                ra, dec, _ = _names[_key]
+                return coordinates.SkyCoord(ra*ut.deg, dec*ut.deg, frame='fk5')
+            self._stats['misses'] += 1
+        c = coordinates.SkyCoord.from_name(position, frame='fk5')
+        with self._lock:
+            self._names[_key] = [c.ra.deg, c.dec.deg, time()]
+            self._save(_key)
+        return c
+
+    def stats(self):
+        """
+        returns counts of locally parsed, cached and remotely resolved positions.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def clear(self):
+        """
+        forgets every resolved name.
+        """
+        with self._lock:
+            self._names = {}
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _load(self):
+        if self._names is None:
+            self._names = self._read()
+        return self._names
+
+    def _read(self):
+        if not self.path:
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, key):
+        """
+        merges key into the json file, other processes may have added names.
+        """
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        try:
+            with _FileLock(self.path + '.lock'):
+                _names = self._read()
+                _names[key] = self._names[key]
+                _tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+                with open(_tmp, 'w') as f:
+                    json.dump(_names, f)
+                os.replace(_tmp, self.path)
+                self._names.update(_names)
+        except OSError as e:
+            print("name cache: {}".format(e))
+
+
+_DEFAULT_RESOLVER = None
+
+def default_resolver():
+    """
+    returns the process wide NameResolver used by RGBMaker.
+    """
+    global _DEFAULT_RESOLVER
+    if _DEFAULT_RESOLVER is None:
+        _DEFAULT_RESOLVER = NameResolver()
+    return _DEFAULT_RESOLVER
+
+
+def resolve(position):
+    """
+    resolves position with default_resolver().
+    """
+    return default_resolver().resolve(position)
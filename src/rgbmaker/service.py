@@ -0,0 +1,334 @@
+"""
+Long running rgbmaker service: one warm interpreter (imports, cutout, name
+and catalog caches, figure templates) answering query() requests over HTTP.
+
+    - Service : runs query() on a bounded thread pool, identical requests in
+                flight are merged into one computation.
+    - serve   : ThreadingHTTPServer in front of a Service.
+    - Client  : thin client, standard library only.
+    - write_images : saves the images of Client().query(kind='bytes') locally.
+
+.. code-block:: bash
+
+    $ rgbmaker --serve --port 8787 --concurrency 4
+    $ rgbmaker -p "3C 33.1" -i 1 --server http://127.0.0.1:8787
+
+.. code-block:: python
+
+    >>> from rgbmaker.service import Client
+    >>> status, uri, info, otext = Client('http://127.0.0.1:8787').query(position='3C 33.1')
+    >>> status, uri, info, otext = Client().query(position='3C 33.1', kind='bytes')
+    >>> write_images(uri, 'png')                 # output/img1.png
+
+*HTTP API*
+
+    - POST /query  : json object of query() parameters, returns
+                     {"status", "uri", "info", "otext"} (bytes output as base64),
+                     and "timings" when timings is true. kind is one of
+                     base64, uri or bytes, spidx_file and mirror are
+                     rejected (see check_http_params)
+    - GET  /stats  : counters of the service (see Service.stats)
+    - GET  /health : {"status": "ok"}
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+import base64
+import json
+import os
+import urllib.error
+import urllib.parse
+import urllib.request
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = int(os.environ.get('RGBMAKER_PORT', 8787))
+DEFAULT_URL = os.environ.get('RGBMAKER_SERVER', 'http://{}:{}'.format(DEFAULT_HOST, DEFAULT_PORT))
+DEFAULT_CONCURRENCY = 4
+
+QUERY_PARAMS = ('name', 'position', 'radius', 'archives', 'imagesopt', 'kind', 'spidx_file',
+                'px', 'annot', 'workers', 'batch', 'cache', 'mirror', 'fast', 'template',
+                'fixed_layout', 'encoder', 'smooth', 'tiled', 'render_pool', 'timings')
+# HTTP requests only get the images back, files and paths stay on the server
+# (set spidx_file/mirror with Service(**defaults) to use them)
+HTTP_KINDS = ('base64', 'uri', 'bytes')
+SERVER_PARAMS = ('spidx_file', 'mirror')
+
+
+class Service:
+    """
+    query() runner of the service.
+
+    *Parameters*
+
+        :concurrency:
+            (default=4)
+            queries computed at the same time, others wait in the queue.
+        :render_pool:
+            (default=True)
+            render_pool of every query (see fetch.query), True uses the shared
+            default_render_pool(). Queries rendered in this process (render_pool
+            False, in a request) take turns, matplotlib is not thread safe.
+        :defaults:
+            other query() parameters used when a request does not set them,
+            ex. batch=True, template=True.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, render_pool=True, **defaults):
+        self.concurrency = max(1, int(concurrency))
+        self.render_pool = render_pool
+        self.defaults = defaults
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency,
+                                        thread_name_prefix='rgbmaker-service')
+        self._lock = Lock()
+        self._render_lock = Lock()
+        self._inflight = {}
+        self._stats = {'requests': 0, 'computed': 0, 'coalesced': 0, 'failed': 0, 'running': 0}
+
+    @staticmethod
+    def key(params):
+        """
+        returns the key identical requests share.
+        """
+        return json.dumps(params, sort_keys=True, default=str)
+
+    def submit(self, **params):
+        """
+        returns a Future of the json output of query(**params), the Future
+        of an identical request still in flight when there is one.
+        """
+        _unknown = set(params) - set(QUERY_PARAMS)
+        if _unknown:
+            raise TypeError("unknown query parameters: {}".format(', '.join(sorted(_unknown))))
+        if params.get('kind') in ('plot', 'stream'):
+            raise ValueError("kind={!r} can not be served".format(params['kind']))
+        params = dict(self.defaults, **params)
+        _key = self.key(params)
+        with self._lock:
+            self._stats['requests'] += 1
+            _f = self._inflight.get(_key)
+            if _f is not None:
+                self._stats['coalesced'] += 1
+                return _f
+            _f = self._inflight[_key] = self._pool.submit(self._run, params, _key)
+        _f.add_done_callback(lambda f: self._done(_key, f))
+        return _f
+
+    def query(self, **params):
+        """
+        json output of query(**params), see submit().
+        """
+        return self.submit(**params).result()
+
+    def stats(self):
+        """
+        returns counts of requests, computed and coalesced queries, failures,
+        queries running and waiting, and the concurrency limit.
+        """
+        with self._lock:
+            _stats = dict(self._stats)
+            _stats['queued'] = len(self._inflight) - _stats['running']
+        _stats['concurrency'] = self.concurrency
+        return _stats
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    def _run(self, params, key):
+        from rgbmaker.fetch import query
+
+        params.setdefault('render_pool', self.render_pool)
+        _serial = not (params['render_pool'] or params.get('fast') or params.get('tiled'))
+        with self._lock:
+            self._stats['running'] += 1
+        try:
+            with self._render_lock if _serial else nullcontext():
+                _out = jsonable(query(**params))
+            with self._lock:
+                self._stats['computed'] += 1
+            return _out
+        except Exception:
+            with self._lock:
+                self._stats['failed'] += 1
+            raise
+        finally:
+            # leaves the queue before the result is set, later requests compute again
+            with self._lock:
+                self._stats['running'] -= 1
+                self._inflight.pop(key, None)
+
+    def _done(self, key, future):
+        # requests cancelled before they ran (shutdown)
+        with self._lock:
+            if self._inflight.get(key) is future:
+                self._inflight.pop(key)
+
+
+def jsonable(output):
+    """
+    json object of the (status, uri, info, otext) output of query(), with
+    the timings report of query(timings=True) when there is one.
+    """
+    status, uri, info, otext = output[:4]
+    _uri = [{k: base64.b64encode(v).decode('ascii') if isinstance(v, bytes) else v
+             for k, v in u.items()} for u in uri]
+    _out = {'status': status, 'uri': _uri, 'info': info, 'otext': otext}
+    if len(output) > 4:
+        _out['timings'] = output[4]
+    return _out
+
+
+def write_images(uri, fmt='png', output='output'):
+    """
+    writes the images of a kind='bytes' uri list to output/<img1>.<fmt>,
+    numbered when the file exists, and returns the uri list of the paths as
+    query(kind=fmt) returns them.
+    """
+    os.makedirs(output, exist_ok=True)
+    _uri = []
+    for u in uri:
+        _paths = {}
+        for k, v in u.items():
+            _base = _path = os.path.join(output, '{}.{}'.format(k, fmt))
+            numb = 1
+            while os.path.exists(_path):
+                _path = "{0}_{2}{1}".format(*os.path.splitext(_base) + (numb,))
+                numb += 1
+            with open(_path, 'wb') as f:
+                f.write(v)
+            print("saved {}".format(_path))
+            _paths[k] = 'data:image/png;base64,' + urllib.parse.quote(_path)
+        _uri.append(_paths)
+    return _uri
+
+
+def check_http_params(params):
+    """
+    raises ValueError for parameters a HTTP client can not set: server paths
+    (SERVER_PARAMS) and kinds that write files on the server.
+    """
+    _paths = [k for k in SERVER_PARAMS if params.get(k) is not None]
+    if _paths:
+        raise ValueError("{} can not be set by a client".format(', '.join(_paths)))
+    if params.get('kind', 'base64') not in HTTP_KINDS:
+        raise ValueError("kind={!r} can not be served, use one of {}".format(
+            params['kind'], ', '.join(HTTP_KINDS)))
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'status': 'ok'})
+        elif self.path == '/stats':
+            self._send(200, self.server.service.stats())
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/query':
+            return self._send(404, {'error': 'not found'})
+        try:
+            _body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            params = json.loads(_body or b'{}')
+            if not isinstance(params, dict):
+                raise ValueError("expected a json object of query parameters")
+            check_http_params(params)
+            _out = self.server.service.query(**params)
+        except (TypeError, ValueError) as e:
+            return self._send(400, {'error': str(e)})
+        except Exception as e:
+            return self._send(500, {'error': str(e)})
+        self._send(200, _out)
+
+    def _send(self, code, obj):
+        _data = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(_data)))
+        self.end_headers()
+        self.wfile.write(_data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None, verbose=False, **kwargs):
+    """
+    returns the ThreadingHTTPServer of service (a new Service(**kwargs) when
+    None), not yet serving.
+    """
+    server = ThreadingHTTPServer((host, int(port)), _Handler)
+    server.daemon_threads = True
+    server.service = service if service is not None else Service(**kwargs)
+    server.verbose = verbose
+    return server
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None, verbose=True, **kwargs):
+    """
+    runs the service until interrupted, see make_server().
+    """
+    server = make_server(host, port, service, verbose, **kwargs)
+    print("rgbmaker service on http://{}:{}".format(*server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.shutdown(wait=False)
+
+
+class Client:
+    """
+    thin client of a running service.
+
+    *Parameters*
+
+        :url:
+            (default=http://127.0.0.1:8787 or $RGBMAKER_SERVER)
+        :timeout:
+            (default=None) seconds to wait for a response.
+    """
+
+    def __init__(self, url=DEFAULT_URL, timeout=None):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def query(self, **params):
+        """
+        query() on the service, returns (status, uri, info, otext) like query()
+        (and timings with timings=True), images of kind='bytes' are decoded
+        back to bytes. The service does not write files (kind='png'/'jpg'/...
+        is rejected), use kind='bytes' and write_images() to save them here.
+        """
+        _out = self._request('/query', params)
+        if params.get('kind') == 'bytes':
+            _out['uri'] = [{k: base64.b64decode(v) for k, v in u.items()} for u in _out['uri']]
+        if 'timings' in _out:
+            return _out['status'], _out['uri'], _out['info'], _out['otext'], _out['timings']
+        return _out['status'], _out['uri'], _out['info'], _out['otext']
+
+    def stats(self):
+        return self._request('/stats')
+
+    def health(self):
+        return self._request('/health')
+
+    def _request(self, path, params=None):
+        _data = None if params is None else json.dumps(params).encode()
+        _req = urllib.request.Request(self.url + path, data=_data,
+                                      headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(_req, timeout=self.timeout) as r:
+                return json.loads(r.read())
+        except urllib.error.HTTPError as e:
+            try:
+                _msg = json.loads(e.read()).get('error', e.reason)
+            except ValueError:
+                _msg = e.reason
+            if e.code == 400:
+                raise ValueError(_msg) from None
+            raise RuntimeError("rgbmaker service: {}".format(_msg)) from None
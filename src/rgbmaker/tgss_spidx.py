@@ -1,5 +1,13 @@
-from astropy.io import fits
+from rgbmaker.lazy import lazy
+from hashlib import sha1
 import numpy as np
+import os
+import tempfile
+
+fits = lazy('astropy.io.fits')
+
+# indexes are kept with the cutout cache ($RGBMAKER_CACHE) or in the temp directory
+INDEX_PATH = os.environ.get('RGBMAKER_CACHE') or os.path.join(tempfile.gettempdir(), 'rgbmaker-spidx')
 
 def find_spidx(spidx_file,c, r):
     """
@@ -16,7 +24,8 @@ def find_spidx(spidx_file,c, r):
 *Parameters*
 
     :spidx_file:
-        spidx fits file (approx 111 MB) with Fitsrec type table in hdul[1]
+        spidx fits file (approx 111 MB) with RA, DEC, Spidx rows in hdul[0].
+        An index is built on first use (see build_spidx_index).
     :c:
         Astropy SkyCoord type RA, DEC 
         (astropy unit - degrees)
@@ -32,16 +41,14 @@ def find_spidx(spidx_file,c, r):
     """
 
     # ------- 
-    spidx_hdul = fits.open(spidx_file)
-    RA, DEC, Spidx = spidx_hdul[0].data
+    RA, DEC, Spidx = _dec_band(load_spidx_index(spidx_file), c.dec.deg, r.value)
     
     # ------- 
-    ra, dec =c.ra.deg, c.dec.deg
+    ra = c.ra.deg
     epsilon = r.value # expected r in astropy unit degree
     print(f'spidx search is roughly within {np.round((epsilon*60),3)} arcmin')
-    i_spidx = np.where( np.abs(DEC-dec) < epsilon )
-    true_spidx = np.where( np.abs(RA[i_spidx]-ra) < epsilon )
-    xi,yi,spidx = RA[i_spidx][true_spidx], DEC[i_spidx][true_spidx], np.round(np.double(Spidx[i_spidx][true_spidx]),3)
+    true_spidx = np.where( np.abs(_dra(RA, ra)) < epsilon )
+    xi,yi,spidx = RA[true_spidx], DEC[true_spidx], np.round(np.double(Spidx[true_spidx]),3)
     if (not hasattr(spidx, '__len__')) and (not isinstance(spidx, str)) :
         spidx = [spidx]
         if (not hasattr(xi, '__len__')) and (not isinstance(xi, str)) :
@@ -49,4 +56,145 @@ def find_spidx(spidx_file,c, r):
         if (not hasattr(yi, '__len__')) and (not isinstance(yi, str)) :
             yi = [yi]
     return xi, yi, spidx
-    
+
+def find_spidx_many(spidx_file, c, r, chunk=1024):
+    """
+    vectorized find_spidx() for many targets at once.
+
+.. code-block:: python
+
+    >>> c = coordinates.SkyCoord(ra=[212.45, 10.68]*ut.deg, dec=[-3.04, 41.27]*ut.deg)
+    >>> for xi, yi, spidx in find_spidx_many(file_path, c, 0.12*ut.deg):
+    ...     print(spidx)
+
+*Parameters*
+
+    :spidx_file:
+        spidx fits file, indexed as in find_spidx().
+    :c:
+        Astropy SkyCoord array of target centers.
+    :r:
+        Astropy unit in degree, scalar or one per target.
+    :chunk:
+        (default=1024)
+        number of targets swept together, bounds the temporary memory.
+
+*Returns*
+
+    :list of (xi, yi, spidx):
+        one tuple per target, same as the output of find_spidx().
+
+    The DEC bands of all targets are found with one vectorized binary search
+    on the DEC sorted index, the rows of every band are gathered and tested 
+    in RA together, so there is no per target scan of the catalog.
+    """
+    index = load_spidx_index(spidx_file)
+    ra = np.atleast_1d(c.ra.deg)
+    dec = np.atleast_1d(c.dec.deg)
+    epsilon = np.broadcast_to(np.atleast_1d(getattr(r, 'value', r)), ra.shape)
+    output = []
+    for start in range(0, len(ra), chunk):
+        sl = slice(start, start + chunk)
+        output.extend(_sweep(index, ra[sl], dec[sl], epsilon[sl]))
+    return output
+
+def _sweep(index, ra, dec, epsilon):
+    """
+    returns [(xi, yi, spidx)] for targets ra, dec, epsilon (arrays in degree).
+    """
+    lo = np.searchsorted(index[1], dec - epsilon, side='right')
+    hi = np.searchsorted(index[1], dec + epsilon, side='left')
+    counts = np.maximum(hi - lo, 0)
+    target = np.repeat(np.arange(len(ra)), counts)
+    rows = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+    band = np.array(index[:, rows])
+    keep = np.abs(_dra(band[0], ra[target])) < epsilon[target]
+    band, target = band[:, keep], target[keep]
+    order = np.lexsort((band[3], target))
+    band, target = band[:, order], target[order]
+    bounds = np.searchsorted(target, np.arange(len(ra) + 1))
+    return [(band[0, i:j], band[1, i:j], np.round(band[2, i:j], 3))
+            for i, j in zip(bounds[:-1], bounds[1:])]
+
+# ------- spidx index ----------------------------------------#-#
+
+_SPIDX_INDEX = {}
+
+def build_spidx_index(spidx_file, index_file=None):
+    """
+    one-time build of a compact index of the spidx catalog.
+
+    Rows are sorted by DEC and written as a (4, N) float64 array 
+    [RA, DEC, Spidx, row] to index_file (default: a file of INDEX_PATH named
+    after the path, size and mtime of spidx_file, so the catalog directory
+    is never written to and a changed catalog gets a new index) which 
+    find_spidx() memory-maps, so a lookup only reads the DEC band around 
+    the target instead of the 111 MB FITS file.
+
+    *Returns*
+
+        :index_file:
+            path of the written index.
+    """
+    index_file = index_file or _index_path(spidx_file)
+    index = _sorted_index(spidx_file)
+    os.makedirs(os.path.dirname(index_file) or '.', exist_ok=True)
+    _tmp = '{}.{}.tmp'.format(index_file, os.getpid())
+    try:
+        with open(_tmp, 'wb') as f:
+            np.save(f, np.ascontiguousarray(index))
+        os.replace(_tmp, index_file)
+    finally:
+        if os.path.exists(_tmp):
+            os.remove(_tmp)
+    return index_file
+
+def load_spidx_index(spidx_file, index_file=None):
+    """
+    returns the memory-mapped index of spidx_file, building it when it is 
+    missing. The index is opened once per process.
+    """
+    index_file = index_file or _index_path(spidx_file)
+    key = str(index_file)
+    if key in _SPIDX_INDEX:
+        return _SPIDX_INDEX[key]
+    try:
+        if not os.path.exists(index_file):
+            build_spidx_index(spidx_file, index_file)
+        index = np.load(index_file, mmap_mode='r')
+    except OSError:
+        # --- read only location, keep the index in memory ----#-#
+        index = _sorted_index(spidx_file)
+    _SPIDX_INDEX[key] = index
+    return index
+
+def _sorted_index(spidx_file):
+    with fits.open(spidx_file) as spidx_hdul:
+        RA, DEC, Spidx = np.asarray(spidx_hdul[0].data, dtype=np.float64)
+    order = np.argsort(DEC, kind='stable')
+    return np.vstack((RA[order], DEC[order], Spidx[order], order.astype(np.float64)))
+
+def _index_path(spidx_file):
+    """
+    index file of spidx_file in INDEX_PATH, keyed on its path, size and mtime.
+    """
+    _st = os.stat(spidx_file)
+    _raw = '{}|{}|{}'.format(os.path.abspath(str(spidx_file)), _st.st_size, _st.st_mtime_ns)
+    return os.path.join(INDEX_PATH, sha1(_raw.encode()).hexdigest() + '.idx.npy')
+
+def _dec_band(index, dec, epsilon):
+    """
+    returns RA, DEC, Spidx of rows with abs(DEC-dec) < epsilon in catalog order
+    using binary search on the DEC sorted index.
+    """
+    lo = np.searchsorted(index[1], dec - epsilon, side='right')
+    hi = np.searchsorted(index[1], dec + epsilon, side='left')
+    band = np.array(index[:, lo:hi])
+    band = band[:, np.argsort(band[3], kind='stable')]
+    return band[0], band[1], band[2]
+
+def _dra(RA, ra):
+    """
+    RA difference in degrees wrapped to [-180, 180), handles 0/360 crossing.
+    """
+    return (np.asarray(RA) - ra + 180.) % 360. - 180.
@@ -0,0 +1,373 @@
+"""
+Tiled, bounded-memory version of the fast (matplotlib free) composites, used
+by query(tiled=True) for large px.
+
+Global parameters of each channel (percentiles, median, min/max, std) are
+computed first by streaming over row bands of the surveys, then every band of
+rows is stretched, composited, overlaid with contours/ellipses and written to
+a png right away. Memory used does not depend on px beyond the survey arrays,
+which can be memory maps of the cache files (CutoutCache(memmap=True)).
+
+    - TiledChannel : uint8 channel of a composite, stretched band by band.
+    - Panel        : composite channels plus contour/ellipse overlays.
+    - PNGWriter    : png written band by band (one zlib stream of IDAT chunks).
+
+.. code-block:: python
+
+    >>> from rgbmaker.tiles import Panel, ror_channel, save_tiles
+    >>> panel = Panel([ror_channel(tgss), ror_channel(dss2r), ror_channel(nvss)])
+    >>> panel.contours(nvss, lvlc, (255, 255, 255))
+    >>> save_tiles([panel], tgss.shape, kind='png', output='ror')
+"""
+from functools import partial
+import base64
+import io
+import struct
+import zlib
+
+import numpy as np
+
+from rgbmaker.imgplt import stretch, channel_stats, raster_contours, raster_ellipses, smooth
+from rgbmaker.imgplt import data_uri, _new_path, _scratch
+
+TILE_ROWS = 256
+EXACT_LIMIT = 1 << 22
+MEDIAN_BINS = 1 << 16
+
+
+def bands(n, rows=TILE_ROWS):
+    """
+    yields (r0, r1) bands of rows of an image of n rows, from the top
+    (row n-1, the first row of a png with origin='lower') down.
+    """
+    for r1 in range(n, 0, -int(rows)):
+        yield max(0, r1 - int(rows)), r1
+
+
+def moments(x, rows=TILE_ROWS):
+    """
+    (mean, std) of x accumulated over bands of rows in float64.
+    """
+    _n, _s, _s2 = 0, 0., 0.
+    for r0, r1 in bands(len(x), rows):
+        _b = np.asarray(x[r0:r1], dtype=np.float64)
+        _n, _s, _s2 = _n + _b.size, _s + _b.sum(), _s2 + np.dot(_b.ravel(), _b.ravel())
+    _mean = _s/_n
+    return _mean, np.sqrt(max(_s2/_n - _mean**2, 0.))
+
+
+def percentiles(x, q, unique=True, rows=TILE_ROWS, limit=EXACT_LIMIT, bins=MEDIAN_BINS,
+                transform=None):
+    """
+    channel_stats() of x without a full size copy: exact while the (distinct)
+    values kept stay under limit, else estimated from a histogram (see
+    channel_stats(approx=True)). transform (ex. a stretch) is applied to
+    each band first, the percentiles are those of transform(x).
+    """
+    q = np.asarray(q, dtype=float)
+    if transform is not None:
+        return _transformed_percentiles(x, q, unique, rows, limit, bins, transform)
+    if np.all((q == 0) | (q == 100)):
+        return channel_stats(x, q)
+    if not unique:
+        if x.size <= limit:
+            return np.percentile(np.asarray(x), q)
+        return channel_stats(x, q, unique=False, approx=True, bins=bins)
+    _u = np.empty(0, x.dtype.newbyteorder('='))
+    for r0, r1 in bands(len(x), rows):
+        _u = np.union1d(_u, x[r0:r1])
+        if len(_u) > limit:
+            return channel_stats(x, q, approx=True, bins=bins)
+    return channel_stats(_u, q, unique=False)
+
+
+def _transformed_percentiles(x, q, unique, rows, limit, bins, transform):
+    """
+    percentiles() of transform(x), band by band. The histogram estimate
+    counts repeated values (see channel_stats(approx=True)) except the
+    values clipped by transform at either end, which are counted once.
+    """
+    _u = np.empty(0, np.float32)
+    for r0, r1 in bands(len(x), rows):
+        _b = transform(x[r0:r1])
+        _u = np.union1d(_u, _b) if unique else np.append(_u, _b)
+        if len(_u) > limit:
+            break
+    else:
+        return channel_stats(_u, q, unique=False)
+    #-- histogram of the transformed bands, as channel_stats(approx=True) --#
+    lo = min(float(np.min(transform(x[r0:r1]))) for r0, r1 in bands(len(x), rows))
+    hi = max(float(np.max(transform(x[r0:r1]))) for r0, r1 in bands(len(x), rows))
+    if lo == hi:
+        return np.full(len(q), hi)
+    _w = (hi - lo)/bins
+    counts = np.zeros(bins, np.intp)
+    for r0, r1 in bands(len(x), rows):
+        _b = transform(x[r0:r1]).ravel()
+        if unique:
+            # values clipped by the transform repeat, they are counted once below
+            _b = _b[(_b != lo) & (_b != hi)]
+        _idx = ((_b - lo)/_w).astype(np.int64)
+        counts += np.bincount(np.minimum(_idx, bins - 1), minlength=bins)
+    if unique:
+        counts[0] += 1
+        counts[-1] += 1
+    cdf = np.cumsum(counts)
+    rank = q/100*(cdf[-1] - 1)
+    _lo, _hi = np.floor(rank), np.ceil(rank)
+    v_lo = lo + (np.searchsorted(cdf, _lo, side='right') + 0.5)*_w
+    v_hi = lo + (np.searchsorted(cdf, _hi, side='right') + 0.5)*_w
+    val = np.clip(v_lo + (v_hi - v_lo)*(rank - _lo), lo, hi)
+    return np.where(q == 0, lo, np.where(q == 100, hi, val))
+
+
+class TiledChannel:
+    """
+    one uint8 channel of a composite, imgplt.stretch() with parameters of the
+    whole survey applied to a band of rows.
+
+    *Parameters*
+
+        :data:
+            (2D array) survey, may be a memory map.
+        :kind/scale_min/scale_max/factor/scale/clip:
+            as stretch(), scale='max' is resolved from the whole survey.
+        :offset/div:
+            the band is (data - offset)/div before the stretch (imgplt.normals).
+        :pre:
+            (default=None) function applied to the band before the stretch
+            (ex. a first stretch), after offset/div.
+    """
+
+    def __init__(self, data, kind='linear', scale_min=None, scale_max=None, factor=2.0,
+                 scale=255, clip=False, offset=0., div=1., pre=None):
+        self.data = data
+        self.kind, self.factor, self.clip = kind, factor, clip
+        self.offset, self.div, self.pre = offset, div, pre
+        self.scale_min, self.scale_max = scale_min, scale_max
+        if isinstance(scale, str):
+            _top = stretch(np.array([scale_max], np.float32), kind, scale_min, scale_max, factor)
+            scale = 255/_top.max()
+        self.scale = scale
+
+    def band(self, r0, r1, out):
+        """
+        writes rows r0:r1 of the channel into out (uint8).
+        """
+        x = self.data[r0:r1]
+        if self.offset or self.div != 1:
+            x = np.subtract(x, self.offset, out=_scratch(x.shape, 1), casting='unsafe')
+            np.divide(x, self.div, out=x)
+        if self.pre is not None:
+            x = self.pre(x)
+        return stretch(x, self.kind, self.scale_min, self.scale_max, self.factor,
+                       scale=self.scale, clip=self.clip, out=out)
+
+
+def ror_channel(o, rows=TILE_ROWS):
+    """
+    TiledChannel of imgplt.ror_channel(): normals() and the sqrt stretch from
+    0.1*std to max.
+    """
+    omin, omax = float(np.min(o)), float(np.max(o))
+    med = float(percentiles(o, (50.,), unique=False, rows=rows)[0])
+    div = omax if omax != 0 else 1.
+    lo, hi = sorted(((omin - med)/div, (omax - med)/div))
+    if hi != 0 and lo != 0:
+        std = moments(o, rows)[1]/abs(div)
+        return TiledChannel(o, 'sqrt', 0.1*std, hi, scale=255.99, clip=True, offset=med, div=div)
+    return TiledChannel(o, None, scale=255.99, clip=True, offset=med, div=div)
+
+
+def overlayo(ri, gi, bi, kind='IOU', rows=TILE_ROWS):
+    """
+    TiledChannels of imgplt.overlayo().
+    """
+    if kind == 'IOU':
+        (r1, r100), (g1, g100), (b5, b100) = (percentiles(ri, (1., 100.), rows=rows),
+            percentiles(gi, (1., 100.), rows=rows), percentiles(bi, (5., 100.), rows=rows))
+        return [TiledChannel(ri, 'sqrt', r1, r100, scale='max'),
+                TiledChannel(gi, 'sqrt', g1, g100, scale='max'),
+                TiledChannel(bi, 'log', b5, b100, factor=3.15, scale=255)]
+    return [TiledChannel(ri, 'sqrt', np.min(ri), np.max(ri), scale='max'),
+            TiledChannel(gi, 'sqrt', 1.15*np.min(gi), np.max(gi), scale=255.99),
+            TiledChannel(bi, 'sqrt', np.min(bi), np.max(bi), scale=256)]
+
+
+def gray_channel(o, rows=TILE_ROWS, twice=False):
+    """
+    TiledChannel of imgplt.gray_rgb() of the sqrt stretch of o between its 1st
+    and 100th percentile (fetch._sqrt_dss2r), used for the 3 channels.
+    twice=True stretches that result again the same way (dss2r:sqrt2).
+    """
+    lo, hi = percentiles(o, (1., 100.), rows=rows)
+    if not twice:
+        return TiledChannel(o, 'sqrt', lo, hi, scale=255.99, clip=True)
+    _sqrt = partial(stretch, kind='sqrt', scale_min=lo, scale_max=hi)
+    lo2, hi2 = percentiles(o, (1., 100.), rows=rows, transform=_sqrt)
+    return TiledChannel(o, 'sqrt', lo2, hi2, scale=255.99, clip=True, pre=_sqrt)
+
+
+class Panel:
+    """
+    one panel of a tiled image, rendered band by band.
+
+    *Parameters*
+
+        :channels:
+            3 TiledChannels (RGB) or one, used for all 3 channels (gray).
+    """
+
+    def __init__(self, channels):
+        self.channels = list(channels)
+        self.overlays = []
+
+    def contours(self, svy, lvlc, color=(255, 255, 255), sigma=None):
+        """
+        adds imgplt.raster_contours() of svy, smoothed band by band with
+        imgplt.smooth(sigma) when sigma is set.
+        """
+        if lvlc is not None:
+            self.overlays.append(('contours', svy, lvlc, color, sigma))
+        return self
+
+    def ellipses(self, cen, maj, mnr, pa, r, px=480, color=(255, 0, 255)):
+        """
+        adds imgplt.raster_ellipses() of catalog sources.
+        """
+        self.overlays.append(('ellipses', cen, maj, mnr, pa, r, px, color))
+        return self
+
+    def __call__(self, r0, r1, out):
+        """
+        writes rows r0:r1 of the panel into out, uint8 (r1-r0, w, 3).
+        """
+        if len(self.channels) == 1:
+            self.channels[0].band(r0, r1, out[..., 0])
+            out[..., 1] = out[..., 0]
+            out[..., 2] = out[..., 0]
+        else:
+            for i, ch in enumerate(self.channels):
+                ch.band(r0, r1, out[..., i])
+        for _o in self.overlays:
+            if _o[0] == 'contours':
+                _, svy, lvlc, color, sigma = _o
+                raster_contours(out, _contour_band(svy, r0, r1, sigma), lvlc, color)
+            else:
+                _, cen, maj, mnr, pa, r, px, color = _o
+                _cen = (cen[0], np.asarray(cen[1], dtype=float) - r0)
+                raster_ellipses(out, _cen, maj, mnr, pa, r, px, color=color)
+        return out
+
+
+def _contour_band(svy, r0, r1, sigma=None):
+    """
+    rows r0:r1 of svy plus the next row (neighbour of the last row in
+    raster_contours), smoothed with the rows within the kernel radius so the
+    result equals the band of smooth(svy, sigma).
+    """
+    n = len(svy)
+    h = int(4*float(sigma) + 0.5) if sigma else 0
+    a, b = max(0, r0 - h), min(n, r1 + 1 + h)
+    s = svy[a:b]
+    if sigma:
+        s = smooth(s, sigma, method='direct')
+    return s[r0 - a:min(n, r1 + 1) - a]
+
+
+class PNGWriter:
+    """
+    writes an 8 bit RGB png into a file object band by band, rows are
+    compressed as they arrive so the full image is never held in memory.
+
+    *Parameters*
+
+        :f:
+            writable binary file object.
+        :width/height:
+            size of the image in pixels.
+        :compression:
+            (default=6) zlib level 0-9.
+    """
+
+    def __init__(self, f, width, height, compression=6):
+        self.f = f
+        self.width, self.height = int(width), int(height)
+        self._z = zlib.compressobj(6 if compression is None else int(compression))
+        self._rows = 0
+        f.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0, 0))
+
+    def write(self, rows):
+        """
+        appends rows (uint8 (h, width, 3)), top row first.
+        """
+        rows = np.asarray(rows, dtype=np.uint8)
+        _raw = np.zeros((len(rows), 1 + self.width*3), np.uint8)
+        _raw[:, 1:] = rows.reshape(len(rows), -1)
+        self._rows += len(rows)
+        _data = self._z.compress(_raw.tobytes())
+        if _data:
+            self._chunk(b'IDAT', _data)
+
+    def close(self):
+        """
+        ends the png, all rows must have been written.
+        """
+        if self._rows != self.height:
+            raise ValueError("{} of {} rows written".format(self._rows, self.height))
+        self._chunk(b'IDAT', self._z.flush())
+        self._chunk(b'IEND', b'')
+        return self.f
+
+    def _chunk(self, tag, data):
+        self.f.write(struct.pack('>I', len(data)) + tag + data)
+        self.f.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(tag)) & 0xffffffff))
+
+
+def write_panels(f, panels, shape, rows=TILE_ROWS, compression=6):
+    """
+    writes panels side by side as a png into the file object f.
+    """
+    n, w = shape[:2]
+    writer = PNGWriter(f, w*len(panels), n, compression)
+    _band = np.empty((min(int(rows), n), w*len(panels), 3), np.uint8)
+    for r0, r1 in bands(n, rows):
+        _b = _band[:r1 - r0]
+        for i, panel in enumerate(panels):
+            panel(r0, r1, _b[:, i*w:(i + 1)*w])
+        writer.write(_b[::-1])
+    return writer.close()
+
+
+def save_tiles(panels, shape, kind='base64', output='output', rows=TILE_ROWS, compression=None,
+               fmt='png', **encoder):
+    """
+    imgplt.save_img() of panels side by side, written band by band.
+
+        - 'base64', 'uri', 'bytes' : png as in save_img() (compressed png in memory)
+        - 'stream' : writes the png into the file object output, returns output
+        - 'png'    : saves output/<output>.png, returns the path
+
+    Other kinds, and fmt other than png, raise ValueError: the tiled output
+    is png only. encoder options other than compression are ignored.
+    """
+    if fmt != 'png':
+        raise ValueError("tiled output is png only, got fmt={!r}".format(fmt))
+    if kind in ('base64', 'uri', 'bytes'):
+        _buf = io.BytesIO()
+        write_panels(_buf, panels, shape, rows, compression)
+        if kind == 'bytes':
+            return _buf.getvalue()
+        if kind == 'uri':
+            return data_uri(_buf.getbuffer())
+        return base64.b64encode(_buf.getbuffer())
+    elif kind == 'stream':
+        return write_panels(output, panels, shape, rows, compression)
+    elif kind == 'png':
+        newPath = _new_path('{}.png'.format(output))
+        with open(newPath, 'wb') as f:
+            write_panels(f, panels, shape, rows, compression)
+        print("saved {}".format(newPath))
+        return newPath
+    raise ValueError("tiled output is png only, got kind={!r}".format(kind))
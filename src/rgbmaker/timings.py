@@ -0,0 +1,108 @@
+"""
+Per stage wall time (and bytes) of one query, recorded by RGBMaker and
+rgbmaker.fetch while the query runs (RGBMaker.timings).
+
+    - resolve : name resolution (Sesame or the name cache)
+    - skyview : one SkyView request, name is the survey (or surveys of a
+                batch), bytes of the cutouts, cached=True when read from the cache
+    - nvas    : NVAS image list
+    - vizier  : one catalog cone search, name is 'tgss'/'nvss', source is
+                'mirror', 'cache' or 'vizier'
+    - spidx   : find_spidx() run alongside the fetch
+    - collect : surveys checked and gathered for rendering (RGBMaker._arr_rgb)
+    - plan    : one product of the render Plan (stretches, composites,
+                contour levels, smoothing), see rgbmaker.plan
+    - render  : drawing of an image (matplotlib, or composite and encoding
+                together for tiled=True)
+    - encode  : encoding of an image, bytes of the output
+
+.. code-block:: python
+
+    >>> status, uri, info, otext, timings = query(position='3C 33.1', timings=True)
+    >>> timings['by_stage']
+    {'resolve': 0.41, 'skyview': 3.2, 'vizier': 0.52, 'plan': 0.05, 'render': 0.9, ...}
+    >>> query(position='3C 33.1', on_timings=lambda t: tracer.record(t['stages']))
+"""
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+
+
+class Timings:
+    """
+    stages of one query in the order they finish, see report().
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._start = perf_counter()
+        self._stages = []
+
+    def add(self, stage, seconds, name=None, nbytes=None, start=None, **meta):
+        """
+        records stage (name) that took seconds, start is its perf_counter()
+        start time when known. meta is kept as it is (ex. cached=True).
+        """
+        rec = {'stage': stage, 'name': name, 'time': float(seconds), 'bytes': nbytes,
+               'start': None if start is None else start - self._start}
+        rec.update(meta)
+        with self._lock:
+            self._stages.append(rec)
+        return rec
+
+    @contextmanager
+    def span(self, stage, name=None, **meta):
+        """
+        records the time spent in the block as stage, yields the record so
+        the block can set rec['bytes'] (or other fields).
+        """
+        rec = dict(meta, bytes=None)
+        _t = perf_counter()
+        try:
+            yield rec
+        finally:
+            _bytes = rec.pop('bytes')
+            self.add(stage, perf_counter() - _t, name, _bytes, start=_t, **rec)
+
+    def stages(self, stage=None):
+        """
+        copies of the records, only those of stage when given.
+        """
+        with self._lock:
+            return [dict(r) for r in self._stages if stage is None or r['stage'] == stage]
+
+    def report(self):
+        """
+        returns {'total': seconds since the query started, 'stages': [records],
+        'by_stage': {stage: seconds}, 'bytes': {stage: bytes}}. Stages that
+        ran concurrently (surveys, Vizier) add up to more than their wall time.
+        """
+        _stages = self.stages()
+        by_stage, _bytes = {}, {}
+        for r in _stages:
+            by_stage[r['stage']] = by_stage.get(r['stage'], 0.) + r['time']
+            if r['bytes'] is not None:
+                _bytes[r['stage']] = _bytes.get(r['stage'], 0) + r['bytes']
+        return {'total': perf_counter() - self._start, 'stages': _stages,
+                'by_stage': by_stage, 'bytes': _bytes}
+
+
+def nbytes(obj):
+    """
+    size in bytes of an array, table, HDU, encoded output (bytes or str) or
+    a list of those (ex. the HDULists of SkyView), None when unknown.
+    """
+    if obj is None:
+        return None
+    if hasattr(obj, 'itercols'):
+        return sum(int(col.nbytes) for col in obj.itercols())
+    if hasattr(obj, 'nbytes'):
+        return int(obj.nbytes)
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    if isinstance(obj, (list, tuple)):
+        _sizes = [s for s in map(nbytes, obj) if s is not None]
+        return sum(_sizes) if _sizes else None
+    if hasattr(obj, 'data'):
+        return nbytes(obj.data)
+    return None
@@ -0,0 +1,79 @@
+"""
+Stand-ins shared by the tests, nothing here talks to the network.
+"""
+import numpy as np
+import pytest
+from astropy import coordinates, units as ut
+from astropy.table import Table
+from astropy.wcs import WCS
+
+POSITION = '01 08 52.9 +73 06 24.8'
+
+
+class Catalogs:
+    """
+    the same random sources around any position, as the TGSS
+    (J/A+A/598/A78/table3) and NVSS (VIII/65/nvss) tables Vizier returns.
+    """
+
+    def __init__(self, sources=20, seed=0):
+        rng = np.random.default_rng(seed)
+        n = int(sources)
+        self.calls = 0
+        #-- offsets in units of the query radius, axes in arcsec, flux in mJy --#
+        self._src = {'dx': rng.uniform(-0.9, 0.9, n), 'dy': rng.uniform(-0.9, 0.9, n),
+                     'maj': rng.uniform(10., 60., n), 'pa': rng.uniform(0., 180., n),
+                     'flux': 10**rng.uniform(0.7, 3.3, n)}
+        self._src['min'] = self._src['maj']*rng.uniform(0.3, 1., n)
+
+    def query_region(self, c, radius=None, catalog=None, **kwargs):
+        self.calls += 1
+        r = (radius if radius is not None else 0.12*ut.deg).to_value(ut.deg)
+        s = self._src
+        dec = c.dec.deg + s['dy']*r
+        ra = c.ra.deg - s['dx']*r/np.cos(np.radians(dec))
+        if 'nvss' in str(catalog).lower():
+            _c = coordinates.SkyCoord(ra*ut.deg, dec*ut.deg, frame='fk5')
+            t = Table({'RAJ2000': _c.ra.to_string(ut.hour, sep=' ', precision=2),
+                       'DEJ2000': _c.dec.to_string(sep=' ', precision=1, alwayssign=True),
+                       'MajAxis': s['maj'], 'MinAxis': s['min'], 'PA': s['pa'],
+                       'S1.4': s['flux'], 'e_S1.4': 0.05*s['flux'] + 0.45})
+            t['MajAxis'].unit = t['MinAxis'].unit = ut.arcsec
+        else:
+            t = Table({'RAJ2000': ra*ut.deg, 'DEJ2000': dec*ut.deg,
+                       'Maj': s['maj'], 'Min': s['min'], 'PA': s['pa'],
+                       'Stotal': 4.8*s['flux'], 'e_Stotal': 0.1*4.8*s['flux'] + 3.5})
+            t['Maj'].unit = t['Min'].unit = ut.arcsec
+        for k in t.colnames:
+            if k.startswith(('S', 'e_S')):
+                t[k].unit = ut.mJy
+        t['PA'].unit = ut.deg
+        return [t]
+
+
+def tan_wcs(c, r, px):
+    """
+    TAN WCS of a (px, px) cutout of radius r (deg) centered on c, as SkyView
+    makes them.
+    """
+    w = WCS(naxis=2)
+    w.wcs.ctype = ['RA---TAN', 'DEC--TAN']
+    w.wcs.crval = [c.ra.deg, c.dec.deg]
+    w.wcs.crpix = [px/2 + 0.5]*2
+    w.wcs.cdelt = [-2*r/px, 2*r/px]
+    w.wcs.equinox = 2000.
+    return w
+
+
+@pytest.fixture
+def vizier(monkeypatch):
+    """
+    Catalogs answering Vizier.query_region while the test runs.
+    """
+    from astroquery.vizier import VizierClass
+
+    catalogs = Catalogs()
+    monkeypatch.setattr(VizierClass, 'query_region',
+                        lambda self, coordinates, radius=None, catalog=None, **kwargs:
+                        catalogs.query_region(coordinates, radius, catalog))
+    return catalogs
@@ -0,0 +1,90 @@
+"""
+CutoutCache: LRU eviction of both tiers, hit/miss counters and read-only
+views of the memory tier.
+"""
+import os
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from rgbmaker.cache import CutoutCache
+
+
+def _item(i, n=64):
+    return np.full((n, n), i, np.float32), fits.Header({'SURVEY': 'svy{}'.format(i)})
+
+
+def test_memory_tier_is_lru():
+    _nbytes = CutoutCache._sizeof(_item(0))
+    cache = CutoutCache(mem_bytes=3*_nbytes)
+    for i in range(3):
+        cache.put(str(i), *_item(i))
+    assert cache.get('0') is not None           # 0 is now the most recent
+    cache.put('3', *_item(3))                   # evicts 1
+
+    assert cache.get('1') is None
+    for i in (0, 2, 3):
+        data, header = cache.get(str(i))
+        assert data[0, 0] == i and header['SURVEY'] == 'svy{}'.format(i)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['mem_hits']) == (4, 1, 4)
+    assert (stats['mem_entries'], stats['mem_bytes']) == (3, 3*_nbytes)
+    assert (stats['disk_entries'], stats['writes']) == (0, 4)
+
+
+def test_memory_tier_returns_read_only_views():
+    cache = CutoutCache()
+    cache.put('k', *_item(1))
+    data, header = cache.get('k')
+    with pytest.raises(ValueError):
+        data[0, 0] = 2
+    header['SURVEY'] = 'changed'
+    data, header = cache.get('k')
+    assert data[0, 0] == 1 and header['SURVEY'] == 'svy1'
+
+
+def test_items_larger_than_the_memory_tier_are_not_kept():
+    cache = CutoutCache(mem_bytes=100)
+    cache.put('k', *_item(1))
+    assert cache.get('k') is None
+    assert cache.stats()['mem_entries'] == 0
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = CutoutCache(tmp_path, mem_bytes=0)
+    for i in range(3):
+        cache.put(str(i), *_item(i))
+        os.utime(cache._file(str(i)), (1000 + i, 1000 + i))
+    _size = os.path.getsize(cache._file('0'))
+    assert cache.get('0')[0][0, 0] == 0          # touches 0, 1 is now the oldest
+    cache.max_bytes = 3*_size
+    cache.put('3', *_item(3))
+
+    assert sorted(os.listdir(tmp_path)) == ['.lock', '0.fits', '2.fits', '3.fits']
+    assert cache.get('1') is None
+    stats = cache.stats()
+    assert (stats['disk_hits'], stats['misses'], stats['evictions']) == (1, 1, 1)
+    assert stats['disk_entries'] == 3
+
+
+def test_disk_hits_fill_the_memory_tier(tmp_path):
+    CutoutCache(tmp_path).put('k', *_item(5))
+    cache = CutoutCache(tmp_path)
+    assert cache.get('k')[0][0, 0] == 5
+    assert cache.get('k')[0][0, 0] == 5
+    stats = cache.stats()
+    assert (stats['disk_hits'], stats['mem_hits']) == (1, 1)
+
+
+def test_failed_disk_write_leaves_no_tmp_file(tmp_path, monkeypatch):
+    cache = CutoutCache(tmp_path)
+
+    def _write(_f, item):
+        open(_f, 'wb').close()
+        raise OSError('disk full')
+
+    monkeypatch.setattr(cache, '_write', _write)
+    with pytest.raises(OSError):
+        cache.put('k', *_item(1))
+    assert os.listdir(tmp_path) == ['.lock']
@@ -0,0 +1,58 @@
+"""
+vz_query answers from a local mirror (rgbmaker.catalog.build_mirror) like it
+does from Vizier, Vizier is replaced by the Catalogs of conftest.py.
+"""
+import numpy as np
+import pytest
+from astropy import coordinates, units as ut
+from astropy.table import Table
+
+from conftest import POSITION, Catalogs, tan_wcs
+from rgbmaker import RGBMaker
+from rgbmaker.catalog import CatalogMirror, build_mirror
+
+CATALOGS = {'tgss': 'J/A+A/598/A78/table3', 'nvss': 'VIII/65/nvss'}
+
+
+def _vz_query(mirror=None):
+    """
+    pixel positions of the TGSS and NVSS sources found by vz_query.
+    """
+    r = RGBMaker(position=POSITION, imagesopt=2, px=300, cache=False, mirror=mirror)
+    r.wcs = tan_wcs(r.c, r.r.to_value(ut.deg), 300)
+    tgss, nvss = r.vz_query()
+    assert r.vz_error is None
+    return {'tgss': np.asarray(tgss[3]), 'nvss': np.asarray(nvss[3])}
+
+
+def _degree_table(svy, c, r):
+    """
+    catalog of svy with RAJ2000/DEJ2000 as unitless degree columns.
+    """
+    t = Catalogs().query_region(c, r, CATALOGS[svy])[0]
+    if svy == 'nvss':
+        _c = coordinates.SkyCoord(t['RAJ2000'], t['DEJ2000'], unit=(ut.hourangle, ut.deg))
+    else:
+        _c = coordinates.SkyCoord(t['RAJ2000'], t['DEJ2000'])
+    cols = {k: np.asarray(t[k]) for k in t.colnames}
+    cols['RAJ2000'], cols['DEJ2000'] = _c.ra.deg, _c.dec.deg
+    return Table(cols)
+
+
+def _sorted(px):
+    return px[:, np.lexsort(px)]
+
+
+@pytest.mark.parametrize('svy', ['tgss', 'nvss'])
+def test_mirror_from_degrees_matches_vizier(tmp_path, vizier, svy):
+    _r = RGBMaker(position=POSITION, cache=False)
+    for _svy in CATALOGS:
+        build_mirror(_svy, _degree_table(_svy, _r.c, _r.r), tmp_path)
+
+    expected = _vz_query()
+    assert vizier.calls == 2
+    vizier.calls = 0
+    px = _vz_query(CatalogMirror(tmp_path))
+    assert vizier.calls == 0
+    assert px[svy].shape == expected[svy].shape == (2, 20)
+    np.testing.assert_allclose(_sorted(px[svy]), _sorted(expected[svy]), atol=0.05)
@@ -0,0 +1,65 @@
+"""
+save_img()/save_fig() encode once, every kind carries the same image.
+"""
+import base64
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from rgbmaker.imgplt import data_uri, encode, save_fig, save_img
+
+IMG = np.random.default_rng(0).integers(0, 256, (40, 30, 3), dtype=np.uint8)
+
+
+def _decode(data):
+    return np.asarray(Image.open(io.BytesIO(data)).convert('RGB'))
+
+
+def test_kinds_carry_the_same_png():
+    png = save_img(IMG, 'bytes')
+    assert png[:8] == b'\x89PNG\r\n\x1a\n'
+    np.testing.assert_array_equal(_decode(png), np.flipud(IMG))     # origin='lower'
+    assert base64.b64decode(save_img(IMG, 'base64')) == png
+    assert save_img(IMG, 'uri') == data_uri(png) == \
+        'data:image/png;base64,' + base64.b64encode(png).decode('ascii')
+    _f = io.BytesIO()
+    assert save_img(IMG, 'stream', output=_f) is _f
+    assert _f.getvalue() == png
+
+
+@pytest.mark.parametrize('compression', [0, 9])
+def test_png_compression_is_lossless(compression):
+    png = save_img(IMG, 'bytes', compression=compression)
+    np.testing.assert_array_equal(_decode(png), np.flipud(IMG))
+
+
+def test_fmt_and_quality():
+    jpg = save_img(IMG, 'bytes', fmt='jpg', quality=50)
+    assert jpg[:2] == b'\xff\xd8'
+    assert save_img(IMG, 'uri', fmt='jpg').startswith('data:image/jpeg;base64,')
+    assert len(jpg) < len(save_img(IMG, 'bytes', fmt='jpg', quality=95))
+
+
+def test_files_are_numbered(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first, second = save_img(IMG, 'png', output='img1'), save_img(IMG, 'png', output='img1')
+    assert first != second and os.path.exists(first) and os.path.exists(second)
+    with open(first, 'rb') as f:
+        assert f.read() == encode(IMG)
+
+
+def test_figures_are_transparent_unless_asked_not_to_be():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    def _alpha(**encoder):
+        fig = plt.figure(figsize=(1, 1))
+        png = save_fig(plt, fig, 'bytes', **encoder)
+        return np.asarray(Image.open(io.BytesIO(png)).convert('RGBA'))[0, 0, 3]
+
+    assert _alpha() == 0
+    assert _alpha(transparent=False) == 255
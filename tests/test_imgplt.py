@@ -0,0 +1,136 @@
+"""
+The fused stretches of imgplt give the images of the original numpy code
+(kept below as _old_*), channel_stats() gives the percentiles it used, the
+histogram estimate within its error bound.
+"""
+import numpy as np
+import pytest
+
+from rgbmaker import imgplt
+from rgbmaker.imgplt import channel_stats, linear, log, ror_channel, sqrt, stretch
+
+
+def _survey(seed=0, px=200, scale=1.):
+    """
+    big endian float32 cutout (as SkyView returns them): noise and sources.
+    """
+    rng = np.random.default_rng(seed)
+    img = rng.normal(0., 0.01, (px, px))
+    _g = np.arange(px)
+    for x0, y0, s, p in rng.uniform((0, 0, 1, 0.1), (px, px, 8, 5), (20, 4)):
+        img += p*np.outer(np.exp(-0.5*((_g - y0)/s)**2), np.exp(-0.5*((_g - x0)/s)**2))
+    return (scale*img).astype('>f4')
+
+
+def _old_normals(o):
+    X_scaled = (o - np.median(o))
+    if o.max() != 0:
+        return X_scaled/o.max()
+    return X_scaled
+
+
+def _old_overlayc(r, g, b):
+    ri, gi, bi = _old_normals(r), _old_normals(g), _old_normals(b)
+    if ri.max() != 0 and ri.min() != 0:
+        ri = sqrt(ri, scale_min=0.1*np.std(ri), scale_max=np.max(ri))
+    if gi.max() != 0 and gi.min() != 0:
+        gi = sqrt(gi, scale_min=0.1*np.std(gi), scale_max=np.max(gi))
+    if bi.max() != 0 and bi.min() != 0:
+        bi = sqrt(bi, scale_min=0.1*np.std(bi), scale_max=np.max(bi))
+    bi[bi > 1], gi[gi > 1], ri[ri > 1] = 1, 1, 1
+    return (np.dstack((ri, gi, bi))*255.99).astype(np.uint8)
+
+
+def _old_overlayo(ri, gi, bi, kind='IOU'):
+    if kind == 'IOU':
+        ri = sqrt(ri, scale_min=np.percentile(np.unique(ri), 1.), scale_max=np.percentile(np.unique(ri), 100.))
+        gi = sqrt(gi, scale_min=np.percentile(np.unique(gi), 1.), scale_max=np.percentile(np.unique(gi), 100.))
+        bi = log(bi, scale_min=np.percentile(np.unique(bi), 5.),
+                 scale_max=np.percentile(np.unique(bi), 100.), factor=3.15)
+        return np.transpose([(ri*(255/ri.max())).astype(np.uint8), (gi*255/gi.max()).astype(np.uint8),
+                             (bi*255).astype(np.uint8)], (1, 2, 0))
+    ri = sqrt(ri, scale_min=np.min(ri), scale_max=np.percentile(np.unique(ri), 100.))
+    gi = sqrt(gi, scale_min=1.15*np.min(gi), scale_max=np.percentile(np.unique(gi), 100.))
+    bi = sqrt(bi, scale_min=np.min(bi), scale_max=np.percentile(np.unique(bi), 100.))
+    return np.transpose([(ri*(255/ri.max())).astype(np.uint8), (gi*255.99).astype(np.uint8),
+                         (bi*256).astype(np.uint8)], (1, 2, 0))
+
+
+def _assert_close_uint8(img, expected, frac=1e-3):
+    """
+    same image, but for float rounding at quantization steps (off by one on
+    a few pixels).
+    """
+    _d = np.abs(img.astype(int) - expected.astype(int))
+    assert _d.max() <= 1
+    assert np.count_nonzero(_d) <= frac*_d.size
+
+
+@pytest.mark.parametrize('kind, old', [('linear', linear), ('sqrt', sqrt)])
+def test_stretch_matches_numpy_version(kind, old):
+    x = _survey()
+    lo, hi = float(np.percentile(x, 5.)), float(x.max())
+    np.testing.assert_allclose(stretch(x, kind, lo, hi), old(x, lo, hi), atol=1e-6)
+    np.testing.assert_allclose(stretch(x, kind), old(x), atol=1e-6)
+
+
+def test_stretch_log_matches_numpy_version():
+    x = _survey(scale=100.) + np.float32(0.5)
+    lo, hi = float(np.percentile(x, 5.)), float(np.percentile(x, 99.))
+    np.testing.assert_allclose(stretch(x, 'log', lo, hi, factor=3.15),
+                               log(x, lo, hi, factor=3.15), atol=1e-6)
+
+
+def test_stretch_does_not_modify_input():
+    x = _survey()
+    _x = x.copy()
+    stretch(x, 'sqrt', 0., 1., scale=255, clip=True)
+    np.testing.assert_array_equal(x, _x)
+
+
+def test_stretch_out_and_quantization():
+    x = _survey()
+    lo, hi = float(x.min()), float(x.max())
+    out = np.empty(x.shape + (3,), np.uint8)
+    stretch(x, 'sqrt', lo, hi, scale=255.99, clip=True, out=out[..., 1])
+    np.testing.assert_array_equal(out[..., 1], (np.minimum(sqrt(x, lo, hi), 1)*255.99).astype(np.uint8))
+
+
+def test_overlayc_matches_numpy_version():
+    r, g, b = _survey(1), _survey(2, scale=5000.) + np.float32(6000.), _survey(3)
+    img, lvlc = imgplt.overlayc(r, g, b, b, 4, 0.015)
+    _assert_close_uint8(img, _old_overlayc(r, g, b))
+    np.testing.assert_array_equal(ror_channel(g), img[..., 1])
+    assert len(lvlc) == 4
+
+
+@pytest.mark.parametrize('kind', ['IOU', 'Optical'])
+def test_overlayo_matches_numpy_version(kind):
+    r, g, b = _survey(4, scale=90.), _survey(5, scale=6000.), _survey(6, scale=4e-3)
+    r, g, b = r + np.float32(90.), g + np.float32(6000.), b + np.float32(4e-3)
+    _assert_close_uint8(imgplt.overlayo(r, g, b, kind), _old_overlayo(r, g, b, kind))
+
+
+
+@pytest.mark.parametrize('q', [(1., 100.), (5., 100.), (0., 50., 99.)])
+def test_channel_stats_is_percentile_of_unique_values(q):
+    x = np.round(_survey(7), 3)                     # repeated values
+    np.testing.assert_array_equal(channel_stats(x, q),
+                                  [np.percentile(np.unique(x), p) for p in q])
+    np.testing.assert_array_equal(channel_stats(x, q, unique=False),
+                                  [np.percentile(x, p) for p in q])
+    assert channel_stats(x, q).dtype == np.percentile(np.unique(x), 1.).dtype
+
+
+@pytest.mark.parametrize('x', [
+    _survey(8),
+    _survey(9, px=300, scale=6000.) + np.float32(6000.),
+    np.random.default_rng(10).lognormal(0., 2., 100000).astype(np.float32),
+    np.random.default_rng(11).normal(0., 1., 100000),
+], ids=['radio', 'optical', 'lognormal', 'float64'])
+@pytest.mark.parametrize('bins', [256, 4096])
+def test_channel_stats_approx_error_bound(x, bins):
+    q = (0., 1., 5., 50., 99., 100.)
+    _bound = (float(x.max()) - float(x.min()))/bins
+    np.testing.assert_allclose(channel_stats(x, q, approx=True, bins=bins),
+                               np.percentile(x, q), rtol=0, atol=_bound)
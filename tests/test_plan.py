@@ -0,0 +1,105 @@
+"""
+Plan computes every node once, whichever products share it.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+import time
+
+import pytest
+
+from rgbmaker.plan import Plan
+
+
+class _Calls:
+    """
+    node functions counting their calls.
+    """
+
+    def __init__(self):
+        self.count = Counter()
+        self._lock = Lock()
+
+    def __call__(self, name, func):
+        def _node(*args):
+            with self._lock:
+                self.count[name] += 1
+            return func(*args)
+        return _node
+
+
+def _diamond(calls, executor=None):
+    """
+    raw -> norm -> (sqrt, log) -> composite, norm and raw are shared.
+    """
+    plan = Plan(executor)
+    plan.add('raw', value=3.)
+    plan.add('norm', calls('norm', lambda x: x/3), 'raw')
+    plan.add('sqrt', calls('sqrt', lambda x, k: (x*k)**0.5), 'norm', 4.)
+    plan.add('log', calls('log', lambda x: x + 10), 'norm')
+    plan.add('composite', calls('composite', lambda a, b: (a, b)), 'sqrt', 'log')
+    return plan
+
+
+def test_shared_nodes_are_computed_once():
+    calls = _Calls()
+    plan = _diamond(calls)
+    assert plan['composite'] == (2., 11.)
+    assert plan['sqrt'] == 2. and plan['log'] == 11.
+    assert calls.count == {'norm': 1, 'sqrt': 1, 'log': 1, 'composite': 1}
+
+    report = plan.report()
+    assert sorted(report['computed']) == ['composite', 'log', 'norm', 'sqrt']
+    assert report['reused'] == {'norm': 1, 'sqrt': 1, 'log': 1}
+    assert set(report['time']) == set(report['computed'])
+
+
+def test_run_computes_shared_nodes_once_in_parallel():
+    calls = _Calls()
+    with ThreadPoolExecutor(4) as pool:
+        plan = _diamond(calls, pool)
+        plan.run('sqrt', 'log', 'composite')
+    assert calls.count == {'norm': 1, 'sqrt': 1, 'log': 1, 'composite': 1}
+    assert plan['composite'] == (2., 11.)
+
+
+def test_get_waits_for_a_node_being_computed():
+    calls, started, release = _Calls(), Event(), Event()
+
+    def _slow(x):
+        started.set()
+        release.wait(5)
+        return x + 1
+
+    with ThreadPoolExecutor(2) as pool:
+        plan = Plan(pool)
+        plan.add('raw', value=1)
+        plan.add('slow', calls('slow', _slow), 'raw')
+        _f, = plan.start('slow')
+        assert started.wait(5)
+        _other = pool.submit(plan.get, 'slow')
+        time.sleep(0.05)
+        release.set()
+        assert plan['slow'] == _other.result() == _f.result() == 2
+    assert calls.count == {'slow': 1}
+
+
+def test_deps_not_naming_a_node_are_passed_as_they_are():
+    plan = Plan()
+    plan.add('a', value=2)
+    plan.add('b', lambda x, s, n: (x, s, n), 'a', 'not a node', 3)
+    assert plan['b'] == (2, 'not a node', 3)
+
+
+def test_errors_are_raised_to_every_consumer():
+    calls = _Calls()
+    plan = Plan()
+    plan.add('bad', calls('bad', lambda: 1/0))
+    plan.add('x', lambda v: v, 'bad')
+    with pytest.raises(ZeroDivisionError):
+        plan['x']
+    with pytest.raises(ZeroDivisionError):
+        plan['bad']
+    assert calls.count == {'bad': 1}
+    with pytest.raises(KeyError):
+        plan['missing']
@@ -0,0 +1,40 @@
+"""
+RenderPool workers get the arrays shared by SharedArrays, the blocks are gone
+once the SharedArrays exits.
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from rgbmaker.renderpool import RenderPool, SharedArrays
+
+
+@pytest.fixture(scope='module')
+def pool():
+    with RenderPool(processes=1) as _pool:
+        yield _pool
+
+
+def test_shared_arrays_round_trip(pool):
+    survey = np.random.default_rng(0).normal(size=(64, 48)).astype('>f4')
+    img = np.arange(64*48*3, dtype=np.uint8).reshape(64, 48, 3)
+    with SharedArrays() as shared:
+        _survey, _img = shared.share(survey), shared.share(img)
+        assert shared.share(survey) is _survey          # one block per array
+        assert len(shared._blocks) == 2
+        # values only match when the worker reads the big endian data as such
+        np.testing.assert_array_equal(pool.submit(np.copy, _survey).result(), survey)
+        np.testing.assert_array_equal(pool.submit(np.copy, a=_img).result(), img)
+        np.testing.assert_array_equal(pool.submit(np.add, _img, _img, dtype=np.int32).result(),
+                                      2*img.astype(np.int32))
+        _name = _survey.name
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=_name)
+
+
+def test_worker_errors_are_raised(pool):
+    with SharedArrays() as shared:
+        _a, _b = shared.share(np.zeros(3)), shared.share(np.zeros(4))
+        with pytest.raises(ValueError):
+            pool.submit(np.add, _a, _b).result()
@@ -0,0 +1,51 @@
+"""
+parse_coordinates() and NameResolver, Sesame is never called.
+"""
+import pytest
+from astropy import coordinates, units as ut
+
+from rgbmaker.resolve import NameResolver, parse_coordinates
+
+
+@pytest.mark.parametrize('position, ra, dec', [
+    ('14 09 48.86 -03 02 32.6', 212.453583, -3.042389),
+    ('14:09:48.86 -03:02:32.6', 212.453583, -3.042389),
+    ('14h09m48.86s -03d02m32.6s', 212.453583, -3.042389),
+    ('01 08 52.9, +73 06 24.8', 17.220417, 73.106889),
+    ('00 00 00 -00 30 00', 0., -0.5),
+    ('12 00 00 -00 00 30.0', 180., -1/120),
+    ('212.4536 -3.0424', 212.4536, -3.0424),
+    ('17.2204,73.1069', 17.2204, 73.1069),
+    ('0 -90', 0., -90.),
+])
+def test_parse_coordinates(position, ra, dec):
+    c = parse_coordinates(position)
+    assert c.frame.name == 'fk5'
+    assert c.ra.deg == pytest.approx(ra, abs=1e-6)
+    assert c.dec.deg == pytest.approx(dec, abs=1e-6)
+
+
+@pytest.mark.parametrize('position', [
+    '-00 30 00',                                # DEC alone
+    '24 00 00 +10 00 00', '10 61 00 +10 00 00', '23 59 60 +10 00 00',
+    '10 00 00 +10 60 00', '10 00 00 +95 00 00', '10 00 00 -90 00 01',
+    '360 0', '-10 20', '400 10', '10 -95',
+    '3C 33.1', 'M87', 'NGC1243', '',
+])
+def test_parse_coordinates_rejects(position):
+    assert parse_coordinates(position) is None
+
+
+def test_names_are_resolved_once(monkeypatch):
+    names = []
+
+    def _from_name(cls, name, frame='icrs', **kwargs):
+        names.append(name)
+        return coordinates.SkyCoord(17.2204*ut.deg, 73.1069*ut.deg, frame=frame)
+
+    monkeypatch.setattr(coordinates.SkyCoord, 'from_name', classmethod(_from_name))
+    resolver = NameResolver()
+    for position in ('3C 33.1', '3c  33.1', '01 08 52.9 +73 06 24.8', '3C 33.1'):
+        assert resolver(position).ra.deg == pytest.approx(17.2204, abs=1e-4)
+    assert names == ['3C 33.1']
+    assert resolver.stats() == {'local': 1, 'hits': 2, 'misses': 1}
@@ -0,0 +1,116 @@
+"""
+Service computes identical requests in flight once, the HTTP front end only
+takes parameters a client may set. query() is replaced by a stand-in.
+"""
+from threading import Event, Lock, Thread
+
+import pytest
+
+from rgbmaker import fetch
+from rgbmaker.service import Client, Service, check_http_params, make_server
+
+
+class _Query:
+    """
+    query() stand-in counting its calls, blocked until release is set.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.started, self.release = Event(), Event()
+        self._lock = Lock()
+
+    def __call__(self, **params):
+        with self._lock:
+            self.calls.append(params)
+        self.started.set()
+        assert self.release.wait(5)
+        if params.get('position') == 'fail':
+            raise RuntimeError('no images')
+        return 'success', [{'img1': b'\x89PNG'}], 'done', [{'position': params['position']}]
+
+
+@pytest.fixture
+def query(monkeypatch):
+    _query = _Query()
+    monkeypatch.setattr(fetch, 'query', _query)
+    return _query
+
+
+@pytest.fixture
+def service():
+    _service = Service(concurrency=2, render_pool=False)
+    yield _service
+    _service.shutdown()
+
+
+def test_identical_requests_are_computed_once(query, service):
+    futures = [service.submit(position='3C 33.1', kind='bytes') for _ in range(3)]
+    other = service.submit(position='M87', kind='bytes')
+    assert futures[0] is futures[1] is futures[2]
+    query.release.set()
+
+    out = futures[0].result()
+    assert out == {'status': 'success', 'uri': [{'img1': 'iVBORw=='}], 'info': 'done',
+                   'otext': [{'position': '3C 33.1'}]}
+    assert other.result()['otext'] == [{'position': 'M87'}]
+    assert sorted(p['position'] for p in query.calls) == ['3C 33.1', 'M87']
+    stats = service.stats()
+    assert (stats['requests'], stats['computed'], stats['coalesced']) == (4, 2, 2)
+    assert (stats['running'], stats['queued']) == (0, 0)
+
+
+def test_finished_requests_are_computed_again(query, service):
+    query.release.set()
+    service.query(position='3C 33.1')
+    service.query(position='3C 33.1')
+    assert len(query.calls) == 2
+    assert service.stats()['coalesced'] == 0
+
+
+def test_defaults_are_part_of_the_request(query):
+    service = Service(render_pool=False, batch=True)
+    query.release.set()
+    service.query(position='3C 33.1')
+    service.query(position='3C 33.1', batch=False)
+    service.shutdown()
+    assert [p['batch'] for p in query.calls] == [True, False]
+
+
+def test_failures_reach_every_waiting_request(query, service):
+    futures = [service.submit(position='fail') for _ in range(2)]
+    query.release.set()
+    for _f in futures:
+        with pytest.raises(RuntimeError):
+            _f.result()
+    assert service.stats()['failed'] == 1
+
+
+@pytest.mark.parametrize('params', [{'position': 'M87', 'size': 2}, {'kind': 'plot'}])
+def test_rejected_parameters(service, params):
+    with pytest.raises((TypeError, ValueError)):
+        service.submit(**params)
+
+
+@pytest.mark.parametrize('params', [{'kind': 'png'}, {'kind': 'jpg'}, {'spidx_file': '/etc/passwd'},
+                                    {'mirror': '/tmp'}])
+def test_http_params_stay_on_the_server(params):
+    with pytest.raises(ValueError):
+        check_http_params(dict(position='M87', **params))
+    check_http_params({'position': 'M87', 'kind': 'bytes', 'spidx_file': None})
+
+
+def test_http_round_trip(query, service):
+    server = make_server(port=0, service=service)
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = Client('http://127.0.0.1:{}'.format(server.server_address[1]), timeout=10)
+        query.release.set()
+        assert client.health() == {'status': 'ok'}
+        assert client.query(position='3C 33.1', kind='bytes')[1] == [{'img1': b'\x89PNG'}]
+        with pytest.raises(ValueError):
+            client.query(position='3C 33.1', kind='png')
+        assert client.stats()['computed'] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,86 @@
+"""
+find_spidx() and find_spidx_many() on the DEC sorted index give the rows a
+scan of the whole catalog finds, in catalog order.
+"""
+import numpy as np
+import pytest
+from astropy import coordinates, units as ut
+from astropy.io import fits
+
+from rgbmaker import tgss_spidx
+from rgbmaker.tgss_spidx import find_spidx, find_spidx_many
+
+#-- (ra, dec) of the targets, 0/360 crossings and a pole included --#
+TARGETS = [(212.45, -3.04), (0.1, 20.), (359.9, 20.), (0., -45.), (180., 88.7), (17.22, 73.1)]
+RADIUS = 0.5
+
+
+@pytest.fixture
+def spidx_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(tgss_spidx, 'INDEX_PATH', str(tmp_path / 'index'))
+    monkeypatch.setattr(tgss_spidx, '_SPIDX_INDEX', {})
+    rng = np.random.default_rng(0)
+    ra, dec = rng.uniform(0., 360., 20000), rng.uniform(-53., 90., 20000)
+    #-- sources around every target so each lookup finds some --#
+    for _ra, _dec in TARGETS:
+        ra = np.append(ra, (_ra + rng.uniform(-1., 1., 200)) % 360.)
+        dec = np.append(dec, np.clip(_dec + rng.uniform(-1., 1., 200), -90., 90.))
+    spidx = rng.normal(-0.75, 0.25, len(ra))
+    path = str(tmp_path / 'spidx.fits')
+    fits.PrimaryHDU(np.vstack((ra, dec, spidx))).writeto(path)
+    return path
+
+
+def _scan(spidx_file, ra, dec, epsilon):
+    """
+    find_spidx() before the index: every row tested, RA wrapped at 0/360.
+    """
+    with fits.open(spidx_file) as hdul:
+        RA, DEC, Spidx = hdul[0].data
+    _dra = (RA - ra + 180.) % 360. - 180.
+    keep = (np.abs(DEC - dec) < epsilon) & (np.abs(_dra) < epsilon)
+    return RA[keep], DEC[keep], np.round(np.double(Spidx[keep]), 3)
+
+
+def _assert_same(found, expected):
+    assert len(expected[0]) > 0
+    for _f, _e in zip(found, expected):
+        np.testing.assert_array_equal(_f, _e)
+
+
+@pytest.mark.parametrize('ra, dec', TARGETS)
+def test_find_spidx_matches_a_scan(spidx_file, ra, dec):
+    c = coordinates.SkyCoord(ra*ut.deg, dec*ut.deg, frame='fk5')
+    _assert_same(find_spidx(spidx_file, c, RADIUS*ut.deg), _scan(spidx_file, ra, dec, RADIUS))
+
+
+def test_find_spidx_wraps_ra(spidx_file):
+    c = coordinates.SkyCoord(0.1*ut.deg, 20.*ut.deg, frame='fk5')
+    xi, _, _ = find_spidx(spidx_file, c, RADIUS*ut.deg)
+    assert np.any(xi > 359.) and np.any(xi < 1.)
+
+
+def test_index_is_built_once(spidx_file, tmp_path):
+    c = coordinates.SkyCoord(212.45*ut.deg, -3.04*ut.deg, frame='fk5')
+    find_spidx(spidx_file, c, RADIUS*ut.deg)
+    find_spidx(spidx_file, c, RADIUS*ut.deg)
+    assert [p.suffixes for p in (tmp_path / 'index').iterdir()] == [['.idx', '.npy']]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['index', 'spidx.fits']
+
+
+def test_find_spidx_many_matches_a_scan(spidx_file):
+    ra, dec = np.array(TARGETS).T
+    c = coordinates.SkyCoord(ra*ut.deg, dec*ut.deg, frame='fk5')
+    found = find_spidx_many(spidx_file, c, RADIUS*ut.deg, chunk=4)
+    assert len(found) == len(TARGETS)
+    for _found, _ra, _dec in zip(found, ra, dec):
+        _assert_same(_found, _scan(spidx_file, _ra, _dec, RADIUS))
+
+
+def test_find_spidx_many_radius_per_target(spidx_file):
+    ra, dec = np.array(TARGETS).T
+    radius = np.linspace(0.1, 0.9, len(TARGETS))
+    c = coordinates.SkyCoord(ra*ut.deg, dec*ut.deg, frame='fk5')
+    found = find_spidx_many(spidx_file, c, radius*ut.deg)
+    for _found, _ra, _dec, _r in zip(found, ra, dec, radius):
+        _assert_same(_found, _scan(spidx_file, _ra, _dec, _r))
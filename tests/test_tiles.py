@@ -0,0 +1,112 @@
+"""
+The tiled composites are the images of the full size (fast) path, written
+band by band with PNGWriter.
+"""
+from functools import partial
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from rgbmaker import imgplt, tiles
+from rgbmaker.tiles import PNGWriter, Panel, save_tiles
+
+PX = 150
+ROWS = 37               # bands that do not divide the image
+
+
+def _survey(seed, scale=1., offset=0.):
+    rng = np.random.default_rng(seed)
+    img = rng.normal(0., 0.01, (PX, PX))
+    _g = np.arange(PX)
+    for x0, y0, s, p in rng.uniform((0, 0, 1, 0.1), (PX, PX, 8, 5), (15, 4)):
+        img += p*np.outer(np.exp(-0.5*((_g - y0)/s)**2), np.exp(-0.5*((_g - x0)/s)**2))
+    return (scale*img + offset).astype('>f4')
+
+
+def _decode(data):
+    return np.asarray(Image.open(io.BytesIO(data)).convert('RGB'))
+
+
+@pytest.mark.parametrize('rows', [1, ROWS, PX])
+@pytest.mark.parametrize('compression', [0, 6])
+def test_pngwriter_round_trip(rows, compression):
+    img = np.random.default_rng(0).integers(0, 256, (PX, 97, 3), dtype=np.uint8)
+    _f = io.BytesIO()
+    writer = PNGWriter(_f, 97, PX, compression)
+    for r0 in range(0, PX, rows):
+        writer.write(img[r0:r0 + rows])
+    assert writer.close() is _f
+    np.testing.assert_array_equal(_decode(_f.getvalue()), img)
+
+
+def test_pngwriter_needs_every_row():
+    writer = PNGWriter(io.BytesIO(), 10, 10)
+    writer.write(np.zeros((9, 10, 3), np.uint8))
+    with pytest.raises(ValueError):
+        writer.close()
+
+
+def test_ror_panels_match_full_size_composite():
+    tgss, dss2r, nvss = _survey(1), _survey(2, 5000., 6000.), _survey(3)
+    lvlc = np.linspace(0.5, 4., 4)
+
+    img = imgplt.overlayc(tgss, dss2r, nvss, nvss, 4, 0.5)[0]
+    expected = np.hstack((imgplt.raster_contours(img.copy(), nvss, lvlc),
+                          imgplt.raster_contours(img.copy(), tgss, lvlc, (255, 0, 255))))
+    ror = [tiles.ror_channel(svy, ROWS) for svy in (tgss, dss2r, nvss)]
+    panels = [Panel(ror).contours(nvss, lvlc), Panel(ror).contours(tgss, lvlc, (255, 0, 255))]
+    out = save_tiles(panels, tgss.shape, 'bytes', rows=ROWS)
+    np.testing.assert_array_equal(_decode(out), _decode(imgplt.save_img(expected, 'bytes')))
+
+
+def test_smoothed_contours_match_full_size_smoothing():
+    first = _survey(4)
+    lvlc = np.linspace(0.2, 2., 4)
+    expected = imgplt.raster_contours(np.zeros((PX, PX, 3), np.uint8),
+                                      imgplt.smooth(first, 1.5, method='direct'), lvlc)
+    _black = tiles.TiledChannel(first, None, scale=0)
+    out = save_tiles([Panel([_black]).contours(first, lvlc, sigma=1.5)], first.shape, 'bytes',
+                     rows=ROWS)
+    np.testing.assert_array_equal(_decode(out), np.flipud(expected))
+
+
+@pytest.mark.parametrize('twice', [False, True])
+def test_gray_panel_matches_dss2r_stretch(twice):
+    dss2r = _survey(5, 5000., 6000.)
+    _gray = imgplt.sqrt(dss2r, *imgplt.channel_stats(dss2r, (1., 100.)))
+    if twice:
+        _gray = imgplt.sqrt(_gray, *imgplt.channel_stats(_gray, (1., 100.)))
+    out = save_tiles([Panel([tiles.gray_channel(dss2r, ROWS, twice=twice)])], dss2r.shape,
+                     'bytes', rows=ROWS)
+    np.testing.assert_array_equal(_decode(out), np.flipud(imgplt.gray_rgb(_gray)))
+
+
+def test_percentiles_match_channel_stats():
+    x = np.round(_survey(6), 3)
+    q = (1., 5., 50., 100.)
+    np.testing.assert_array_equal(tiles.percentiles(x, q, rows=ROWS), imgplt.channel_stats(x, q))
+    np.testing.assert_array_equal(tiles.percentiles(x, (50.,), unique=False, rows=ROWS),
+                                  [np.percentile(x, 50.)])
+
+
+def test_transformed_percentiles_histogram_estimate():
+    x = _survey(7, 5000., 6000.)
+    _sqrt = partial(imgplt.stretch, kind='sqrt', scale_min=6000., scale_max=float(x.max()))
+    expected = np.percentile(np.unique(_sqrt(x)), (1., 50., 100.))
+    exact = tiles.percentiles(x, (1., 50., 100.), rows=ROWS, transform=_sqrt)
+    approx = tiles.percentiles(x, (1., 50., 100.), rows=ROWS, transform=_sqrt, limit=1000,
+                               bins=4096)
+    np.testing.assert_allclose(exact, expected, rtol=1e-6)
+    #-- the histogram counts repeated values, but the clipped ones once --#
+    t = _sqrt(x).ravel()
+    t = np.append(t[(t != t.min()) & (t != t.max())], (t.min(), t.max()))
+    np.testing.assert_allclose(approx, np.percentile(t, (1., 50., 100.)),
+                               atol=(t.max() - t.min())/4096)
+
+
+@pytest.mark.parametrize('kind, fmt', [('jpg', 'png'), ('base64', 'jpg')])
+def test_save_tiles_is_png_only(kind, fmt):
+    with pytest.raises(ValueError):
+        save_tiles([Panel([tiles.TiledChannel(_survey(8))])], (PX, PX), kind, fmt=fmt)